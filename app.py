@@ -1,664 +1,595 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, abort, stream_with_context, current_app, send_file
+from flask.cli import with_appcontext
+from flask_migrate import Migrate
 from models import db, Orcamento, Distribuicao, Missao, ComplementacaoOrcamento, MovimentacaoOrcamentaria, ResolucaoSemSaldo, RecolhimentoSaldo
 from config import Config
 import sqlite3
 from datetime import datetime, date
 import calendar
-import pandas as pd
 import io
 import csv  
 from werkzeug.utils import secure_filename
 import os
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import sys
+import time
+import hmac
+import logging
+import weakref
+import click
 from sqlalchemy import or_ 
-from dotenv import load_dotenv
+from sqlalchemy.orm import contains_eager
+import reports
+import pagination
+import search
+import eventos
+import banco
+import logs
+import metricas
+import consultas_lentas
+import perfil
 
-# Carrega variáveis do arquivo .env na variável de ambiente do sistema
-load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config.from_object(Config)
 
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB máximo
+class RegistroRotas:
+    """Rotas, ganchos e comandos deste módulo, aplicados a cada app de create_app().
 
-# Criar pasta de uploads se não existir
-if not os.path.exists('uploads'):
-    os.makedirs('uploads')
+    Funciona como um Blueprint sem nome: os endpoints continuam sendo o nome
+    da função (``url_for('missoes')``), como nos templates.
+    """
 
+    def __init__(self):
+        self._registros = []
 
-@app.route('/exportar_movimentacoes_pdf')
-def exportar_movimentacoes_pdf():
-    """Exportar movimentações para PDF"""
-    try:
-        # Buscar movimentações
-        movimentacoes = MovimentacaoOrcamentaria.query.order_by(
-            MovimentacaoOrcamentaria.data_movimentacao.desc()
-        ).all()
-        
-        # Criar buffer para o PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#1f4e79')
-        )
-        
-        subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            textColor=colors.grey
-        )
-        
-        # Elementos do documento
-        elements = []
-        
-        # Cabeçalho
-        elements.append(Paragraph("RELATÓRIO DE MOVIMENTAÇÕES ORÇAMENTÁRIAS", title_style))
-        elements.append(Paragraph(f"CRPIV - Comando Regional de Polícia IV", subtitle_style))
-        elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", subtitle_style))
-        elements.append(Spacer(1, 20))
-        
-        # Resumo estatístico
-        total_movimentacoes = len(movimentacoes)
-        valor_total = sum([m.valor for m in movimentacoes if m.valor])
-        
-        resumo_data = [
-            ['RESUMO EXECUTIVO', ''],
-            ['Total de Movimentações:', f'{total_movimentacoes:,}'],
-            ['Valor Total Movimentado:', f'R$ {valor_total:,.2f}'.replace('.', ',')],
-            ['Período:', f'{movimentacoes[-1].data_movimentacao.strftime("%d/%m/%Y") if movimentacoes else "N/A"} a {movimentacoes[0].data_movimentacao.strftime("%d/%m/%Y") if movimentacoes else "N/A"}']
+    def route(self, regra, **opcoes):
+        def decorador(funcao):
+            self._registros.append(lambda app: app.route(regra, **opcoes)(funcao))
+            return funcao
+        return decorador
+
+    def before_request(self, funcao):
+        self._registros.append(lambda app: app.before_request(funcao))
+        return funcao
+
+    def template_filter(self, nome):
+        def decorador(funcao):
+            self._registros.append(lambda app: app.add_template_filter(funcao, nome))
+            return funcao
+        return decorador
+
+    def comando(self, nome):
+        """Comando do ``flask`` CLI, executado dentro do contexto da app"""
+        def decorador(funcao):
+            comando = click.command(nome)(with_appcontext(funcao))
+            self._registros.append(lambda app: app.cli.add_command(comando))
+            return comando
+        return decorador
+
+    def registrar(self, app):
+        for registro in self._registros:
+            registro(app)
+
+
+rotas = RegistroRotas()
+migrate = Migrate(render_as_batch=True, include_object=search.ignorar_objetos_busca)
+
+# Engines criados por create_app(); os de apps descartadas saem sozinhos
+engines_criados = weakref.WeakSet()
+
+
+def descartar_engines_herdados():
+    """No filho de um fork: esquece as conexões do pai sem fechá-las"""
+    for engine in list(engines_criados):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=descartar_engines_herdados)
+
+
+# ✅ CAMADA DE DADOS DOS RELATÓRIOS
+# Cada construtor executa suas consultas uma única vez; o dataset resultante
+# fica no cache de relatórios e é renderizado em PDF, CSV, XLSX ou JSON.
+
+@reports.construtor('orcamento', filtros=('unidade',))
+def dataset_orcamento(unidade=''):
+    """Dataset do relatório orçamentário consolidado"""
+    totais_geral = calcular_orcamento_total_todos_bimestres()
+    por_tipo = [
+        {'tipo': tipo, 'valor': totais_geral[TIPO_PARA_CAMPO[tipo]]}
+        for tipo in TIPOS_ORCAMENTO
+    ]
+
+    # Uma única consulta agrupada por fonte e status substitui as somas por unidade
+    query = db.session.query(
+        Missao.fonte_dinheiro,
+        Missao.status,
+        db.func.sum(Missao.valor)
+    )
+    if unidade:
+        query = query.filter(Missao.fonte_dinheiro == unidade)
+    agregados = query.group_by(Missao.fonte_dinheiro, Missao.status).all()
+
+    autorizado_por_unidade = {}
+    total_previsoes = 0
+    total_autorizadas = 0
+    for fonte, status, total in agregados:
+        total = total or 0
+        if status == 'previsao':
+            total_previsoes += total
+        elif status == 'autorizada':
+            total_autorizadas += total
+            autorizado_por_unidade[fonte] = total
+
+    por_unidade = [
+        {'unidade': u, 'autorizado': autorizado_por_unidade.get(u, 0)}
+        for u in UNIDADES
+        if not unidade or u == unidade
+    ]
+
+    total_orcamento = sum(item['valor'] for item in por_tipo)
+
+    return {
+        'nome_arquivo': f"relatorio_orcamentario_{unidade.replace(' ', '_') if unidade else 'geral'}",
+        'resumo': {
+            'total_orcamento': total_orcamento,
+            'total_previsoes': total_previsoes,
+            'total_autorizadas': total_autorizadas,
+            'disponivel': total_orcamento - total_autorizadas
+        },
+        'por_tipo': por_tipo,
+        'por_unidade': por_unidade,
+        'tabelas': [
+            {
+                'titulo': 'Orçamento por Tipo',
+                'colunas': [
+                    {'chave': 'tipo', 'rotulo': 'Tipo'},
+                    {'chave': 'valor', 'rotulo': 'Valor', 'formato': 'moeda'}
+                ],
+                'linhas': por_tipo
+            },
+            {
+                'titulo': 'Gastos por Unidade',
+                'colunas': [
+                    {'chave': 'unidade', 'rotulo': 'Unidade'},
+                    {'chave': 'autorizado', 'rotulo': 'Autorizado', 'formato': 'moeda'}
+                ],
+                'linhas': por_unidade
+            }
         ]
-        
-        resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
-        resumo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ]))
-        
-        elements.append(resumo_table)
-        elements.append(Spacer(1, 30))
-        
-        # Tabela principal de movimentações
-        if movimentacoes:
-            # Cabeçalho da tabela
-            data = [['Data', 'Tipo', 'Descrição', 'Origem', 'Destino', 'Tipo Orç.', 'Valor', 'Usuário']]
-            
-            # Dados das movimentações
-            for mov in movimentacoes:
-                data.append([
-                    mov.data_movimentacao.strftime('%d/%m/%Y\n%H:%M'),
-                    mov.tipo.replace('_', ' ').title(),
-                    (mov.descricao or '')[:30] + ('...' if len(mov.descricao or '') > 30 else ''),
-                    mov.unidade_origem or '-',
-                    mov.unidade_destino or '-',
-                    mov.tipo_orcamento or '-',
-                    f'R$ {mov.valor:,.2f}'.replace('.', ',') if mov.valor else '-',
-                    mov.usuario[:10] + ('...' if len(mov.usuario) > 10 else '')
-                ])
-            
-            # Criar tabela
-            table = Table(data, colWidths=[0.8*inch, 1.2*inch, 1.8*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.9*inch, 0.8*inch])
-            
-            # Estilo da tabela
-            table.setStyle(TableStyle([
-                # Cabeçalho
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                
-                # Corpo da tabela
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                
-                # Zebrar linhas
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ]))
-            
-            # Aplicar zebra nas linhas
-            for i in range(1, len(data)):
-                if i % 2 == 0:
-                    table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, i), (-1, i), colors.lightgrey)
-                    ]))
-            
-            elements.append(Paragraph("DETALHAMENTO DAS MOVIMENTAÇÕES", styles['Heading2']))
-            elements.append(Spacer(1, 10))
-            elements.append(table)
-            
+    }
+
+
+@reports.construtor('missoes', filtros=('opm_filtro', 'fonte_filtro'))
+def dataset_missoes(opm_filtro='', fonte_filtro=''):
+    """Dataset de missões separadas por unidade (fonte do dinheiro)"""
+    query = db.session.query(
+        Missao.id,
+        Missao.fonte_dinheiro,
+        Missao.opm_destino,
+        Missao.processo_sei,
+        Missao.descricao,
+        Missao.tipo,
+        Missao.periodo,
+        Missao.mes,
+        Missao.status,
+        Missao.valor,
+        Missao.data_criacao
+    )
+    agregados = db.session.query(
+        Missao.fonte_dinheiro,
+        Missao.status,
+        db.func.count(Missao.id),
+        db.func.sum(Missao.valor)
+    )
+    if opm_filtro:
+        query = query.filter(Missao.opm_destino == opm_filtro)
+        agregados = agregados.filter(Missao.opm_destino == opm_filtro)
+    if fonte_filtro:
+        query = query.filter(Missao.fonte_dinheiro == fonte_filtro)
+        agregados = agregados.filter(Missao.fonte_dinheiro == fonte_filtro)
+
+    # ✅ Totais por unidade numa consulta agrupada; as linhas são lidas só na gravação do dataset
+    por_unidade = {}
+    total_missoes = 0
+    for fonte, status, quantidade, total in agregados.group_by(Missao.fonte_dinheiro, Missao.status).order_by(
+            Missao.fonte_dinheiro):
+        total = total or 0
+        totais = por_unidade.setdefault(fonte, {
+            'unidade': fonte,
+            'qtd_previsao': 0,
+            'qtd_autorizada': 0,
+            'total_previsao': 0,
+            'total_autorizada': 0,
+            'total_geral': 0
+        })
+        if status == 'previsao':
+            totais['qtd_previsao'] += quantidade
+            totais['total_previsao'] += total
         else:
-            elements.append(Paragraph("Nenhuma movimentação encontrada.", styles['Normal']))
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("___" * 30, styles['Normal']))
-        elements.append(Paragraph(
-            f"Relatório gerado automaticamente pelo Sistema CRPIV em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-            ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-        ))
-        
-        # Gerar PDF
-        doc.build(elements)
-        
-        # Preparar resposta
-        buffer.seek(0)
-        
-        return Response(
-            buffer.getvalue(),
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename=relatorio_movimentacoes_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
+            totais['qtd_autorizada'] += quantidade
+            totais['total_autorizada'] += total
+        totais['total_geral'] += total
+        total_missoes += quantidade
+
+    def linhas():
+        # Autorizadas antes das previsões, na ordem das seções do PDF
+        for row in query.order_by(Missao.fonte_dinheiro, Missao.status, Missao.data_criacao.desc()).yield_per(1000):
+            linha = row._asdict()
+            linha['data_criacao'] = row.data_criacao.isoformat() if row.data_criacao else None
+            yield linha
+
+    total_previsao = sum(t['total_previsao'] for t in por_unidade.values())
+    total_autorizada = sum(t['total_autorizada'] for t in por_unidade.values())
+
+    nome_arquivo = "missoes_por_unidade"
+    if fonte_filtro:
+        nome_arquivo += f"_{fonte_filtro.replace(' ', '_')}"
+    if opm_filtro:
+        nome_arquivo += f"_destino_{opm_filtro.replace(' ', '_')}"
+
+    return {
+        'nome_arquivo': nome_arquivo,
+        'resumo': {
+            'total_missoes': total_missoes,
+            'total_previsao': total_previsao,
+            'total_autorizada': total_autorizada,
+            'total_geral': total_previsao + total_autorizada
+        },
+        'por_unidade': list(por_unidade.values()),
+        'tabelas': [
+            {
+                'titulo': 'Missões',
+                'colunas': [
+                    {'chave': 'id', 'rotulo': 'ID'},
+                    {'chave': 'fonte_dinheiro', 'rotulo': 'Fonte'},
+                    {'chave': 'opm_destino', 'rotulo': 'OPM Destino'},
+                    {'chave': 'processo_sei', 'rotulo': 'Processo SEI'},
+                    {'chave': 'descricao', 'rotulo': 'Descrição'},
+                    {'chave': 'tipo', 'rotulo': 'Tipo'},
+                    {'chave': 'periodo', 'rotulo': 'Período'},
+                    {'chave': 'mes', 'rotulo': 'Mês'},
+                    {'chave': 'status', 'rotulo': 'Status'},
+                    {'chave': 'valor', 'rotulo': 'Valor', 'formato': 'moeda'},
+                    {'chave': 'data_criacao', 'rotulo': 'Criada em', 'formato': 'data'}
+                ],
+                'linhas': linhas()
             }
+        ]
+    }
+
+
+def filtrar_movimentacoes(query, unidade_filtro='', tipo_filtro='', data_inicio='', data_fim='', colunas=None):
+    """Aplica os filtros do relatório de movimentações a uma query
+
+    ``colunas`` permite filtrar outra fonte com as mesmas colunas de
+    MovimentacaoOrcamentaria (ex.: o histórico reconstruído).
+    """
+    colunas = colunas if colunas is not None else MovimentacaoOrcamentaria
+
+    if unidade_filtro:
+        query = query.filter(
+            or_(
+                colunas.unidade_origem == unidade_filtro,
+                colunas.unidade_destino == unidade_filtro
+            )
         )
-        
-    except Exception as e:
-        print(f"❌ Erro na exportação PDF: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Erro ao exportar relatório em PDF', 'error')
-        return redirect(url_for('relatorio_movimentacoes'))
 
+    if tipo_filtro:
+        query = query.filter(colunas.tipo == tipo_filtro)
 
-@app.route('/exportar_pdf')
-def exportar_pdf():
-    """Exportar relatórios em PDF - VERSÃO UNIFICADA"""
+    if data_inicio:
+        try:
+            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
+            query = query.filter(colunas.data_movimentacao >= data_inicio_obj)
+        except ValueError:
+            logger.debug('Erro ao converter data início: %s', data_inicio)
+
+    if data_fim:
+        try:
+            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d')
+            query = query.filter(colunas.data_movimentacao <= data_fim_obj)
+        except ValueError:
+            logger.debug('Erro ao converter data fim: %s', data_fim)
+
+    return query
+
+
+def movimentacoes_reconstruidas():
+    """Histórico reconstruído a partir de orçamentos, distribuições e missões autorizadas.
+
+    UNION ALL com as mesmas colunas de MovimentacaoOrcamentaria, para que
+    filtros, ordenação e paginação sejam feitos no banco. Os ids são
+    intercalados (3n, 3n+1, 3n+2) para continuarem únicos entre as origens.
+    """
+    orcamentos = db.select(
+        (Orcamento.id * 3).label('id'),
+        Orcamento.data_criacao.label('data_movimentacao'),
+        db.literal('orcamento_criado').label('tipo'),
+        ('Orçamento criado: ' + Orcamento.bimestre + '/' + db.cast(Orcamento.ano, db.String)).label('descricao'),
+        db.null().label('unidade_origem'),
+        db.null().label('unidade_destino'),
+        db.null().label('tipo_orcamento'),
+        (db.func.coalesce(Orcamento.diarias, 0) + db.func.coalesce(Orcamento.derso, 0) +
+         db.func.coalesce(Orcamento.diarias_pav, 0) + db.func.coalesce(Orcamento.derso_pav, 0)).label('valor'),
+        db.literal('Sistema').label('usuario'),
+        Orcamento.id.label('orcamento_id'),
+        db.null().label('missao_id')
+    )
+    distribuicoes = db.select(
+        (Distribuicao.id * 3 + 1).label('id'),
+        Distribuicao.data_distribuicao.label('data_movimentacao'),
+        db.literal('distribuicao').label('tipo'),
+        ('Distribuição para ' + Distribuicao.unidade).label('descricao'),
+        db.literal('CRPIV').label('unidade_origem'),
+        Distribuicao.unidade.label('unidade_destino'),
+        Distribuicao.tipo_orcamento.label('tipo_orcamento'),
+        Distribuicao.valor.label('valor'),
+        db.literal('Sistema').label('usuario'),
+        Distribuicao.orcamento_id.label('orcamento_id'),
+        db.null().label('missao_id')
+    )
+    missoes = db.select(
+        (Missao.id * 3 + 2).label('id'),
+        db.func.coalesce(Missao.data_autorizacao, Missao.data_criacao).label('data_movimentacao'),
+        db.literal('autorizacao_missao').label('tipo'),
+        ('Missão autorizada: ' + db.func.substr(Missao.descricao, 1, 30) + '...').label('descricao'),
+        Missao.fonte_dinheiro.label('unidade_origem'),
+        Missao.opm_destino.label('unidade_destino'),
+        Missao.tipo.label('tipo_orcamento'),
+        Missao.valor.label('valor'),
+        db.literal('Sistema').label('usuario'),
+        db.null().label('orcamento_id'),
+        Missao.id.label('missao_id')
+    ).where(Missao.status == 'autorizada')
+
+    return db.union_all(orcamentos, distribuicoes, missoes).subquery('movimentacao_reconstruida')
+
+
+@reports.construtor('movimentacoes', filtros=('unidade_filtro', 'tipo_filtro', 'data_inicio', 'data_fim'))
+def dataset_movimentacoes(unidade_filtro='', tipo_filtro='', data_inicio='', data_fim=''):
+    """Dataset do log de movimentações orçamentárias"""
+    query = db.session.query(
+        MovimentacaoOrcamentaria.data_movimentacao,
+        MovimentacaoOrcamentaria.tipo,
+        MovimentacaoOrcamentaria.descricao,
+        MovimentacaoOrcamentaria.unidade_origem,
+        MovimentacaoOrcamentaria.unidade_destino,
+        MovimentacaoOrcamentaria.tipo_orcamento,
+        MovimentacaoOrcamentaria.valor,
+        MovimentacaoOrcamentaria.usuario,
+        MovimentacaoOrcamentaria.orcamento_id,
+        MovimentacaoOrcamentaria.missao_id
+    )
+    query = filtrar_movimentacoes(query, unidade_filtro, tipo_filtro, data_inicio, data_fim)
+
+    # ✅ Resumo numa consulta agregada; as linhas são lidas só na gravação do dataset
+    total, valor_total, data_inicial, data_final = filtrar_movimentacoes(
+        db.session.query(
+            db.func.count(MovimentacaoOrcamentaria.id),
+            db.func.sum(MovimentacaoOrcamentaria.valor),
+            db.func.min(MovimentacaoOrcamentaria.data_movimentacao),
+            db.func.max(MovimentacaoOrcamentaria.data_movimentacao)
+        ),
+        unidade_filtro, tipo_filtro, data_inicio, data_fim
+    ).one()
+
+    def linhas():
+        for row in query.order_by(MovimentacaoOrcamentaria.data_movimentacao.desc()).yield_per(1000):
+            linha = row._asdict()
+            linha['data_movimentacao'] = row.data_movimentacao.isoformat() if row.data_movimentacao else None
+            linha['valor'] = float(row.valor) if row.valor is not None else None
+            yield linha
+
+    return {
+        'nome_arquivo': 'relatorio_movimentacoes',
+        'resumo': {
+            'total_movimentacoes': total,
+            'valor_total': float(valor_total or 0),
+            'data_inicial': data_inicial.isoformat() if data_inicial else None,
+            'data_final': data_final.isoformat() if data_final else None
+        },
+        'tabelas': [
+            {
+                'titulo': 'Movimentações',
+                'colunas': [
+                    {'chave': 'data_movimentacao', 'rotulo': 'Data', 'formato': 'data'},
+                    {'chave': 'tipo', 'rotulo': 'Tipo'},
+                    {'chave': 'descricao', 'rotulo': 'Descrição'},
+                    {'chave': 'unidade_origem', 'rotulo': 'Unidade Origem'},
+                    {'chave': 'unidade_destino', 'rotulo': 'Unidade Destino'},
+                    {'chave': 'tipo_orcamento', 'rotulo': 'Tipo Orçamento'},
+                    {'chave': 'valor', 'rotulo': 'Valor', 'formato': 'moeda'},
+                    {'chave': 'usuario', 'rotulo': 'Usuário'},
+                    {'chave': 'orcamento_id', 'rotulo': 'Orçamento ID'},
+                    {'chave': 'missao_id', 'rotulo': 'Missão ID'}
+                ],
+                'linhas': linhas()
+            }
+        ]
+    }
+
+
+def responder_relatorio(tipo, formato, filtros, rota_erro='relatorios'):
+    """Renderiza o relatório (usando o cache) e devolve como download"""
     try:
-        tipo = request.args.get('tipo', 'orcamento')
-        
-        print(f"🔍 Exportando PDF - Tipo: {tipo}")
-        
-        # ✅ ROTEAMENTO POR TIPO DE RELATÓRIO
-        if tipo == 'orcamento':
-            return exportar_relatorio_orcamentario_pdf()
-        elif tipo == 'missoes':
-            return exportar_missoes_pdf()
-        elif tipo == 'movimentacoes':
-            return exportar_movimentacoes_pdf()
-        elif tipo == 'unidade':
-            return exportar_relatorio_unidade_pdf()
-        else:
-            flash(f'Tipo de relatório "{tipo}" não reconhecido', 'error')
-            return redirect(url_for('relatorios'))
-            
+        arquivo, mimetype, nome_arquivo = reports.abrir_relatorio(tipo, formato, filtros)
+
+        # ✅ O arquivo é enviado em partes e fechado ao fim da resposta
+        return send_file(arquivo, mimetype=mimetype, as_attachment=True, download_name=nome_arquivo)
+
+    except reports.RelatorioIndisponivel as e:
+        flash(str(e), 'error')
+        return redirect(url_for(rota_erro))
     except Exception as e:
-        print(f"❌ Erro na exportação: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro na exportação %s/%s', tipo, formato)
         flash('Erro ao exportar relatório', 'error')
-        return redirect(url_for('relatorios'))
+        return redirect(url_for(rota_erro))
 
-def exportar_relatorio_orcamentario_pdf():
-    """Exportar relatório orçamentário em PDF - SEU CÓDIGO ATUAL"""
-    try:
-        unidade_filtro = request.args.get('unidade', '')
-        
-        # Buscar dados para o relatório
-        dados = preparar_dados_relatorio(unidade_filtro)
-        
-        # Criar buffer para o PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#1f4e79')
-        )
-        
-        elements.append(Paragraph("RELATÓRIO ORÇAMENTÁRIO CONSOLIDADO", title_style))
-        elements.append(Paragraph(f"CRPIV - Comando Regional de Polícia IV", 
-                                ParagraphStyle('Sub', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)))
-        
-        if unidade_filtro:
-            elements.append(Paragraph(f"Filtro aplicado: {unidade_filtro}", 
-                                    ParagraphStyle('Filter', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.red)))
-        
-        elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", 
-                                ParagraphStyle('Date', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)))
-        elements.append(Spacer(1, 30))
-        
-        # Resumo Financeiro
-        resumo_data = [
-            ['RESUMO FINANCEIRO', ''],
-            ['Total Orçamento:', f'R$ {sum(dados["tipos_valores"]):,.2f}'.replace('.', ',')],
-            ['Total Previsões:', f'R$ {dados["status_valores"][0]:,.2f}'.replace('.', ',')],
-            ['Total Autorizadas:', f'R$ {dados["status_valores"][1]:,.2f}'.replace('.', ',')],
-            ['Disponível:', f'R$ {(sum(dados["tipos_valores"]) - dados["status_valores"][1]):,.2f}'.replace('.', ',')]
-        ]
-        
-        resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
-        resumo_table.setStyle(get_table_style_header())  # ✅ Usar função helper
-        
-        elements.append(resumo_table)
-        elements.append(Spacer(1, 30))
-        
-        # Orçamento por Tipo
-        tipo_data = [['ORÇAMENTO POR TIPO', 'VALOR']]
-        for i, tipo in enumerate(dados['tipos_orcamento']):
-            tipo_data.append([tipo, f'R$ {dados["tipos_valores"][i]:,.2f}'.replace('.', ',')])
-        
-        tipo_table = Table(tipo_data, colWidths=[3*inch, 2*inch])
-        tipo_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#28a745')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-        ]))
-        
-        elements.append(tipo_table)
-        elements.append(Spacer(1, 30))
-        
-        # Gastos por Unidade
-        if dados['unidades']:
-            unidade_data = [['GASTOS POR UNIDADE', 'VALOR']]
-            for i, unidade in enumerate(dados['unidades']):
-                unidade_data.append([unidade, f'R$ {dados["gastos_unidade"][i]:,.2f}'.replace('.', ',')])
-            
-            unidade_table = Table(unidade_data, colWidths=[3*inch, 2*inch])
-            unidade_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-            ]))
-            
-            elements.append(unidade_table)
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("___" * 30, styles['Normal']))
-        elements.append(Paragraph(
-            f"Relatório gerado automaticamente pelo Sistema CRPIV em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-            ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-        ))
-        
-        # Gerar PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        filtro_nome = f"_{unidade_filtro.replace(' ', '_')}" if unidade_filtro else "_geral"
-        
-        return Response(
-            buffer.getvalue(),
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename=relatorio_orcamentario{filtro_nome}_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
-            }
-        )
-        
-    except Exception as e:
-        print(f"❌ Erro na exportação PDF orçamentário: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Erro ao exportar relatório orçamentário em PDF', 'error')
-        return redirect(url_for('relatorios'))
 
+@rotas.route('/exportar_relatorio/<tipo>')
+def exportar_relatorio(tipo):
+    """Exportar qualquer relatório no formato pedido (pdf, csv, xlsx ou json)"""
+    formato = request.args.get('formato', 'pdf').lower()
+    return responder_relatorio(tipo, formato, request.args)
+
+
+@rotas.route('/exportar_movimentacoes_pdf')
+def exportar_movimentacoes_pdf():
+    """Exportar movimentações para PDF"""
+    return responder_relatorio('movimentacoes', 'pdf', request.args, rota_erro='relatorio_movimentacoes')
+
+
+@rotas.route('/exportar_missoes_pdf')
 def exportar_missoes_pdf():
-    """Exportar missões para PDF separadas por unidades"""
-    try:
-        # Buscar filtros
-        omp_filtro = request.args.get('omp_filtro', '')
-        fonte_filtro = request.args.get('fonte_filtro', '')
-        
-        print(f"🔍 Exportando PDF de missões - Filtros: OMP='{omp_filtro}', Fonte='{fonte_filtro}'")
-        
-        # Buscar missões com filtros
-        query = Missao.query
-        
-        if omp_filtro:
-            query = query.filter(Missao.opm_destino == omp_filtro)
-        
-        if fonte_filtro:
-            query = query.filter(Missao.fonte_dinheiro == fonte_filtro)
-        
-        missoes = query.order_by(Missao.fonte_dinheiro, Missao.status.desc(), Missao.data_criacao.desc()).all()
-        
-        print(f"📋 {len(missoes)} missões encontradas para exportação")
-        
-        # Organizar missões por unidade
-        missoes_por_unidade = {}
-        for missao in missoes:
-            unidade = missao.fonte_dinheiro
-            if unidade not in missoes_por_unidade:
-                missoes_por_unidade[unidade] = {
-                    'previsao': [],
-                    'autorizada': [],
-                    'total_previsao': 0,
-                    'total_autorizada': 0,
-                    'total_geral': 0
-                }
-            
-            missoes_por_unidade[unidade][missao.status].append(missao)
-            
-            if missao.status == 'previsao':
-                missoes_por_unidade[unidade]['total_previsao'] += missao.valor
-            else:
-                missoes_por_unidade[unidade]['total_autorizada'] += missao.valor
-            
-            missoes_por_unidade[unidade]['total_geral'] += missao.valor
-        
-        # Criar buffer para o PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=50,
-            leftMargin=50,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#1f4e79'),
-            fontName='Helvetica-Bold'
-        )
-        
-        elements.append(Paragraph("RELATÓRIO DE MISSÕES POR UNIDADE", title_style))
-        elements.append(Paragraph("CRPIV - Comando Regional de Polícia IV", 
-                                ParagraphStyle('Sub', parent=styles['Normal'], fontSize=11, alignment=TA_CENTER, textColor=colors.grey)))
-        
-        # Informações dos filtros
-        filtro_info = []
-        if omp_filtro:
-            filtro_info.append(f"OPM Destino: {omp_filtro}")
-        if fonte_filtro:
-            filtro_info.append(f"Fonte: {fonte_filtro}")
-        
-        if filtro_info:
-            elements.append(Paragraph(f"Filtros aplicados: {' | '.join(filtro_info)}", 
-                                    ParagraphStyle('Filter', parent=styles['Normal'], fontSize=11, alignment=TA_CENTER, textColor=colors.grey)))
-        
-        elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", 
-                                ParagraphStyle('Date', parent=styles['Normal'], fontSize=11, alignment=TA_CENTER, textColor=colors.grey)))
-        elements.append(Spacer(1, 20))
-        
-        # Resumo executivo
-        total_missoes = len(missoes)
-        total_previsoes = sum([m.valor for m in missoes if m.status == 'previsao'])
-        total_autorizadas = sum([m.valor for m in missoes if m.status == 'autorizada'])
-        total_geral = total_previsoes + total_autorizadas
-        
-        resumo_data = [
-            ['RESUMO EXECUTIVO', ''],
-            ['Total de Missões:', f'{total_missoes:,}'],
-            ['Total em Previsão:', f'R$ {total_previsoes:,.2f}'.replace('.', ',')],
-            ['Total Autorizada:', f'R$ {total_autorizadas:,.2f}'.replace('.', ',')],
-            ['Valor Total Geral:', f'R$ {total_geral:,.2f}'.replace('.', ',')],
-            ['Unidades Envolvidas:', f'{len(missoes_por_unidade)} unidade(s)']
-        ]
-        
-        resumo_table = Table(resumo_data, colWidths=[3.5*inch, 2.5*inch])
-        resumo_table.setStyle(get_table_style_header())  # ✅ Usar função helper
-        
-        elements.append(resumo_table)
-        elements.append(Spacer(1, 30))
-        
-        # Missões por unidade
-        unidade_style = ParagraphStyle(
-            'UnidadeTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=15,
-            spaceBefore=20,
-            textColor=colors.HexColor('#2c5aa0'),
-            fontName='Helvetica-Bold'
-        )
-        
-        for unidade, dados in missoes_por_unidade.items():
-            # Título da unidade
-            elements.append(Paragraph(f"📍 {unidade}", unidade_style))
-            
-            # Resumo da unidade
-            unidade_resumo = [
-                ['Resumo da Unidade', 'Quantidade', 'Valor Total'],
-                ['Missões em Previsão', f"{len(dados['previsao'])}", f"R$ {dados['total_previsao']:,.2f}".replace('.', ',')],
-                ['Missões Autorizadas', f"{len(dados['autorizada'])}", f"R$ {dados['total_autorizada']:,.2f}".replace('.', ',')],
-                ['TOTAL DA UNIDADE', f"{len(dados['previsao']) + len(dados['autorizada'])}", f"R$ {dados['total_geral']:,.2f}".replace('.', ',')]
-            ]
-            
-            unidade_resumo_table = Table(unidade_resumo, colWidths=[3*inch, 1.5*inch, 2*inch])
-            unidade_resumo_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5aa0')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            
-            elements.append(unidade_resumo_table)
-            elements.append(Spacer(1, 15))
-            
-            # Tabelas de missões (autorizadas e previsões)
-            if dados['autorizada']:
-                elements.append(Paragraph(f"✅ Missões Autorizadas ({len(dados['autorizada'])})", 
-                                       ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, 
-                                                    textColor=colors.HexColor('#28a745'), fontName='Helvetica-Bold')))
-                
-                auth_data = [['OPM Destino', 'Descrição', 'Tipo', 'Período', 'Valor']]
-                
-                for missao in dados['autorizada']:
-                    auth_data.append([
-                        missao.opm_destino,
-                        (missao.descricao or '')[:35] + ('...' if len(missao.descricao or '') > 35 else ''),
-                        missao.tipo,
-                        missao.periodo or '-',
-                        f'R$ {missao.valor:,.2f}'.replace('.', ',')
-                    ])
-                
-                auth_table = Table(auth_data, colWidths=[1.2*inch, 2.3*inch, 1*inch, 1*inch, 1*inch])
-                auth_table.setStyle(create_missoes_table_style('#28a745', colors.lightgreen))
-                
-                elements.append(auth_table)
-                elements.append(Spacer(1, 10))
-            
-            if dados['previsao']:
-                elements.append(Paragraph(f"⏳ Missões em Previsão ({len(dados['previsao'])})", 
-                                       ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, 
-                                                    textColor=colors.HexColor('#ffc107'), fontName='Helvetica-Bold')))
-                
-                prev_data = [['OPM Destino', 'Descrição', 'Tipo', 'Período', 'Valor']]
-                
-                for missao in dados['previsao']:
-                    prev_data.append([
-                        missao.opm_destino,
-                        (missao.descricao or '')[:35] + ('...' if len(missao.descricao or '') > 35 else ''),
-                        missao.tipo,
-                        missao.periodo or '-',
-                        f'R$ {missao.valor:,.2f}'.replace('.', ',')
-                    ])
-                
-                prev_table = Table(prev_data, colWidths=[1.2*inch, 2.3*inch, 1*inch, 1*inch, 1*inch])
-                prev_table.setStyle(create_missoes_table_style('#ffc107', colors.lightyellow))
-                
-                elements.append(prev_table)
-                elements.append(Spacer(1, 10))
-            
-            elements.append(Spacer(1, 20))
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("_" * 80, ParagraphStyle('Line', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER)))
-        elements.append(Paragraph(
-            f"Relatório gerado automaticamente pelo Sistema CRPIV em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-            ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-        ))
-        
-        # Gerar PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        # Nome do arquivo com filtros
-        nome_arquivo = "missoes_por_unidade"
-        if fonte_filtro:
-            nome_arquivo += f"_{fonte_filtro.replace(' ', '_')}"
-        if omp_filtro:
-            nome_arquivo += f"_destino_{omp_filtro.replace(' ', '_')}"
-        nome_arquivo += f"_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
-        
-        print(f"✅ PDF gerado: {nome_arquivo}")
-        
-        return Response(
-            buffer.getvalue(),
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename={nome_arquivo}'
+    """Exportar missões para PDF (mantida para links antigos; aceita opm_filtro e fonte_filtro)"""
+    return responder_relatorio('missoes', 'pdf', request.args, rota_erro='missoes')
+
+
+@rotas.route('/exportar_pdf')
+def exportar_pdf():
+    """Exportar relatórios em PDF - VERSÃO UNIFICADA"""
+    tipo = request.args.get('tipo', 'orcamento')
+
+    # ✅ O relatório "unidade" é o orçamentário com filtro de unidade
+    if tipo == 'unidade':
+        tipo = 'orcamento'
+
+    if tipo == 'missoes':
+        return responder_relatorio('missoes', 'pdf', request.args, rota_erro='missoes')
+    if tipo == 'movimentacoes':
+        return responder_relatorio('movimentacoes', 'pdf', request.args, rota_erro='relatorio_movimentacoes')
+
+    return responder_relatorio(tipo, 'pdf', request.args)
+
+
+@reports.construtor('graficos', filtros=('unidade', 'por_mes'))
+def dataset_graficos(unidade='', por_mes=''):
+    """Séries dos gráficos de /relatorios a partir de uma única consulta agrupada"""
+    totais_geral = calcular_orcamento_total_todos_bimestres()
+
+    # ✅ Uma consulta agrupada alimenta as séries por tipo, unidade, status e mês
+    colunas = [Missao.fonte_dinheiro, Missao.tipo, Missao.status]
+    if por_mes:
+        colunas.append(Missao.mes)
+    query = db.session.query(*colunas, db.func.count(Missao.id), db.func.sum(Missao.valor))
+    if unidade:
+        query = query.filter(Missao.fonte_dinheiro == unidade)
+    agregados = query.group_by(*colunas).all()
+
+    unidades = [u for u in UNIDADES if not unidade or u == unidade]
+    autorizado_tipo = dict.fromkeys(TIPOS_ORCAMENTO, 0)
+    por_unidade = {u: {'previsao': 0, 'autorizada': 0} for u in unidades}
+    por_status = {'previsao': {'quantidade': 0, 'valor': 0}, 'autorizada': {'quantidade': 0, 'valor': 0}}
+    por_mes_status = {m: {'previsao': 0, 'autorizada': 0} for m in MESES}
+
+    for linha in agregados:
+        fonte, tipo, status = linha[0], linha[1], linha[2]
+        quantidade, valor = linha[-2], linha[-1] or 0
+        if status not in por_status:
+            continue
+        por_status[status]['quantidade'] += quantidade
+        por_status[status]['valor'] += valor
+        if fonte in por_unidade:
+            por_unidade[fonte][status] += valor
+        if status == 'autorizada' and tipo in autorizado_tipo:
+            autorizado_tipo[tipo] += valor
+        if por_mes and linha[3] in por_mes_status:
+            por_mes_status[linha[3]][status] += valor
+
+    orcamento_tipo = [totais_geral[TIPO_PARA_CAMPO[tipo]] for tipo in TIPOS_ORCAMENTO]
+    total_orcamento = sum(orcamento_tipo)
+
+    series = {
+        'por_tipo': {
+            'rotulos': TIPOS_ORCAMENTO,
+            'orcamento': orcamento_tipo,
+            'autorizado': [autorizado_tipo[tipo] for tipo in TIPOS_ORCAMENTO]
+        },
+        'por_unidade': {
+            'rotulos': unidades,
+            'previsao': [por_unidade[u]['previsao'] for u in unidades],
+            'autorizado': [por_unidade[u]['autorizada'] for u in unidades]
+        },
+        'por_status': {
+            'rotulos': ['Previsões', 'Autorizadas'],
+            'valores': [por_status['previsao']['valor'], por_status['autorizada']['valor']],
+            'quantidades': [por_status['previsao']['quantidade'], por_status['autorizada']['quantidade']]
+        }
+    }
+    if por_mes:
+        series['por_mes'] = {
+            'rotulos': MESES,
+            'previsao': [por_mes_status[m]['previsao'] for m in MESES],
+            'autorizado': [por_mes_status[m]['autorizada'] for m in MESES]
+        }
+
+    return {
+        'nome_arquivo': f"graficos_{unidade.replace(' ', '_') if unidade else 'geral'}",
+        'resumo': {
+            'total_orcamento': total_orcamento,
+            'total_previsoes': por_status['previsao']['valor'],
+            'total_autorizadas': por_status['autorizada']['valor'],
+            'disponivel': total_orcamento - por_status['autorizada']['valor']
+        },
+        'series': series,
+        'tabelas': [
+            {
+                'titulo': 'Orçamento e Autorizado por Tipo',
+                'colunas': [
+                    {'chave': 'tipo', 'rotulo': 'Tipo'},
+                    {'chave': 'orcamento', 'rotulo': 'Orçamento', 'formato': 'moeda'},
+                    {'chave': 'autorizado', 'rotulo': 'Autorizado', 'formato': 'moeda'}
+                ],
+                'linhas': [
+                    {'tipo': tipo, 'orcamento': orcado, 'autorizado': autorizado_tipo[tipo]}
+                    for tipo, orcado in zip(TIPOS_ORCAMENTO, orcamento_tipo)
+                ]
+            },
+            {
+                'titulo': 'Missões por Unidade',
+                'colunas': [
+                    {'chave': 'unidade', 'rotulo': 'Unidade'},
+                    {'chave': 'previsao', 'rotulo': 'Previsão', 'formato': 'moeda'},
+                    {'chave': 'autorizada', 'rotulo': 'Autorizado', 'formato': 'moeda'}
+                ],
+                'linhas': [dict(unidade=u, **por_unidade[u]) for u in unidades]
             }
-        )
-        
-    except Exception as e:
-        print(f"❌ Erro na exportação PDF de missões: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Erro ao exportar relatório de missões em PDF', 'error')
-        return redirect(url_for('missoes'))
+        ]
+    }
 
 
-def preparar_dados_relatorio(unidade_filtro=''):
-    """Prepara dados para o relatório"""
+@rotas.route('/dados_graficos')
+def dados_graficos():
+    """Séries dos gráficos de /relatorios em JSON (servidas do cache de relatórios)"""
+    filtros = {
+        'unidade': request.args.get('unidade_filtro', ''),
+        'por_mes': '1' if request.args.get('por_mes') else ''
+    }
     try:
-        # Usar orçamento total de todos os bimestres
-        totais_geral = calcular_orcamento_total_todos_bimestres()
-        tipos_valores = [
-            totais_geral['diarias'],
-            totais_geral['derso'],
-            totais_geral['diarias_pav'],
-            totais_geral['derso_pav']
-        ]
-        
-        # Gráfico por unidade (gastos autorizados) - com filtro
-        gastos_unidade = {}
-        for unidade in UNIDADES:
-            if unidade_filtro and unidade != unidade_filtro:
-                continue
-                
-            total_gasto = db.session.query(Missao).filter_by(
-                fonte_dinheiro=unidade, 
-                status='autorizada'
-            ).with_entities(db.func.sum(Missao.valor)).scalar() or 0
-            gastos_unidade[unidade] = total_gasto
-        
-        # Gráfico por status - considerando filtro de unidade
-        query_previsoes = db.session.query(Missao).filter_by(status='previsao')
-        query_autorizadas = db.session.query(Missao).filter_by(status='autorizada')
-        
-        if unidade_filtro:
-            query_previsoes = query_previsoes.filter(Missao.fonte_dinheiro == unidade_filtro)
-            query_autorizadas = query_autorizadas.filter(Missao.fonte_dinheiro == unidade_filtro)
-        
-        total_previsoes = query_previsoes.with_entities(db.func.sum(Missao.valor)).scalar() or 0
-        total_autorizadas = query_autorizadas.with_entities(db.func.sum(Missao.valor)).scalar() or 0
-        
-        return {
-            'tipos_orcamento': TIPOS_ORCAMENTO,
-            'tipos_valores': tipos_valores,
-            'unidades': list(gastos_unidade.keys()),
-            'gastos_unidade': list(gastos_unidade.values()),
-            'status_labels': ['Previsões', 'Autorizadas'],
-            'status_valores': [total_previsoes, total_autorizadas],
-            'unidade_filtro': unidade_filtro
-        }
-        
+        conteudo, mimetype, _ = reports.renderizar('graficos', 'json', filtros)
     except Exception as e:
-        print(f"❌ Erro ao preparar dados: {e}")
-        return {
-            'tipos_orcamento': TIPOS_ORCAMENTO,
-            'tipos_valores': [0, 0, 0, 0],
-            'unidades': [],
-            'gastos_unidade': [],
-            'status_labels': ['Previsões', 'Autorizadas'],
-            'status_valores': [0, 0],
-            'unidade_filtro': unidade_filtro
-        }
-    
+        logger.error('Erro ao gerar dados dos gráficos: %s', e)
+        return jsonify({'erro': 'Erro ao gerar dados dos gráficos'}), 500
+
+    # ✅ ETag permite que a atualização dos gráficos receba 304 quando nada mudou
+    resposta = Response(conteudo, mimetype=mimetype)
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
 
 def verificar_saldo_disponivel_missao(missao):
     """Verifica se há saldo disponível para autorizar uma missão - VERSÃO CORRIGIDA"""
     try:
-        print(f"🔍 Verificando saldo para missão: {missao.fonte_dinheiro} - {missao.tipo} - R$ {missao.valor:,.2f}")
+        logger.debug('Verificando saldo para missão: %s - %s - R$ %.2f', missao.fonte_dinheiro, missao.tipo, missao.valor)
         
         if missao.fonte_dinheiro == 'CRPIV':
             # ✅ MISSÃO DO CRPIV - Verificar saldo não distribuído
             saldo_crpiv = calcular_saldo_disponivel_crpiv(missao.tipo)
             
-            print(f"💰 Saldo CRPIV disponível para {missao.tipo}: R$ {saldo_crpiv:,.2f}")
+            logger.debug('Saldo CRPIV disponível para %s: R$ %.2f', missao.tipo, saldo_crpiv)
             
             if saldo_crpiv >= missao.valor:
                 return {
@@ -693,11 +624,7 @@ def verificar_saldo_disponivel_missao(missao):
             
             saldo_disponivel = distribuido - autorizado
             
-            print(f"📊 Análise de saldo {missao.fonte_dinheiro} - {missao.tipo}:")
-            print(f"   Distribuído: R$ {distribuido:,.2f}")
-            print(f"   Já autorizado: R$ {autorizado:,.2f}")
-            print(f"   Disponível: R$ {saldo_disponivel:,.2f}")
-            print(f"   Necessário: R$ {missao.valor:,.2f}")
+            logger.debug('Análise de saldo %s - %s: Distribuído: R$ %.2f | Já autorizado: R$ %.2f | Disponível: R$ %.2f | Necessário: R$ %.2f', missao.fonte_dinheiro, missao.tipo, distribuido, autorizado, saldo_disponivel, missao.valor)
             
             if saldo_disponivel >= missao.valor:
                 return {
@@ -713,7 +640,7 @@ def verificar_saldo_disponivel_missao(missao):
                 }
                 
     except Exception as e:
-        print(f"❌ Erro ao verificar saldo: {e}")
+        logger.error('Erro ao verificar saldo: %s', e)
         return {
             'pode_autorizar': False,
             'saldo_disponivel': 0,
@@ -783,13 +710,13 @@ def buscar_opcoes_transferencia(missao, deficit):
         }
         
     except Exception as e:
-        print(f"❌ Erro ao buscar opções: {e}")
+        logger.error('Erro ao buscar opções: %s', e)
         return {'opcoes_transferencia': [], 'opcoes_crpiv': {'tem_saldo': False}, 'total_opcoes': 0}
 
 def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_orcamento, valor):
     """Executa transferência de saldo entre unidades - VERSÃO CORRIGIDA"""
     try:
-        print(f"🔄 Executando transferência: {unidade_origem} → {unidade_destino} - {tipo_orcamento} - R$ {valor:,.2f}")
+        logger.debug('Executando transferência: %s → %s - %s - R$ %.2f', unidade_origem, unidade_destino, tipo_orcamento, valor)
         
         # ✅ VALIDAÇÕES INICIAIS
         if valor <= 0:
@@ -810,7 +737,7 @@ def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_
         if distribuicao_origem.valor < valor:
             return {'sucesso': False, 'erro': f'Saldo insuficiente. Disponível: R$ {distribuicao_origem.valor:,.2f}, Solicitado: R$ {valor:,.2f}'}
         
-        print(f"✅ Distribuição origem encontrada: R$ {distribuicao_origem.valor:,.2f}")
+        logger.debug('Distribuição origem encontrada: R$ %.2f', distribuicao_origem.valor)
         
         # ✅ VERIFICAR SALDO REAL DISPONÍVEL (Distribuído - Autorizado)
         autorizado_origem = db.session.query(
@@ -826,15 +753,13 @@ def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_
         if saldo_real_origem < valor:
             return {'sucesso': False, 'erro': f'Saldo real insuficiente. Disponível: R$ {saldo_real_origem:,.2f} (R$ {autorizado_origem:,.2f} já autorizados)'}
         
-        print(f"✅ Saldo real verificado: R$ {saldo_real_origem:,.2f}")
+        logger.debug('Saldo real verificado: R$ %.2f', saldo_real_origem)
         
         # ✅ REDUZIR VALOR DA UNIDADE ORIGEM
         valor_original_origem = distribuicao_origem.valor
         distribuicao_origem.valor -= valor
         
-        print(f"📉 Reduzindo distribuição de {unidade_origem}:")
-        print(f"   De: R$ {valor_original_origem:,.2f}")
-        print(f"   Para: R$ {distribuicao_origem.valor:,.2f}")
+        logger.debug('Reduzindo distribuição de %s: De: R$ %.2f | Para: R$ %.2f', unidade_origem, valor_original_origem, distribuicao_origem.valor)
         
         # ✅ BUSCAR OU CRIAR DISTRIBUIÇÃO NA UNIDADE DESTINO
         distribuicao_destino = db.session.query(Distribuicao).filter_by(
@@ -842,13 +767,12 @@ def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_
             tipo_orcamento=tipo_orcamento,
             orcamento_id=distribuicao_origem.orcamento_id
         ).first()
+        valor_original_destino = 0
         
         if distribuicao_destino:
             valor_original_destino = distribuicao_destino.valor
             distribuicao_destino.valor += valor
-            print(f"📈 Aumentando distribuição de {unidade_destino}:")
-            print(f"   De: R$ {valor_original_destino:,.2f}")
-            print(f"   Para: R$ {distribuicao_destino.valor:,.2f}")
+            logger.debug('Aumentando distribuição de %s: De: R$ %.2f | Para: R$ %.2f', unidade_destino, valor_original_destino, distribuicao_destino.valor)
         else:
             # Criar nova distribuição
             distribuicao_destino = Distribuicao(
@@ -859,7 +783,7 @@ def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_
                 data_distribuicao=datetime.utcnow()
             )
             db.session.add(distribuicao_destino)
-            print(f"✅ Criando nova distribuição para {unidade_destino}: R$ {valor:,.2f}")
+            logger.debug('Criando nova distribuição para %s: R$ %.2f', unidade_destino, valor)
         
         # ✅ REGISTRAR MOVIMENTAÇÃO DE LOG
         registrar_movimentacao(
@@ -872,28 +796,26 @@ def executar_transferencia_entre_unidades(unidade_origem, unidade_destino, tipo_
             orcamento_id=distribuicao_origem.orcamento_id
         )
         
-        print(f"✅ Transferência preparada com sucesso!")
+        logger.debug('Transferência preparada com sucesso!')
         
         return {
             'sucesso': True,
             'valor_transferido': valor,
             'saldo_origem_anterior': valor_original_origem,
             'saldo_origem_atual': distribuicao_origem.valor,
-            'saldo_destino_anterior': valor_original_destino if distribuicao_destino else 0,
+            'saldo_destino_anterior': valor_original_destino,
             'saldo_destino_atual': distribuicao_destino.valor
         }
         
     except Exception as e:
-        print(f"❌ Erro na transferência: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro na transferência')
         return {'sucesso': False, 'erro': str(e)}
 
 
 def executar_nova_distribuicao_crpiv(unidade_destino, tipo_orcamento, valor):
     """Executa nova distribuição do CRPIV para uma unidade"""
     try:
-        print(f"📤 Nova distribuição: CRPIV → {unidade_destino} - {tipo_orcamento} - R$ {valor:,.2f}")
+        logger.debug('Nova distribuição: CRPIV → %s - %s - R$ %.2f', unidade_destino, tipo_orcamento, valor)
         
         # Verificar se CRPIV tem saldo
         saldos_crpiv = calcular_saldos_para_distribuir()
@@ -947,19 +869,18 @@ def executar_nova_distribuicao_crpiv(unidade_destino, tipo_orcamento, valor):
         return {'sucesso': True}
         
     except Exception as e:
-        print(f"❌ Erro na nova distribuição: {e}")
+        logger.error('Erro na nova distribuição: %s', e)
         return {'sucesso': False, 'erro': str(e)}
 
 def registrar_movimentacao(tipo, descricao="", unidade_origem=None, unidade_destino=None, 
-                          tipo_orcamento=None, valor=None, usuario=None, orcamento_id=None, missao_id=None):
-    """Registra todas as movimentações orçamentárias - VERSÃO COM DEBUG"""
+                          tipo_orcamento=None, valor=None, usuario=None, orcamento_id=None, missao_id=None,
+                          commit=True):
+    """Registra todas as movimentações orçamentárias.
+
+    Com ``commit=False`` só adiciona à sessão: o registro entra no mesmo commit
+    das alterações de saldo feitas pelo chamador.
+    """
     try:
-        print(f"🔍 TENTANDO REGISTRAR MOVIMENTAÇÃO:")
-        print(f"   Tipo: {tipo}")
-        print(f"   Descrição: {descricao}")
-        print(f"   Valor: {valor}")
-        
-        # ✅ VERIFICAR SE A CLASSE EXISTE
         try:
             movimento = MovimentacaoOrcamentaria(
                 tipo=tipo,
@@ -972,45 +893,28 @@ def registrar_movimentacao(tipo, descricao="", unidade_origem=None, unidade_dest
                 orcamento_id=orcamento_id,
                 missao_id=missao_id
             )
-            print(f"✅ Objeto MovimentacaoOrcamentaria criado com sucesso")
-            
             db.session.add(movimento)
-            print(f"✅ Movimento adicionado à sessão")
-            
+            if not commit:
+                return
             db.session.commit()
-            print(f"✅ Movimento commitado no banco")
+            logger.debug('Movimentação registrada: %s - %s (R$ %s)', tipo, descricao, valor)
             
-            # Verificar se foi salvo
-            total_after = MovimentacaoOrcamentaria.query.count()
-            print(f"📊 Total de registros após insert: {total_after}")
-            
-            print(f"📝 Log registrado com sucesso: {tipo} - {descricao}")
-            
-        except Exception as db_error:
-            print(f"❌ Erro ao salvar no banco: {db_error}")
-            print(f"   Fazendo rollback...")
+        except Exception:
+            logger.exception('Erro ao salvar movimentação %s; fazendo rollback', tipo)
             db.session.rollback()
             
-            # Tentar verificar o erro específico
-            import traceback
-            traceback.print_exc()
-            
     except Exception as e:
-        print(f"❌ Erro geral ao registrar log: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro geral ao registrar log')
 
 
 def debug_distribuicao_completo():
     """Função para diagnosticar todos os problemas de distribuição"""
-    print("=" * 60)
-    print("🔍 DIAGNÓSTICO COMPLETO DO SISTEMA DE DISTRIBUIÇÃO")
-    print("=" * 60)
+    logger.debug('DIAGNÓSTICO COMPLETO DO SISTEMA DE DISTRIBUIÇÃO')
     
     try:
         # 1. Verificar orçamentos
         orcamentos = Orcamento.query.all()
-        print(f"📊 Total de orçamentos: {len(orcamentos)}")
+        logger.debug('Total de orçamentos: %s', len(orcamentos))
         
         total_geral = {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
         for orc in orcamentos:
@@ -1019,35 +923,30 @@ def debug_distribuicao_completo():
             total_geral['diarias_pav'] += orc.diarias_pav or 0
             total_geral['derso_pav'] += orc.derso_pav or 0
         
-        print("💰 Orçamento total base:")
-        for tipo, valor in total_geral.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Orçamento total base: %s', total_geral)
         
         # 2. Verificar complementações
         complementacoes = ComplementacaoOrcamento.query.all()
-        print(f"📈 Total de complementações: {len(complementacoes)}")
+        logger.debug('Total de complementações: %s', len(complementacoes))
         
         # 3. Verificar distribuições
         distribuicoes = Distribuicao.query.all()
-        print(f"📤 Total de distribuições: {len(distribuicoes)}")
+        logger.debug('Total de distribuições: %s', len(distribuicoes))
         
         total_distribuido = sum([d.valor for d in distribuicoes])
-        print(f"💸 Total distribuído: R$ {total_distribuido:,.2f}")
+        logger.debug('Total distribuído: R$ %.2f', total_distribuido)
         
         # 4. Verificar missões
         missoes_prev = Missao.query.filter_by(status='previsao').all()
         missoes_aut = Missao.query.filter_by(status='autorizada').all()
         
-        print(f"📋 Missões em previsão: {len(missoes_prev)}")
-        print(f"✅ Missões autorizadas: {len(missoes_aut)}")
+        logger.debug('Missões em previsão: %s | Missões autorizadas: %s', len(missoes_prev), len(missoes_aut))
         
         total_prev = sum([m.valor for m in missoes_prev])
         total_aut = sum([m.valor for m in missoes_aut])
         
-        print(f"💰 Valor previsões: R$ {total_prev:,.2f}")
-        print(f"💰 Valor autorizadas: R$ {total_aut:,.2f}")
+        logger.debug('Valor previsões: R$ %.2f | Valor autorizadas: R$ %.2f', total_prev, total_aut)
         
-        print("=" * 60)
         
         return {
             'status': 'OK',
@@ -1057,11 +956,11 @@ def debug_distribuicao_completo():
         }
         
     except Exception as e:
-        print(f"❌ Erro no diagnóstico: {e}")
+        logger.error('Erro no diagnóstico: %s', e)
         return {'status': 'ERRO', 'erro': str(e)}
 
 
-@app.route('/autorizar_missao/<int:missao_id>')
+@rotas.route('/autorizar_missao/<int:missao_id>')
 def autorizar_missao(missao_id):
     """Autorizar missão com validação de saldo e registro de distribuição"""
     try:
@@ -1074,7 +973,7 @@ def autorizar_missao(missao_id):
             flash('Missão já está autorizada', 'info')
             return redirect(url_for('missoes'))
         
-        print(f"🔍 Autorizando missão {missao_id}: {missao.fonte_dinheiro} → {missao.opm_destino} - R$ {missao.valor:,.2f}")
+        logger.debug('Autorizando missão %s: %s → %s - R$ %.2f', missao_id, missao.fonte_dinheiro, missao.opm_destino, missao.valor)
         
         # ✅ VERIFICAR SALDO DISPONÍVEL
         analise_saldo = verificar_saldo_disponivel_missao(missao)
@@ -1104,9 +1003,7 @@ def autorizar_missao(missao_id):
                     distribuicao_existente.valor += missao.valor
                     distribuicao_existente.data_distribuicao = datetime.utcnow()
                     
-                    print(f"📈 Atualizando distribuição existente {missao.fonte_dinheiro}:")
-                    print(f"   De: R$ {valor_anterior:,.2f}")
-                    print(f"   Para: R$ {distribuicao_existente.valor:,.2f}")
+                    logger.debug('Atualizando distribuição existente %s: De: R$ %.2f | Para: R$ %.2f', missao.fonte_dinheiro, valor_anterior, distribuicao_existente.valor)
                 else:
                     # Criar nova distribuição
                     nova_distribuicao = Distribuicao(
@@ -1118,29 +1015,31 @@ def autorizar_missao(missao_id):
                     )
                     db.session.add(nova_distribuicao)
                     
-                    print(f"✅ Criando nova distribuição {missao.fonte_dinheiro}: R$ {missao.valor:,.2f}")
+                    logger.debug('Criando nova distribuição %s: R$ %.2f', missao.fonte_dinheiro, missao.valor)
                 
                 # 3. ✅ REGISTRAR LOG DE DISTRIBUIÇÃO
                 registrar_movimentacao(
                     tipo='distribuicao',
-                    descricao=f'Distribuição automática: Missão {missao.id} - {missao.fonte_dinheiro} → {missao.omp_destino}',
+                    descricao=f'Distribuição automática: Missão {missao.id} - {missao.fonte_dinheiro} → {missao.opm_destino}',
                     unidade_origem='CRPIV' if missao.fonte_dinheiro != 'CRPIV' else 'Sistema',
                     unidade_destino=missao.fonte_dinheiro,
                     tipo_orcamento=missao.tipo,
                     valor=missao.valor,
                     orcamento_id=orcamento_recente.id,
-                    missao_id=missao.id
+                    missao_id=missao.id,
+                    commit=False
                 )
             
-            # 4. ✅ REGISTRAR LOG DE AUTORIZAÇÃO
+            # 4. ✅ REGISTRAR LOG DE AUTORIZAÇÃO (mesmo commit da distribuição)
             registrar_movimentacao(
                 tipo='autorizacao_missao',
                 descricao=f'Missão autorizada: {missao.descricao[:50]}...',
                 unidade_origem=missao.fonte_dinheiro,
-                unidade_destino=missao.omp_destino,
+                unidade_destino=missao.opm_destino,
                 tipo_orcamento=missao.tipo,
                 valor=missao.valor,
-                missao_id=missao.id
+                missao_id=missao.id,
+                commit=False
             )
             
             db.session.commit()
@@ -1164,68 +1063,72 @@ def autorizar_missao(missao_id):
                                  opcoes=opcoes)
                                  
     except Exception as e:
-        print(f"❌ Erro ao autorizar missão: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro ao autorizar missão')
         db.session.rollback()  # ✅ ADICIONAR ROLLBACK
         flash(f'Erro ao autorizar missão: {str(e)}', 'error')
         return redirect(url_for('missoes'))
 
+def calcular_saldos_disponiveis_crpiv():
+    """Saldo não distribuído do CRPIV por tipo: {tipo: saldo}.
+
+    Orçamento total (cota + complementações) menos TODAS as distribuições,
+    inclusive as do próprio CRPIV, em consultas agrupadas por tipo.
+    """
+    totais_geral = calcular_orcamento_total_todos_bimestres()
+    distribuido = dict(db.session.query(
+        Distribuicao.tipo_orcamento,
+        db.func.sum(Distribuicao.valor)
+    ).group_by(Distribuicao.tipo_orcamento).all())
+
+    saldos = {}
+    for tipo in TIPOS_ORCAMENTO:
+        saldo = totais_geral[TIPO_PARA_CAMPO[tipo]] - (distribuido.get(tipo) or 0)
+        logger.debug('CRPIV - %s: Total orçamentário: R$ %.2f | Saldo não distribuído: R$ %.2f', tipo, totais_geral[TIPO_PARA_CAMPO[tipo]], saldo)
+        saldos[tipo] = max(0, saldo)  # Nunca retornar negativo
+    return saldos
+
+
 def calcular_saldo_disponivel_crpiv(tipo_orcamento):
     """Calcula saldo disponível do CRPIV (não distribuído) - VERSÃO CORRIGIDA"""
     try:
-        print(f"🔍 Calculando saldo CRPIV não distribuído para {tipo_orcamento}")
-        
-        # ✅ TOTAL ORÇAMENTÁRIO (COTA + COMPLEMENTAÇÕES)
-        total_orcamentario = 0
-        
-        # Somar orçamento base de todos os bimestres
-        orcamentos = Orcamento.query.all()
-        for orc in orcamentos:
-            if tipo_orcamento == 'DIÁRIAS':
-                total_orcamentario += orc.diarias or 0
-            elif tipo_orcamento == 'DERSO':
-                total_orcamentario += orc.derso or 0
-            elif tipo_orcamento == 'DIÁRIAS PAV':
-                total_orcamentario += orc.diarias_pav or 0
-            elif tipo_orcamento == 'DERSO PAV':
-                total_orcamentario += orc.derso_pav or 0
-        
-        # Somar complementações
-        complementacoes_total = db.session.query(
-            db.func.sum(ComplementacaoOrcamento.valor)
-        ).filter(
-            ComplementacaoOrcamento.tipo_orcamento == tipo_orcamento
-        ).scalar() or 0
-        
-        total_orcamentario += complementacoes_total
-        
-        # ✅ TOTAL DISTRIBUÍDO (PARA SUBUNIDADES + USADO PELO CRPIV)
-        total_distribuido = db.session.query(
-            db.func.sum(Distribuicao.valor)
-        ).filter(
-            Distribuicao.tipo_orcamento == tipo_orcamento
-            # ✅ INCLUIR TODAS as distribuições (subunidades E CRPIV)
-        ).scalar() or 0
-        
-        # ✅ SALDO DISPONÍVEL = ORÇAMENTO TOTAL - DISTRIBUÍDO
-        saldo_disponivel = total_orcamentario - total_distribuido
-        
-        print(f"📊 CRPIV - {tipo_orcamento}:")
-        print(f"   Total orçamentário: R$ {total_orcamentario:,.2f}")
-        print(f"   Total distribuído: R$ {total_distribuido:,.2f}")
-        print(f"   Saldo não distribuído: R$ {saldo_disponivel:,.2f}")
-        
-        return max(0, saldo_disponivel)  # Nunca retornar negativo
-        
+        return calcular_saldos_disponiveis_crpiv().get(tipo_orcamento, 0)
     except Exception as e:
-        print(f"❌ Erro ao calcular saldo CRPIV: {e}")
+        logger.error('Erro ao calcular saldo CRPIV: %s', e)
         return 0
 
+
+def somar_distribuido_e_autorizado(orcamento_id=None):
+    """Distribuído e autorizado por (unidade, tipo) em duas consultas agrupadas.
+
+    ``orcamento_id`` restringe o distribuído a um bimestre; o autorizado é
+    sempre o total da unidade.
+    """
+    query = db.session.query(
+        Distribuicao.unidade,
+        Distribuicao.tipo_orcamento,
+        db.func.sum(Distribuicao.valor)
+    )
+    if orcamento_id is not None:
+        query = query.filter(Distribuicao.orcamento_id == orcamento_id)
+    distribuido = {
+        (unidade, tipo): total or 0
+        for unidade, tipo, total in query.group_by(Distribuicao.unidade, Distribuicao.tipo_orcamento)
+    }
+
+    autorizado = {
+        (fonte, tipo): total or 0
+        for fonte, tipo, total in db.session.query(
+            Missao.fonte_dinheiro,
+            Missao.tipo,
+            db.func.sum(Missao.valor)
+        ).filter(Missao.status == 'autorizada').group_by(Missao.fonte_dinheiro, Missao.tipo)
+    }
+    return distribuido, autorizado
+
 def executar_distribuicao_crpiv_para_unidade(unidade_destino, tipo_orcamento, valor):
     """Executa nova distribuição do CRPIV para uma unidade"""
     try:
-        print(f"📤 Distribuindo do CRPIV: {unidade_destino} - {tipo_orcamento} - R$ {valor:,.2f}")
+        logger.debug('Distribuindo do CRPIV: %s - %s - R$ %.2f', unidade_destino, tipo_orcamento, valor)
         
         # ✅ VALIDAÇÕES
         if valor <= 0:
@@ -1258,9 +1161,7 @@ def executar_distribuicao_crpiv_para_unidade(unidade_destino, tipo_orcamento, va
             distribuicao_existente.valor += valor
             distribuicao_existente.data_distribuicao = datetime.utcnow()
             
-            print(f"📈 Atualizando distribuição existente:")
-            print(f"   De: R$ {valor_anterior:,.2f}")
-            print(f"   Para: R$ {distribuicao_existente.valor:,.2f}")
+            logger.debug('Atualizando distribuição existente: De: R$ %.2f | Para: R$ %.2f', valor_anterior, distribuicao_existente.valor)
         else:
             nova_distribuicao = Distribuicao(
                 orcamento_id=orcamento_recente.id,
@@ -1271,7 +1172,7 @@ def executar_distribuicao_crpiv_para_unidade(unidade_destino, tipo_orcamento, va
             )
             db.session.add(nova_distribuicao)
             
-            print(f"✅ Criando nova distribuição: R$ {valor:,.2f}")
+            logger.debug('Criando nova distribuição: R$ %.2f', valor)
         
         # ✅ REGISTRAR LOG
         registrar_movimentacao(
@@ -1287,15 +1188,13 @@ def executar_distribuicao_crpiv_para_unidade(unidade_destino, tipo_orcamento, va
         return {'sucesso': True, 'valor_transferido': valor}
         
     except Exception as e:
-        print(f"❌ Erro na distribuição CRPIV: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro na distribuição CRPIV')
         return {'sucesso': False, 'erro': str(e)}
 
 def executar_recolhimento_unidade_para_crpiv(unidade_origem, tipo_orcamento, valor):
     """Executa recolhimento de saldo de uma unidade para o CRPIV"""
     try:
-        print(f"📥 Recolhendo para CRPIV: {unidade_origem} - {tipo_orcamento} - R$ {valor:,.2f}")
+        logger.debug('Recolhendo para CRPIV: %s - %s - R$ %.2f', unidade_origem, tipo_orcamento, valor)
         
         # ✅ VALIDAÇÕES
         if valor <= 0:
@@ -1331,9 +1230,7 @@ def executar_recolhimento_unidade_para_crpiv(unidade_origem, tipo_orcamento, val
         valor_original = distribuicao_origem.valor
         distribuicao_origem.valor -= valor
         
-        print(f"📉 Reduzindo distribuição de {unidade_origem}:")
-        print(f"   De: R$ {valor_original:,.2f}")
-        print(f"   Para: R$ {distribuicao_origem.valor:,.2f}")
+        logger.debug('Reduzindo distribuição de %s: De: R$ %.2f | Para: R$ %.2f', unidade_origem, valor_original, distribuicao_origem.valor)
         
         # ✅ CRIAR REGISTRO DE RECOLHIMENTO
         recolhimento = RecolhimentoSaldo(
@@ -1361,12 +1258,48 @@ def executar_recolhimento_unidade_para_crpiv(unidade_origem, tipo_orcamento, val
         return {'sucesso': True, 'valor_transferido': valor}
         
     except Exception as e:
-        print(f"❌ Erro no recolhimento: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro no recolhimento')
         return {'sucesso': False, 'erro': str(e)}
 
-@app.route('/transferir_saldo', methods=['GET', 'POST'])
+def calcular_saldos_transferencia():
+    """Saldos disponíveis por unidade e tipo, como exibidos em /transferir_saldo"""
+    # ✅ BUSCAR SALDOS DISPONÍVEIS POR UNIDADE (INCLUINDO CRPIV)
+    saldos_disponiveis = {}
+    saldos_crpiv = calcular_saldos_disponiveis_crpiv()
+    distribuido_por_chave, autorizado_por_chave = somar_distribuido_e_autorizado()
+    
+    # ✅ INCLUIR TODAS AS UNIDADES (inclusive CRPIV)
+    for unidade in UNIDADES:  # AGORA INCLUI CRPIV
+        saldos_disponiveis[unidade] = {}
+        
+        for tipo in TIPOS_ORCAMENTO:
+            if unidade == 'CRPIV':
+                # ✅ CÁLCULO ESPECIAL PARA CRPIV
+                saldo_crpiv = saldos_crpiv[tipo]
+                if saldo_crpiv > 0:
+                    saldos_disponiveis[unidade][tipo] = {
+                        'distribuido': 0,  # CRPIV não recebe distribuições
+                        'autorizado': 0,   # CRPIV não autoriza missões
+                        'disponivel': saldo_crpiv
+                    }
+            else:
+                # ✅ CÁLCULO PARA SUBUNIDADES
+                distribuido = distribuido_por_chave.get((unidade, tipo), 0)
+                autorizado = autorizado_por_chave.get((unidade, tipo), 0)
+                
+                saldo_disponivel = distribuido - autorizado
+                
+                if saldo_disponivel > 0:
+                    saldos_disponiveis[unidade][tipo] = {
+                        'distribuido': distribuido,
+                        'autorizado': autorizado,
+                        'disponivel': saldo_disponivel
+                    }
+    
+    return saldos_disponiveis
+
+
+@rotas.route('/transferir_saldo', methods=['GET', 'POST'])
 def transferir_saldo():
     """Interface para transferir saldo entre unidades - INCLUINDO CRPIV"""
     if request.method == 'POST':
@@ -1376,11 +1309,7 @@ def transferir_saldo():
             tipo_orcamento = request.form['tipo_orcamento']
             valor = float(request.form['valor'])
             
-            print(f"🔄 Solicitação de transferência recebida:")
-            print(f"   Origem: {unidade_origem}")
-            print(f"   Destino: {unidade_destino}")
-            print(f"   Tipo: {tipo_orcamento}")
-            print(f"   Valor: R$ {valor:,.2f}")
+            logger.debug('Solicitação de transferência recebida: Origem: %s | Destino: %s | Tipo: %s | Valor: R$ %.2f', unidade_origem, unidade_destino, tipo_orcamento, valor)
             
             # ✅ EXECUTAR TRANSFERÊNCIA (agora suporta CRPIV)
             if unidade_origem == 'CRPIV':
@@ -1403,13 +1332,13 @@ def transferir_saldo():
                 flash(f'✅ Transferência realizada com sucesso! '
                       f'R$ {valor:,.2f} transferidos de {unidade_origem} para {unidade_destino}', 'success')
                 
-                print(f"✅ Transferência commitada no banco!")
+                logger.debug('Transferência commitada no banco!')
                 
             else:
                 # Rollback em caso de erro
                 db.session.rollback()
                 flash(f'❌ Erro na transferência: {resultado["erro"]}', 'error')
-                print(f"❌ Transferência falhou: {resultado['erro']}")
+                logger.info('Transferência falhou: %s', resultado['erro'])
             
             return redirect(url_for('transferir_saldo'))
             
@@ -1418,71 +1347,99 @@ def transferir_saldo():
             return redirect(url_for('transferir_saldo'))
         except Exception as e:
             db.session.rollback()
-            print(f"❌ Erro geral na transferência: {e}")
+            logger.error('Erro geral na transferência: %s', e)
             flash(f'❌ Erro ao processar transferência: {str(e)}', 'error')
             return redirect(url_for('transferir_saldo'))
     
     # GET - Mostrar formulário
     try:
-        # ✅ BUSCAR SALDOS DISPONÍVEIS POR UNIDADE (INCLUINDO CRPIV)
-        saldos_disponiveis = {}
-        
-        # ✅ INCLUIR TODAS AS UNIDADES (inclusive CRPIV)
-        for unidade in UNIDADES:  # AGORA INCLUI CRPIV
-            saldos_disponiveis[unidade] = {}
-            
-            for tipo in TIPOS_ORCAMENTO:
-                if unidade == 'CRPIV':
-                    # ✅ CÁLCULO ESPECIAL PARA CRPIV
-                    saldo_crpiv = calcular_saldo_disponivel_crpiv(tipo)
-                    if saldo_crpiv > 0:
-                        saldos_disponiveis[unidade][tipo] = {
-                            'distribuido': 0,  # CRPIV não recebe distribuições
-                            'autorizado': 0,   # CRPIV não autoriza missões
-                            'disponivel': saldo_crpiv
-                        }
-                else:
-                    # ✅ CÁLCULO PARA SUBUNIDADES
-                    # Total distribuído
-                    distribuido = db.session.query(
-                        db.func.sum(Distribuicao.valor)
-                    ).filter(
-                        Distribuicao.unidade == unidade,
-                        Distribuicao.tipo_orcamento == tipo
-                    ).scalar() or 0
-                    
-                    # Total autorizado
-                    autorizado = db.session.query(
-                        db.func.sum(Missao.valor)
-                    ).filter(
-                        Missao.fonte_dinheiro == unidade,
-                        Missao.tipo == tipo,
-                        Missao.status == 'autorizada'
-                    ).scalar() or 0
-                    
-                    saldo_disponivel = distribuido - autorizado
-                    
-                    if saldo_disponivel > 0:
-                        saldos_disponiveis[unidade][tipo] = {
-                            'distribuido': distribuido,
-                            'autorizado': autorizado,
-                            'disponivel': saldo_disponivel
-                        }
-        
         return render_template('transferir_saldo.html',
                              unidades=UNIDADES,  # ✅ AGORA INCLUI CRPIV
                              tipos=TIPOS_ORCAMENTO,
-                             saldos_disponiveis=saldos_disponiveis)
+                             saldos_disponiveis=calcular_saldos_transferencia(),
+                             ultimo_evento=eventos.cursor_atual())
                              
     except Exception as e:
-        print(f"❌ Erro ao carregar página de transferência: {e}")
+        logger.error('Erro ao carregar página de transferência: %s', e)
         flash('Erro ao carregar dados de saldos', 'error')
         return render_template('transferir_saldo.html',
                              unidades=UNIDADES,
                              tipos=TIPOS_ORCAMENTO,
                              saldos_disponiveis={})
 
-@app.route('/resolver_sem_saldo/<int:missao_id>', methods=['POST'])
+
+@rotas.route('/saldos_transferencia')
+def saldos_transferencia():
+    """Saldos da tela de transferência em JSON (ressincronização após eventos)"""
+    resposta = jsonify(calcular_saldos_transferencia())
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
+
+@rotas.route('/eventos_saldo')
+def eventos_saldo():
+    """Fluxo SSE com as variações de saldo de cada movimentação registrada"""
+    # Cursor inválido ou ausente: o fluxo começa do estado atual
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('ultimo')
+
+    fluxo = eventos.fluxo_eventos(
+        cursor,
+        intervalo=current_app.config['SSE_INTERVALO'],
+        heartbeat=current_app.config['SSE_HEARTBEAT'],
+        duracao_maxima=current_app.config['SSE_DURACAO_MAXIMA'],
+        retry_ms=current_app.config['SSE_RETRY_MS'],
+    )
+    return Response(stream_with_context(fluxo), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def exigir_admin():
+    """Rotas de diagnóstico: exigem o ADMIN_TOKEN (cabeçalho X-Admin-Token ou ?token=)"""
+    token = current_app.config['ADMIN_TOKEN']
+    if not token:
+        abort(404)
+    recebido = request.headers.get('X-Admin-Token') or request.args.get('token', '')
+    if not hmac.compare_digest(recebido.encode(), token.encode()):
+        abort(403)
+
+
+@rotas.route('/status_banco')
+def status_banco():
+    """Pool de conexões deste worker e latência de checkout"""
+    exigir_admin()
+    return jsonify(banco.status_pool(db.engine))
+
+
+@rotas.route('/metrics')
+def metrics():
+    """Latência e consultas SQL por rota, no formato do Prometheus"""
+    if not current_app.config['METRICAS_ATIVAS']:
+        abort(404)
+    token = current_app.config['METRICAS_TOKEN']
+    if token:
+        recebido = request.headers.get('Authorization', '')
+        if recebido.startswith('Bearer '):
+            recebido = recebido[len('Bearer '):]
+        recebido = recebido.strip()
+        if not hmac.compare_digest(recebido.encode(), token.encode()):
+            abort(401)
+    return Response(metricas.registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+@rotas.route('/consultas_lentas')
+def consultas_lentas_recentes():
+    """Últimas consultas lentas deste worker, com plano de execução"""
+    exigir_admin()
+    return jsonify({
+        'limite_ms': consultas_lentas.registro.limite_ms,
+        'total': consultas_lentas.registro.total,
+        'consultas': consultas_lentas.registro.listar(),
+    })
+
+@rotas.route('/resolver_sem_saldo/<int:missao_id>', methods=['POST'])
 def resolver_sem_saldo(missao_id):
     """Resolver situação de saldo insuficiente"""
     try:
@@ -1490,6 +1447,14 @@ def resolver_sem_saldo(missao_id):
         if not missao:
             flash('Missão não encontrada', 'error')
             return redirect(url_for('missoes'))
+
+        # ✅ Um segundo envio do formulário não pode autorizar (e registrar) de novo
+        if missao.status == 'autorizada':
+            flash('Missão já está autorizada', 'info')
+            return redirect(url_for('missoes'))
+
+        # ✅ O valor transferido/distribuído precisa cobrir o déficit atual
+        deficit = verificar_saldo_disponivel_missao(missao)['deficit']
         
         tipo_resolucao = request.form.get('tipo_resolucao')
         
@@ -1497,6 +1462,14 @@ def resolver_sem_saldo(missao_id):
             # Transferir de outra unidade
             unidade_origem = request.form.get('unidade_origem')
             valor_transferir = float(request.form.get('valor_transferir', 0))
+
+            if valor_transferir < deficit - 0.005:
+                flash(f'❌ O valor de R$ {valor_transferir:,.2f} não cobre o déficit de R$ {deficit:,.2f}', 'error')
+                return redirect(url_for('missoes'))
+
+            # ✅ Status alterado antes: vai no mesmo commit da transferência
+            missao.status = 'autorizada'
+            missao.data_autorizacao = datetime.utcnow()
             
             # Executar transferência
             resultado = executar_transferencia_entre_unidades(
@@ -1504,10 +1477,6 @@ def resolver_sem_saldo(missao_id):
             )
             
             if resultado['sucesso']:
-                # Autorizar missão após transferência
-                missao.status = 'autorizada'
-                missao.data_autorizacao = datetime.utcnow()
-                
                 # Registrar resolução
                 resolucao = ResolucaoSemSaldo(
                     missao_id=missao.id,
@@ -1533,21 +1502,26 @@ def resolver_sem_saldo(missao_id):
                       f'R$ {valor_transferir:,.2f} transferidos de {unidade_origem}.', 'success')
                       
             else:
+                db.session.rollback()
                 flash(f'❌ Erro na transferência: {resultado["erro"]}', 'error')
                 
         elif tipo_resolucao == 'nova_distribuicao':
             # Solicitar nova distribuição do CRPIV
             valor_solicitar = float(request.form.get('valor_solicitar', 0))
+
+            if valor_solicitar < deficit - 0.005:
+                flash(f'❌ O valor de R$ {valor_solicitar:,.2f} não cobre o déficit de R$ {deficit:,.2f}', 'error')
+                return redirect(url_for('missoes'))
+
+            # ✅ Status alterado antes: vai no mesmo commit da nova distribuição
+            missao.status = 'autorizada'
+            missao.data_autorizacao = datetime.utcnow()
             
             resultado = executar_nova_distribuicao_crpiv(
                 missao.fonte_dinheiro, missao.tipo, valor_solicitar
             )
             
             if resultado['sucesso']:
-                # Autorizar missão após nova distribuição
-                missao.status = 'autorizada'
-                missao.data_autorizacao = datetime.utcnow()
-                
                 # Registrar resolução
                 resolucao = ResolucaoSemSaldo(
                     missao_id=missao.id,
@@ -1572,6 +1546,7 @@ def resolver_sem_saldo(missao_id):
                       f'R$ {valor_solicitar:,.2f} distribuídos do CRPIV.', 'success')
                       
             else:
+                db.session.rollback()
                 flash(f'❌ Erro na nova distribuição: {resultado["erro"]}', 'error')
                 
         else:
@@ -1580,44 +1555,47 @@ def resolver_sem_saldo(missao_id):
         return redirect(url_for('missoes'))
         
     except Exception as e:
-        print(f"❌ Erro ao resolver sem saldo: {e}")
+        logger.error('Erro ao resolver sem saldo: %s', e)
+        db.session.rollback()
         flash(f'Erro ao resolver situação: {str(e)}', 'error')
         return redirect(url_for('missoes'))
 
-@app.route('/verificar_recolhimento/<int:orcamento_id>')
+@rotas.route('/verificar_recolhimento/<int:orcamento_id>')
 def verificar_recolhimento(orcamento_id):
     """Debug: Verificar o resultado do recolhimento"""
     try:
-        print(f"🔍 VERIFICANDO RESULTADO DO RECOLHIMENTO - Orçamento {orcamento_id}")
+        logger.debug('VERIFICANDO RESULTADO DO RECOLHIMENTO - Orçamento %s', orcamento_id)
         
         # Distribuições atuais
         distribuicoes = Distribuicao.query.filter_by(orcamento_id=orcamento_id).all()
         
-        print("📊 DISTRIBUIÇÕES ATUAIS:")
-        for dist in distribuicoes:
-            print(f"  {dist.unidade} - {dist.tipo_orcamento}: R$ {dist.valor:,.2f}")
+        logger.debug('DISTRIBUIÇÕES ATUAIS:')
+        if logger.isEnabledFor(logging.DEBUG):
+            for dist in distribuicoes:
+                logger.debug('%s - %s: R$ %.2f', dist.unidade, dist.tipo_orcamento, dist.valor)
         
         # Verificar se CRPIV tem valores
         crpiv_distribuicoes = [d for d in distribuicoes if d.unidade == 'CRPIV']
         
-        print("🏛️ DISTRIBUIÇÕES DO CRPIV:")
+        logger.debug('DISTRIBUIÇÕES DO CRPIV:')
         total_crpiv = 0
         for dist in crpiv_distribuicoes:
-            print(f"  {dist.tipo_orcamento}: R$ {dist.valor:,.2f}")
+            logger.debug('%s: R$ %.2f', dist.tipo_orcamento, dist.valor)
             total_crpiv += dist.valor
         
-        print(f"💰 TOTAL NO CRPIV: R$ {total_crpiv:,.2f}")
+        logger.debug('TOTAL NO CRPIV: R$ %.2f', total_crpiv)
         
         # Calcular novos saldos
         saldos_atuais = calcular_saldos_para_recolher_bimestre_corrigido(orcamento_id)
         
-        print("📊 SALDOS APÓS RECOLHIMENTO:")
-        for unidade, tipos in saldos_atuais.items():
-            if tipos:
-                print(f"  {unidade}:")
-                for tipo, dados in tipos.items():
-                    if dados['saldo_disponivel'] > 0:
-                        print(f"    {tipo}: R$ {dados['saldo_disponivel']:,.2f}")
+        logger.debug('SALDOS APÓS RECOLHIMENTO:')
+        if logger.isEnabledFor(logging.DEBUG):
+            for unidade, tipos in saldos_atuais.items():
+                if tipos:
+                    logger.debug('%s:', unidade)
+                    for tipo, dados in tipos.items():
+                        if dados['saldo_disponivel'] > 0:
+                            logger.debug('%s: R$ %.2f', tipo, dados['saldo_disponivel'])
         
         return {
             "status": "OK",
@@ -1628,7 +1606,7 @@ def verificar_recolhimento(orcamento_id):
         }
         
     except Exception as e:
-        print(f"❌ Erro na verificação: {e}")
+        logger.error('Erro na verificação: %s', e)
         return {"erro": str(e)}
 
 
@@ -1685,7 +1663,7 @@ def calcular_saldos_para_recolher_bimestre(orcamento_id):
     return saldos_recolhimento
 
 
-@app.route('/visualizar_recolhimento/<int:orcamento_id>')
+@rotas.route('/visualizar_recolhimento/<int:orcamento_id>')
 def visualizar_recolhimento(orcamento_id):
     """Visualizar saldos disponíveis para recolhimento - CORRIGIDO"""
     try:
@@ -1694,7 +1672,7 @@ def visualizar_recolhimento(orcamento_id):
             flash('Orçamento não encontrado', 'error')
             return redirect(url_for('saldos_bimestre'))
         
-        print(f"🔍 Visualizando recolhimento para orçamento {orcamento_id}")
+        logger.debug('Visualizando recolhimento para orçamento %s', orcamento_id)
         
         # Verificar se pode recolher
         pode_recolher = True
@@ -1708,12 +1686,13 @@ def visualizar_recolhimento(orcamento_id):
         # ✅ CALCULAR SALDOS DETALHADOS
         saldos_detalhados = calcular_saldos_para_recolher_bimestre_corrigido(orcamento_id)
         
-        print("💰 Saldos detalhados calculados:")
-        for unidade, tipos in saldos_detalhados.items():
-            print(f"  {unidade}:")
-            for tipo, dados in tipos.items():
-                if dados['saldo_disponivel'] > 0:
-                    print(f"    {tipo}: R$ {dados['saldo_disponivel']:,.2f}")
+        logger.debug('Saldos detalhados calculados:')
+        if logger.isEnabledFor(logging.DEBUG):
+            for unidade, tipos in saldos_detalhados.items():
+                logger.debug('%s:', unidade)
+                for tipo, dados in tipos.items():
+                    if dados['saldo_disponivel'] > 0:
+                        logger.debug('%s: R$ %.2f', tipo, dados['saldo_disponivel'])
         
         # Verificar se tem saldo para recolher
         tem_saldo = any(
@@ -1744,9 +1723,7 @@ def visualizar_recolhimento(orcamento_id):
                              recolhimentos_existentes=recolhimentos_existentes)
                              
     except Exception as e:
-        print(f"❌ Erro em visualizar_recolhimento: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro em visualizar_recolhimento')
         flash('Erro ao calcular saldos para recolhimento', 'error')
         return redirect(url_for('saldos_bimestre'))
 
@@ -1758,43 +1735,26 @@ def calcular_saldos_para_recolher_bimestre_corrigido(orcamento_id):
         if not orcamento:
             return {}
         
-        print(f"🔍 Calculando saldos para recolhimento - Orçamento {orcamento_id}")
+        logger.debug('Calculando saldos para recolhimento - Orçamento %s', orcamento_id)
         
         saldos_detalhados = {}
+        # Distribuído neste bimestre e autorizado por unidade/tipo
+        distribuido_por_chave, autorizado_por_chave = somar_distribuido_e_autorizado(orcamento_id)
         
         # Para cada unidade (exceto CRPIV)
         for unidade in ['7º BPM', '8º BPM', 'CIPO']:
             saldos_detalhados[unidade] = {}
             
             for tipo in TIPOS_ORCAMENTO:
-                print(f"  Calculando {unidade} - {tipo}")
-                
-                # Total distribuído para esta unidade/tipo neste bimestre
-                distribuido = db.session.query(
-                    db.func.sum(Distribuicao.valor)
-                ).filter(
-                    Distribuicao.orcamento_id == orcamento_id,
-                    Distribuicao.unidade == unidade,
-                    Distribuicao.tipo_orcamento == tipo
-                ).scalar() or 0
-                
-                print(f"    Distribuído: R$ {distribuido:,.2f}")
+                distribuido = distribuido_por_chave.get((unidade, tipo), 0)
+                autorizado = autorizado_por_chave.get((unidade, tipo), 0)
                 
-                # Total autorizado desta unidade/tipo
-                autorizado = db.session.query(
-                    db.func.sum(Missao.valor)
-                ).filter(
-                    Missao.fonte_dinheiro == unidade,
-                    Missao.tipo == tipo,
-                    Missao.status == 'autorizada'
-                ).scalar() or 0
-                
-                print(f"    Autorizado: R$ {autorizado:,.2f}")
+                logger.debug('%s - %s: Distribuído: R$ %.2f | Autorizado: R$ %.2f', unidade, tipo, distribuido, autorizado)
                 
                 # ✅ CÁLCULO SIMPLES E DIRETO
                 saldo_disponivel = max(0, distribuido - autorizado)
                 
-                print(f"    Saldo disponível: R$ {saldo_disponivel:,.2f}")
+                logger.debug('Saldo disponível: R$ %.2f', saldo_disponivel)
                 
                 # Só adicionar se houver saldo ou distribuição
                 if distribuido > 0 or autorizado > 0:
@@ -1807,12 +1767,10 @@ def calcular_saldos_para_recolher_bimestre_corrigido(orcamento_id):
         return saldos_detalhados
         
     except Exception as e:
-        print(f"❌ Erro em calcular_saldos_para_recolher_bimestre_corrigido: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro em calcular_saldos_para_recolher_bimestre_corrigido')
         return {}
 
-@app.route('/confirmar_recolhimento_simples/<int:orcamento_id>', methods=['POST'])
+@rotas.route('/confirmar_recolhimento_simples/<int:orcamento_id>', methods=['POST'])
 
 def confirmar_recolhimento_simples(orcamento_id):
     """Executar recolhimento com transferência real de valores - VERSÃO COMPLETA"""    
@@ -1822,7 +1780,7 @@ def confirmar_recolhimento_simples(orcamento_id):
             flash('Orçamento não encontrado', 'error')
             return redirect(url_for('saldos_bimestre'))
         
-        print(f"🔍 Confirmando recolhimento com transferência - Orçamento {orcamento_id}")
+        logger.debug('Confirmando recolhimento com transferência - Orçamento %s', orcamento_id)
         
         # Verificar se bimestre já foi finalizado
         if hasattr(orcamento, 'status') and getattr(orcamento, 'status') == 'finalizado':
@@ -1837,9 +1795,7 @@ def confirmar_recolhimento_simples(orcamento_id):
         recolhimentos_detalhados = []
         transferencias_realizadas = []
         
-        print("📋 Dados do formulário recebidos:")
-        for key, value in request.form.items():
-            print(f"  {key} = {value}")
+        logger.debug('Dados do formulário recebidos: %s', request.form)
         
         # ✅ INICIAR TRANSAÇÃO PARA GARANTIR CONSISTÊNCIA
         from sqlalchemy.exc import SQLAlchemyError
@@ -1849,16 +1805,16 @@ def confirmar_recolhimento_simples(orcamento_id):
             for unidade in ['7º BPM', '8º BPM', 'CIPO']:
                 for tipo in TIPOS_ORCAMENTO:
                     campo_checkbox = f"recolher_{unidade}_{tipo}"
-                    print(f"🔍 Verificando campo: {campo_checkbox}")
+                    logger.debug('Verificando campo: %s', campo_checkbox)
                     
                     if request.form.get(campo_checkbox):
-                        print(f"✅ Campo marcado: {campo_checkbox}")
+                        logger.debug('Campo marcado: %s', campo_checkbox)
                         
                         if unidade in saldos_detalhados and tipo in saldos_detalhados[unidade]:
                             valor_recolher = saldos_detalhados[unidade][tipo]['saldo_disponivel']
                             
                             if valor_recolher > 0:
-                                print(f"💰 Processando recolhimento: {unidade} - {tipo} - R$ {valor_recolher:,.2f}")
+                                logger.debug('Processando recolhimento: %s - %s - R$ %.2f', unidade, tipo, valor_recolher)
                                 
                                 # ✅ PASSO 1: ENCONTRAR E REDUZIR A DISTRIBUIÇÃO
                                 distribuicao_existente = Distribuicao.query.filter_by(
@@ -1871,19 +1827,16 @@ def confirmar_recolhimento_simples(orcamento_id):
                                     valor_original = distribuicao_existente.valor
                                     novo_valor = valor_original - valor_recolher
                                     
-                                    print(f"📉 Reduzindo distribuição de {unidade}:")
-                                    print(f"   Valor original: R$ {valor_original:,.2f}")
-                                    print(f"   Valor recolhido: R$ {valor_recolher:,.2f}")
-                                    print(f"   Novo valor: R$ {novo_valor:,.2f}")
+                                    logger.debug('Reduzindo distribuição de %s: Valor original: R$ %.2f | Valor recolhido: R$ %.2f | Novo valor: R$ %.2f', unidade, valor_original, valor_recolher, novo_valor)
                                     
                                     if novo_valor <= 0:
                                         # Se recolheu tudo, remove a distribuição
-                                        print(f"🗑️ Removendo distribuição completamente (valor <= 0)")
+                                        logger.debug('Removendo distribuição completamente (valor <= 0)')
                                         db.session.delete(distribuicao_existente)
                                     else:
                                         # Se ainda resta algo, atualiza o valor
                                         distribuicao_existente.valor = novo_valor
-                                        print(f"📝 Atualizando distribuição para R$ {novo_valor:,.2f}")
+                                        logger.debug('Atualizando distribuição para R$ %.2f', novo_valor)
                                     
                                     # ✅ PASSO 2: CRIAR NOVA DISTRIBUIÇÃO PARA O CRPIV
                                     # Isso efetivamente "devolve" o valor ao CRPIV
@@ -1895,10 +1848,7 @@ def confirmar_recolhimento_simples(orcamento_id):
                                     )
                                     db.session.add(distribuicao_crpiv)
                                     
-                                    print(f"✅ Criando nova distribuição para CRPIV:")
-                                    print(f"   Unidade: CRPIV")
-                                    print(f"   Tipo: {tipo}")
-                                    print(f"   Valor: R$ {valor_recolher:,.2f}")
+                                    logger.debug('Criando nova distribuição para CRPIV: Unidade: CRPIV | Tipo: %s | Valor: R$ %.2f', tipo, valor_recolher)
                                     
                                     # ✅ PASSO 3: REGISTRAR O RECOLHIMENTO (se tabela existir)
                                     # TODO: Descomente se tiver tabela RecolhimentoSaldo
@@ -1936,7 +1886,7 @@ def confirmar_recolhimento_simples(orcamento_id):
                                     valor_total_recolhido += valor_recolher
                                 
                                 else:
-                                    print(f"⚠️ Distribuição não encontrada para {unidade} - {tipo}")
+                                    logger.warning('Distribuição não encontrada para %s - %s', unidade, tipo)
             
             # ✅ PASSO 4: COMMIT DAS ALTERAÇÕES
             try:
@@ -1951,27 +1901,23 @@ def confirmar_recolhimento_simples(orcamento_id):
                     data_recolhimento=datetime.utcnow()
                 )
                 db.session.add(recolhimento_historico)
-                print(f"📝 Histórico salvo: {unidade} → CRPIV - R$ {valor_recolher:,.2f}")
+                logger.debug('Histórico salvo: %s → CRPIV - R$ %.2f', unidade, valor_recolher)
             except Exception as e:
-                print(f"⚠️ Erro ao salvar histórico: {e}")
+                logger.warning('Erro ao salvar histórico: %s', e)
 
             if transferencias_realizadas:
                 db.session.commit()
-                print(f"✅ TRANSAÇÃO COMMITADA - {len(transferencias_realizadas)} transferências realizadas")
+                logger.debug('TRANSAÇÃO COMMITADA - %s transferências realizadas', len(transferencias_realizadas))
                 
                 # Log detalhado das transferências
-                print("📊 RESUMO DAS TRANSFERÊNCIAS:")
-                for transfer in transferencias_realizadas:
-                    print(f"  🔄 {transfer['de']} → {transfer['para']}")
-                    print(f"     Tipo: {transfer['tipo']}")
-                    print(f"     Valor transferido: R$ {transfer['valor']:,.2f}")
-                    print(f"     Saldo restante em {transfer['de']}: R$ {transfer['novo_valor']:,.2f}")
-                    print(f"     Valor adicionado ao CRPIV: R$ {transfer['valor']:,.2f}")
-                    print("-" * 40)
+                logger.debug('RESUMO DAS TRANSFERÊNCIAS:')
+                if logger.isEnabledFor(logging.DEBUG):
+                    for transfer in transferencias_realizadas:
+                        logger.debug('%s → %s | Tipo: %s | Valor transferido: R$ %.2f | Saldo restante em %s: R$ %.2f | Valor adicionado ao CRPIV: R$ %.2f', transfer['de'], transfer['para'], transfer['tipo'], transfer['valor'], transfer['de'], transfer['novo_valor'], transfer['valor'])
             
             # Finalizar bimestre se solicitado
             if request.form.get('finalizar_bimestre'):
-                print("🏁 Finalizando bimestre...")
+                logger.debug('Finalizando bimestre...')
                 # TODO: Implementar lógica de finalização
                 # orcamento.status = 'finalizado'
                 # orcamento.data_finalizacao = datetime.utcnow()
@@ -1979,10 +1925,7 @@ def confirmar_recolhimento_simples(orcamento_id):
             
             # ✅ RESULTADO FINAL
             if recolhimentos_realizados > 0:
-                print(f"🎉 RECOLHIMENTO CONCLUÍDO COM SUCESSO!")
-                print(f"   Itens processados: {recolhimentos_realizados}")
-                print(f"   Valor total recolhido: R$ {valor_total_recolhido:,.2f}")
-                print(f"   Transferências realizadas: {len(transferencias_realizadas)}")
+                logger.info('Recolhimento do orçamento %s concluído: %s itens, R$ %.2f, %s transferências', orcamento_id, recolhimentos_realizados, valor_total_recolhido, len(transferencias_realizadas))
                 
                 flash(f'✅ Recolhimento realizado com sucesso! '
                       f'{recolhimentos_realizados} itens processados. '
@@ -2001,20 +1944,17 @@ def confirmar_recolhimento_simples(orcamento_id):
         except SQLAlchemyError as e:
             # Rollback em caso de erro na transação
             db.session.rollback()
-            print(f"❌ ERRO NA TRANSAÇÃO - Rollback realizado")
-            print(f"   Erro: {str(e)}")
+            logger.exception('Erro na transação do recolhimento - rollback realizado')
             flash(f'❌ Erro ao processar recolhimento: {str(e)}', 'error')
             return redirect(url_for('visualizar_recolhimento', orcamento_id=orcamento_id))
         
     except Exception as e:
-        print(f"❌ Erro geral em confirmar_recolhimento_simples: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro geral em confirmar_recolhimento_simples')
         db.session.rollback()
         flash(f'❌ Erro ao processar recolhimento: {str(e)}', 'error')
         return redirect(url_for('saldos_bimestre'))
 
-@app.route('/orcamento', methods=['GET', 'POST'])
+@rotas.route('/orcamento', methods=['GET', 'POST'])
 def orcamento():
     if request.method == 'POST':
         # Converter strings de data para objetos date
@@ -2054,157 +1994,86 @@ def orcamento():
     return render_template('orcamento.html', orcamentos=orcamentos, bimestres=BIMESTRES)
 
 
-@app.route('/historico_recolhimentos')
+def filtrar_recolhimentos(query, bimestre_filtro='', ano_filtro='', unidade_filtro='', tipo_filtro=''):
+    """Aplica os filtros do histórico de recolhimentos (a query já junta Orcamento)"""
+    if bimestre_filtro:
+        query = query.filter(Orcamento.bimestre == bimestre_filtro)
+    if ano_filtro:
+        query = query.filter(Orcamento.ano == ano_filtro)
+    if unidade_filtro:
+        query = query.filter(RecolhimentoSaldo.unidade_origem == unidade_filtro)
+    if tipo_filtro:
+        query = query.filter(RecolhimentoSaldo.tipo_orcamento == tipo_filtro)
+    return query
+
+
+@rotas.route('/historico_recolhimentos')
 def historico_recolhimentos():
-    """Visualizar histórico de recolhimentos - ERRO CORRIGIDO"""
+    """Visualizar histórico de recolhimentos registrados em RecolhimentoSaldo"""
+    filtros = {
+        'bimestre': request.args.get('bimestre', ''),
+        'ano': request.args.get('ano', '', type=int),
+        'unidade': request.args.get('unidade', ''),
+        'tipo': request.args.get('tipo', ''),
+        'por_pagina': pagination.por_pagina_da_requisicao()
+    }
+    argumentos_filtro = (filtros['bimestre'], filtros['ano'], filtros['unidade'], filtros['tipo'])
+
     try:
-        print("🔍 Carregando histórico de recolhimentos...")
-        
-        # ✅ OPÇÃO 1: Se você tem tabela RecolhimentoSaldo
-        recolhimentos = []
-        try:
-            # Descomente se tiver a tabela criada:
-            """
-            recolhimentos = db.session.query(RecolhimentoSaldo).join(Orcamento).order_by(
-                RecolhimentoSaldo.data_recolhimento.desc()
-            ).all()
-            """
-            pass
-        except Exception as e:
-            print(f"⚠️ Tabela RecolhimentoSaldo não existe ainda: {e}")
-        
-        # ✅ OPÇÃO 2: Simular dados baseados nas distribuições do CRPIV - CORRIGIDA
-        if not recolhimentos:
-            print("📊 Criando histórico simulado baseado em distribuições do CRPIV...")
-            
-            # ✅ CORREÇÃO: Usar JOIN ou buscar orçamento separadamente
-            distribuicoes_crpiv = db.session.query(Distribuicao).filter(
-                Distribuicao.unidade == 'CRPIV'
-            ).order_by(Distribuicao.data_distribuicao.desc()).all()
-            
-            print(f"📋 Encontradas {len(distribuicoes_crpiv)} distribuições do CRPIV")
-            
-            # Criar objetos simulados para o template
-            recolhimentos_simulados = []
-            for dist in distribuicoes_crpiv:
-                # ✅ BUSCAR ORÇAMENTO USANDO O ID
-                orcamento = db.session.get(Orcamento, dist.orcamento_id)
-                
-                if orcamento:  # Só processar se orçamento existir
-                    # Simular um objeto recolhimento
-                    class RecolhimentoSimulado:
-                        def __init__(self, distribuicao, orcamento_obj):
-                            self.data_recolhimento = distribuicao.data_distribuicao
-                            self.orcamento = orcamento_obj  # ✅ USAR OBJETO BUSCADO
-                            self.unidade_origem = "Subunidade"  # Simulado (não sabemos qual)
-                            self.tipo_orcamento = distribuicao.tipo_orcamento  
-                            self.valor_recolhido = distribuicao.valor
-                            self.motivo = f"Recolhimento de saldo não utilizado do {orcamento_obj.bimestre}/{orcamento_obj.ano}"
-                            self.usuario_responsavel = "Sistema"
-                    
-                    recolhimento_obj = RecolhimentoSimulado(dist, orcamento)
-                    recolhimentos_simulados.append(recolhimento_obj)
-                    
-                    print(f"✅ Recolhimento simulado: {orcamento.bimestre}/{orcamento.ano} - {dist.tipo_orcamento} - R$ {dist.valor:,.2f}")
-                else:
-                    print(f"⚠️ Orçamento ID {dist.orcamento_id} não encontrado para distribuição")
-            
-            recolhimentos = recolhimentos_simulados
-            print(f"✅ {len(recolhimentos)} recolhimentos simulados criados")
-        
-        print(f"📋 Total de recolhimentos para exibir: {len(recolhimentos)}")
-        
+        # ✅ RECOLHIMENTO + ORÇAMENTO EM UMA ÚNICA CONSULTA, PAGINADA POR (data, id)
+        query = filtrar_recolhimentos(
+            RecolhimentoSaldo.query.join(RecolhimentoSaldo.orcamento)
+            .options(contains_eager(RecolhimentoSaldo.orcamento)),
+            *argumentos_filtro)
+        pagina = pagination.paginar(query, RecolhimentoSaldo.data_recolhimento, RecolhimentoSaldo.id,
+                                    apos=request.args.get('apos'),
+                                    antes=request.args.get('antes'),
+                                    por_pagina=filtros['por_pagina'])
+
+        # ✅ TOTAIS POR TIPO CALCULADOS NO BANCO
+        totais_por_tipo = filtrar_recolhimentos(
+            db.session.query(
+                RecolhimentoSaldo.tipo_orcamento,
+                db.func.count(RecolhimentoSaldo.id),
+                db.func.coalesce(db.func.sum(RecolhimentoSaldo.valor_recolhido), 0)
+            ).join(RecolhimentoSaldo.orcamento),
+            *argumentos_filtro
+        ).group_by(RecolhimentoSaldo.tipo_orcamento).all()
+
+        totais = {
+            'quantidade': sum(qtd for _, qtd, _ in totais_por_tipo),
+            'valor': sum(float(valor) for _, _, valor in totais_por_tipo),
+            'por_tipo': {tipo: {'quantidade': qtd, 'valor': float(valor)}
+                         for tipo, qtd, valor in totais_por_tipo}
+        }
+
+        anos = [ano for (ano,) in db.session.query(Orcamento.ano).distinct().order_by(Orcamento.ano.desc())]
+
         return render_template('historico_recolhimentos.html', 
-                             recolhimentos=recolhimentos)
+                             recolhimentos=pagina.itens,
+                             pagina=pagina,
+                             totais=totais,
+                             filtros=filtros,
+                             bimestres=BIMESTRES,
+                             anos=anos,
+                             unidades=UNIDADES[1:],  # Excluir CRPIV
+                             tipos=TIPOS_ORCAMENTO)
                              
     except Exception as e:
-        print(f"❌ Erro em historico_recolhimentos: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro em historico_recolhimentos')
         flash('Erro ao carregar histórico de recolhimentos', 'error')
         return render_template('historico_recolhimentos.html', 
-                             recolhimentos=[])
+                             recolhimentos=[],
+                             totais={'quantidade': 0, 'valor': 0, 'por_tipo': {}},
+                             filtros=filtros,
+                             bimestres=BIMESTRES,
+                             anos=[],
+                             unidades=UNIDADES[1:],
+                             tipos=TIPOS_ORCAMENTO)
 
-# Atualizar a função de cálculo de saldos por bimestre
-def calcular_saldo_por_bimestre():
-    """Calcula saldos por bimestre - FÓRMULA CORRIGIDA"""
-    try:
-        print("🔍 Calculando saldos por bimestre...")
-        
-        orcamentos = Orcamento.query.order_by(Orcamento.data_criacao.desc()).all()
-        saldos_lista = []
-        
-        for orcamento in orcamentos:
-            print(f"📊 Processando {orcamento.bimestre}/{orcamento.ano}")
-            
-            # ✅ 1. TOTAL DISPONIBILIZADO (Cota + Complementações)
-            total_base = sum([
-                orcamento.diarias or 0,
-                orcamento.derso or 0, 
-                orcamento.diarias_pav or 0,
-                orcamento.derso_pav or 0
-            ])
-            
-            # Somar complementações deste orçamento
-            complementacoes = ComplementacaoOrcamento.query.filter_by(orcamento_id=orcamento.id).all()
-            total_complementacoes = sum([comp.valor for comp in complementacoes])
-            
-            total_disponibilizado = total_base + total_complementacoes
-            
-            # ✅ 2. TOTAL DISTRIBUÍDO (para subunidades)
-            total_distribuido = db.session.query(
-                db.func.sum(Distribuicao.valor)
-            ).filter(
-                Distribuicao.orcamento_id == orcamento.id,
-                Distribuicao.unidade != 'CRPIV'  # Excluir distribuições para CRPIV
-            ).scalar() or 0
-            
-            # ✅ 3. TOTAL AUTORIZADO (todas as missões autorizadas deste bimestre)
-            # Considerando que missões são vinculadas ao bimestre pelo período ou data
-            total_autorizado = db.session.query(
-                db.func.sum(Missao.valor)
-            ).filter(
-                Missao.status == 'autorizada'
-                # ✅ AQUI você pode adicionar filtro por período se tiver
-                # Por exemplo: Missao.data_autorizacao entre data_inicio e data_fim do bimestre
-            ).scalar() or 0
-            
-            # ✅ 4. SALDO CORRETO = Disponibilizado - Autorizado
-            # NÃO consideramos distribuições, apenas o que foi realmente gasto
-            saldo = total_disponibilizado - total_autorizado
-            
-            # Verificar se pode recolher (tem distribuições não utilizadas)
-            pode_recolher = total_distribuido > total_autorizado
-            
-            # Total recolhido (se implementado)
-            total_recolhido = 0
-            if hasattr(orcamento, 'recolhimentos'):
-                total_recolhido = sum([r.valor_recolhido for r in orcamento.recolhimentos])
-            
-            print(f"  📈 Disponibilizado: R$ {total_disponibilizado:,.2f}")
-            print(f"  📤 Distribuído: R$ {total_distribuido:,.2f}")
-            print(f"  ✅ Autorizado: R$ {total_autorizado:,.2f}")
-            print(f"  💰 Saldo: R$ {saldo:,.2f}")
-            
-            saldos_lista.append({
-                'orcamento': orcamento,
-                'complementacoes': complementacoes,
-                'total_disponibilizado': total_disponibilizado,
-                'total_distribuido': total_distribuido,
-                'total_autorizado': total_autorizado,
-                'saldo': saldo,  # ✅ FÓRMULA CORRIGIDA
-                'pode_recolher': pode_recolher,
-                'total_recolhido': total_recolhido
-            })
-        
-        print(f"✅ Calculados saldos para {len(saldos_lista)} bimestres")
-        return saldos_lista
-        
-    except Exception as e:
-        print(f"❌ Erro ao calcular saldos por bimestre: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+
+# Linhas do CSV lidas (e gravadas) por vez na importação de missões
+LOTE_IMPORTACAO = 500
 
 
 def allowed_file(filename):
@@ -2212,6 +2081,8 @@ def allowed_file(filename):
 
 def validar_dados_missao(row, linha_num):
     """Valida uma linha de dados da importação - VERSÃO CORRIGIDA"""
+    import pandas as pd
+
     erros = []
     
     # Campos obrigatórios
@@ -2258,7 +2129,7 @@ def validar_dados_missao(row, linha_num):
     
     return erros
 
-@app.route('/importar_missoes', methods=['GET', 'POST'])
+@rotas.route('/importar_missoes', methods=['GET', 'POST'])
 def importar_missoes():
     if request.method == 'POST':
         if 'arquivo' not in request.files:
@@ -2272,82 +2143,99 @@ def importar_missoes():
             return redirect(request.url)
         
         if arquivo and allowed_file(arquivo.filename):
+            # ✅ pandas só é carregado na importação (pesa no boot de cada worker)
+            import pandas as pd
+
             try:
-                # Ler arquivo CSV
-                df = pd.read_csv(arquivo, encoding='utf-8', sep='\t')  # Usar TAB como separador
-                
-                # Se não funcionar com TAB, tentar outros
-                if len(df.columns) == 1:
-                    arquivo.seek(0)
-                    df = pd.read_csv(arquivo, encoding='utf-8', sep=';')
-                
-                if len(df.columns) == 1:
+                # Descobrir o separador pelo cabeçalho: TAB, depois ";" e ","
+                for separador in ('\t', ';', ','):
                     arquivo.seek(0)
-                    df = pd.read_csv(arquivo, encoding='utf-8', sep=',')
+                    colunas = pd.read_csv(arquivo, encoding='utf-8', sep=separador, nrows=0).columns
+                    if len(colunas) > 1:
+                        break
                 
                 # Limpar nomes das colunas
-                df.columns = df.columns.str.strip()
+                colunas = colunas.str.strip()
                 
                 # Log para debug
-                print("Colunas encontradas:", list(df.columns))
-                print("Primeiras linhas:", df.head())
+                logger.debug('Colunas encontradas: %s | Separador: %r', list(colunas), separador)
                 
                 # Verificar colunas obrigatórias
                 colunas_esperadas = ['fonte_dinheiro', 'opm_destino', 'processo_sei', 
                                    'descricao', 'periodo', 'mes', 'tipo', 'valor']
                 
-                colunas_faltantes = [col for col in colunas_esperadas if col not in df.columns]
+                colunas_faltantes = [col for col in colunas_esperadas if col not in colunas]
                 if colunas_faltantes:
                     flash(f'Colunas obrigatórias faltando: {", ".join(colunas_faltantes)}', 'error')
-                    flash(f'Colunas encontradas: {", ".join(df.columns)}', 'info')
+                    flash(f'Colunas encontradas: {", ".join(colunas)}', 'info')
                     return redirect(request.url)
                 
-                # Processar dados
+                # Processar dados em lotes: o arquivo nunca fica inteiro em memória.
+                # As missões válidas vão para o banco a cada lote (flush) e o
+                # commit só acontece se nenhuma linha tiver erro.
                 erros_validacao = []
-                missoes_validas = []
+                missoes_validas = 0
                 
-                for index, row in df.iterrows():
-                    linha_num = index + 2
+                arquivo.seek(0)
+                for lote in pd.read_csv(arquivo, encoding='utf-8', sep=separador, chunksize=LOTE_IMPORTACAO):
+                    lote.columns = lote.columns.str.strip()
                     
-                    # Pular linhas vazias
-                    if pd.isna(row['fonte_dinheiro']) or str(row['fonte_dinheiro']).strip() == '':
-                        continue
-                    
-                    erros_linha = validar_dados_missao(row, linha_num)
-                    erros_validacao.extend(erros_linha)
-                    
-                    if not erros_linha:
-                        # Limpar e converter dados
-                        valor_str = str(row['valor']).strip().replace(',', '.').replace(' ', '')
-                        valor = float(valor_str)
-                        status = str(row.get('status', 'previsao')).strip().lower()
+                    for index, row in lote.iterrows():
+                        linha_num = index + 2
                         
-                        # Tratar processo SEI especial
-                        processo_sei = str(row['processo_sei']).strip()
-                        if processo_sei == '*********':
-                            processo_sei = f"TEMP-{datetime.now().strftime('%Y%m%d')}-{index}"
+                        # Pular linhas vazias
+                        if pd.isna(row['fonte_dinheiro']) or str(row['fonte_dinheiro']).strip() == '':
+                            continue
                         
-                        # Tratar número de autorização
-                        num_auth = str(row.get('numero_autorizacao', '')).strip()
-                        if num_auth == '0':
-                            num_auth = ''
+                        erros_linha = validar_dados_missao(row, linha_num)
+                        erros_validacao.extend(erros_linha)
                         
-                        missao_data = {
-                            'fonte_dinheiro': str(row['fonte_dinheiro']).strip(),
-                            'opm_destino': str(row['opm_destino']).strip(),
-                            'processo_sei': processo_sei,
-                            'descricao': str(row['descricao']).strip(),
-                            'periodo': str(row['periodo']).strip(),
-                            'mes': str(row['mes']).strip(),
-                            'tipo': str(row['tipo']).strip(),
-                            'valor': valor,
-                            'numero_autorizacao': num_auth,
-                            'status': status if status in ['previsao', 'autorizada'] else 'previsao'
-                        }
-                        missoes_validas.append(missao_data)
+                        if not erros_linha:
+                            missoes_validas += 1
+                            if erros_validacao:
+                                # A importação já não será gravada; só conta as válidas
+                                continue
+                            
+                            # Limpar e converter dados
+                            valor_str = str(row['valor']).strip().replace(',', '.').replace(' ', '')
+                            valor = float(valor_str)
+                            status = str(row.get('status', 'previsao')).strip().lower()
+                            
+                            # Tratar processo SEI especial
+                            processo_sei = str(row['processo_sei']).strip()
+                            if processo_sei == '*********':
+                                processo_sei = f"TEMP-{datetime.now().strftime('%Y%m%d')}-{index}"
+                            
+                            # Tratar número de autorização
+                            num_auth = str(row.get('numero_autorizacao', '')).strip()
+                            if num_auth == '0':
+                                num_auth = ''
+                            
+                            nova_missao = Missao(
+                                fonte_dinheiro=str(row['fonte_dinheiro']).strip(),
+                                opm_destino=str(row['opm_destino']).strip(),
+                                processo_sei=processo_sei,
+                                descricao=str(row['descricao']).strip(),
+                                periodo=str(row['periodo']).strip(),
+                                mes=str(row['mes']).strip(),
+                                tipo=str(row['tipo']).strip(),
+                                valor=valor,
+                                numero_autorizacao=num_auth,
+                                status=status if status in ['previsao', 'autorizada'] else 'previsao'
+                            )
+                            
+                            if nova_missao.status == 'autorizada':
+                                nova_missao.data_autorizacao = datetime.utcnow()
+                            
+                            db.session.add(nova_missao)
+                    
+                    if not erros_validacao:
+                        # Depois do flush a sessão só guarda referências fracas às missões
+                        db.session.flush()
                 
                 # Mostrar erros se houver
                 if erros_validacao:
+                    db.session.rollback()
                     flash(f'Encontrados {len(erros_validacao)} erros:', 'error')
                     for erro in erros_validacao[:10]:
                         flash(erro, 'error')
@@ -2355,29 +2243,19 @@ def importar_missoes():
                         flash(f'... e mais {len(erros_validacao) - 10} erros', 'error')
                     
                     # Mostrar quantas missões seriam importadas mesmo com erros
-                    flash(f'Missões válidas encontradas: {len(missoes_validas)}', 'info')
+                    flash(f'Missões válidas encontradas: {missoes_validas}', 'info')
                     return redirect(request.url)
                 
-                # Importar missões válidas
-                missoes_importadas = 0
-                for missao_data in missoes_validas:
-                    nova_missao = Missao(**missao_data)
-                    
-                    if nova_missao.status == 'autorizada':
-                        nova_missao.data_autorizacao = datetime.utcnow()
-                    
-                    db.session.add(nova_missao)
-                    missoes_importadas += 1
+                missoes_importadas = missoes_validas
                 
                 db.session.commit()
                 flash(f'Sucesso! {missoes_importadas} missões importadas.', 'success')
                 return redirect(url_for('missoes'))
                 
             except Exception as e:
+                db.session.rollback()
                 flash(f'Erro ao processar arquivo: {str(e)}', 'error')
-                print(f"Erro detalhado: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception('Erro ao importar missões')
         else:
             flash('Tipo de arquivo não permitido. Use apenas .csv', 'error')
     
@@ -2387,7 +2265,7 @@ def importar_missoes():
                          meses=MESES)
 
 
-@app.route('/download_modelo_csv')
+@rotas.route('/download_modelo_csv')
 def download_modelo_csv():
     """Gera um arquivo CSV modelo para importação"""
     dados_exemplo = [
@@ -2417,13 +2295,11 @@ def download_modelo_csv():
         }
     ]
     
-    # Criar DataFrame
-    df = pd.DataFrame(dados_exemplo)
-    
     # Criar arquivo CSV em memória
     output = io.StringIO()
-    df.to_csv(output, index=False, sep=';', encoding='utf-8')
-    output.seek(0)
+    writer = csv.DictWriter(output, fieldnames=list(dados_exemplo[0]), delimiter=';', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(dados_exemplo)
     
     # Retornar arquivo para download
     return Response(
@@ -2432,11 +2308,22 @@ def download_modelo_csv():
         headers={'Content-Disposition': 'attachment; filename=modelo_importacao_missoes.csv'}
     )
 
-# Adicionar import do Response no topo do arquivo
-from flask import Response
+
+# Rotas só de leitura e pesadas: consultam o bind de leitura, quando configurado
+ROTAS_LEITURA = {'relatorios', 'dados_graficos', 'relatorio_movimentacoes', 'saldos_bimestre'}
+
+# Rotas acessadas por links (GET) que ainda assim gravam no banco
+ROTAS_ESCRITA_GET = {'autorizar_missao', 'remover_orcamento', 'remover_complementacao'}
 
 
-db.init_app(app)
+@rotas.before_request
+def definir_modo_transacao():
+    # Requisições que alteram dados pegam o lock de escrita do SQLite logo no BEGIN
+    escrita = (request.method not in ('GET', 'HEAD', 'OPTIONS')
+               or request.endpoint in ROTAS_ESCRITA_GET)
+    banco.marcar_escrita(escrita)
+    banco.marcar_leitura(not escrita and (
+        request.endpoint in ROTAS_LEITURA or (request.endpoint or '').startswith('exportar_')))
 
 UNIDADES = ['CRPIV', '7º BPM', '8º BPM', 'CIPO']
 TIPOS_ORCAMENTO = ['DIÁRIAS', 'DERSO', 'DIÁRIAS PAV', 'DERSO PAV']
@@ -2444,7 +2331,15 @@ BIMESTRES = ['1º Bimestre', '2º Bimestre', '3º Bimestre', '4º Bimestre', '5
 MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
          'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
 
-@app.template_filter('currency')
+# Tipo orçamentário -> campo do Orcamento / chave dos dicionários de totais
+TIPO_PARA_CAMPO = {
+    'DIÁRIAS': 'diarias',
+    'DERSO': 'derso',
+    'DIÁRIAS PAV': 'diarias_pav',
+    'DERSO PAV': 'derso_pav'
+}
+
+@rotas.template_filter('currency')
 def currency_filter(value):
     if value is None:
         return "0,00"
@@ -2454,9 +2349,39 @@ def currency_filter(value):
         return "0,00"
 
 
-def create_tables():
-    with app.app_context():
-        db.create_all()
+def relatorios_padrao():
+    """Relatórios baixados diariamente por todas as unidades: (tipo, formato, filtros)"""
+    padrao = []
+    for unidade in [''] + UNIDADES:
+        padrao.append(('orcamento', 'pdf', {'unidade': unidade}))
+        padrao.append(('missoes', 'pdf', {'fonte_filtro': unidade}))
+        padrao.append(('movimentacoes', 'pdf', {'unidade_filtro': unidade}))
+    return padrao
+
+
+@rotas.comando('pregerar-relatorios')
+@click.option('--formato', 'formatos', multiple=True,
+              help='Formato(s) adicionais a pré-gerar além do PDF (csv, xlsx, json).')
+def pregerar_relatorios(formatos):
+    """Pré-gera os relatórios padrão no cache (para rodar via cron após a carga noturna)."""
+    inicio = time.perf_counter()
+    gerados = 0
+    erros = 0
+
+    for tipo, formato, filtros in relatorios_padrao():
+        for formato_saida in dict.fromkeys((formato,) + formatos):
+            try:
+                arquivo, _, _ = reports.abrir_relatorio(tipo, formato_saida, filtros)
+                arquivo.close()
+                gerados += 1
+            except Exception as e:
+                erros += 1
+                click.echo(f"❌ {tipo}/{formato_saida} {filtros}: {e}", err=True)
+
+    click.echo(f"✅ {gerados} relatórios pré-gerados em {time.perf_counter() - inicio:.1f}s"
+               + (f" ({erros} com erro)" if erros else ""))
+    if erros:
+        sys.exit(1)
 
 
 def calcular_saldos_para_distribuir():
@@ -2485,14 +2410,9 @@ def calcular_saldos_para_distribuir():
             if tipo in distribuido_por_tipo:
                 distribuido_por_tipo[tipo] = total or 0
         
-        print("💰 Cálculo de saldos para distribuir (CORRIGIDO):")
-        print("📊 Total geral disponível (Cota + Complementações):")
-        for tipo, valor in totais_geral.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Cálculo de saldos para distribuir (CORRIGIDO): Total geral disponível (Cota + Complementações): %s', totais_geral)
         
-        print("📤 Total distribuído para subunidades:")
-        for tipo, valor in distribuido_por_tipo.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Total distribuído para subunidades: %s', distribuido_por_tipo)
         
         # Calcular saldos disponíveis para distribuir
         saldos_para_distribuir = {
@@ -2502,14 +2422,12 @@ def calcular_saldos_para_distribuir():
             'derso_pav': max(0, totais_geral['derso_pav'] - distribuido_por_tipo['DERSO PAV'])
         }
         
-        print("✅ Saldos disponíveis para nova distribuição:")
-        for tipo, valor in saldos_para_distribuir.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Saldos disponíveis para nova distribuição: %s', saldos_para_distribuir)
         
         return saldos_para_distribuir
         
     except Exception as e:
-        print(f"❌ Erro em calcular_saldos_para_distribuir: {e}")
+        logger.error('Erro em calcular_saldos_para_distribuir: %s', e)
         return {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
 
 
@@ -2550,20 +2468,41 @@ def calcular_orcamento_total_todos_bimestres():
         return totais
         
     except Exception as e:
-        print(f"❌ Erro em calcular_orcamento_total_todos_bimestres: {e}")
+        logger.error('Erro em calcular_orcamento_total_todos_bimestres: %s', e)
         return {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
 
 
 def calcular_saldo_por_bimestre():
     """Calcula saldos por bimestre - FLUXO CORRETO DO CRPIV"""
     try:
-        print("🔍 Calculando saldos por bimestre...")
+        logger.debug('Calculando saldos por bimestre...')
         
         orcamentos = Orcamento.query.order_by(Orcamento.data_criacao.desc()).all()
         saldos_lista = []
         
+        # ✅ Consultas agregadas uma única vez (antes eram repetidas a cada orçamento)
+        complementacoes_por_orcamento = {}
+        for comp in ComplementacaoOrcamento.query.all():
+            complementacoes_por_orcamento.setdefault(comp.orcamento_id, []).append(comp)
+        
+        # Distribuído apenas para subunidades (NÃO conta CRPIV)
+        distribuido_por_orcamento = dict(db.session.query(
+            Distribuicao.orcamento_id, db.func.sum(Distribuicao.valor)
+        ).filter(
+            Distribuicao.unidade != 'CRPIV'
+        ).group_by(Distribuicao.orcamento_id).all())
+        
+        # Missões autorizadas (todas, independente da fonte), separadas por CRPIV e subunidades
+        autorizado_crpiv, autorizado_subunidades = db.session.query(
+            db.func.sum(db.case((Missao.fonte_dinheiro == 'CRPIV', Missao.valor), else_=0)),
+            db.func.sum(db.case((Missao.fonte_dinheiro != 'CRPIV', Missao.valor), else_=0)),
+        ).filter(Missao.status == 'autorizada').one()
+        autorizado_crpiv = autorizado_crpiv or 0
+        autorizado_subunidades = autorizado_subunidades or 0
+        total_autorizado = autorizado_crpiv + autorizado_subunidades
+        
         for orcamento in orcamentos:
-            print(f"📊 Processando {orcamento.bimestre}/{orcamento.ano}")
+            logger.debug('Processando %s/%s', orcamento.bimestre, orcamento.ano)
             
             # ✅ 1. TOTAL DISPONIBILIZADO (Cota + Complementações para CRPIV)
             total_base = sum([
@@ -2574,27 +2513,15 @@ def calcular_saldo_por_bimestre():
             ])
             
             # Complementações para este orçamento
-            complementacoes = ComplementacaoOrcamento.query.filter_by(orcamento_id=orcamento.id).all()
+            complementacoes = complementacoes_por_orcamento.get(orcamento.id, [])
             total_complementacoes = sum([comp.valor for comp in complementacoes])
             
             total_disponibilizado = total_base + total_complementacoes
             
             # ✅ 2. TOTAL DISTRIBUÍDO (apenas para subunidades, NÃO conta CRPIV)
-            total_distribuido = db.session.query(
-                db.func.sum(Distribuicao.valor)
-            ).filter(
-                Distribuicao.orcamento_id == orcamento.id,
-                Distribuicao.unidade != 'CRPIV'  # ✅ EXCLUIR CRPIV
-            ).scalar() or 0
+            total_distribuido = distribuido_por_orcamento.get(orcamento.id) or 0
             
-            # ✅ 3. TOTAL AUTORIZADO (todas as missões autorizadas, independente da fonte)
-            # Isso inclui missões pagas pelo CRPIV e pelas subunidades
-            total_autorizado = db.session.query(
-                db.func.sum(Missao.valor)
-            ).filter(
-                Missao.status == 'autorizada'
-                # ✅ Aqui você pode filtrar por período do bimestre se necessário
-            ).scalar() or 0
+            # ✅ 3. TOTAL AUTORIZADO: calculado acima (missões pagas pelo CRPIV e pelas subunidades)
             
             # ✅ 4. SALDO CORRETO = Total Disponibilizado - Total Autorizado
             # Representa quanto ainda resta do orçamento original
@@ -2604,30 +2531,9 @@ def calcular_saldo_por_bimestre():
             saldo_crpiv_disponivel = total_disponibilizado - total_distribuido
             
             # ✅ 6. SALDO SUBUNIDADES = Distribuído - Autorizado por subunidades
-            autorizado_subunidades = db.session.query(
-                db.func.sum(Missao.valor)
-            ).filter(
-                Missao.status == 'autorizada',
-                Missao.fonte_dinheiro != 'CRPIV'  # Apenas subunidades
-            ).scalar() or 0
-            
-            autorizado_crpiv = db.session.query(
-                db.func.sum(Missao.valor)
-            ).filter(
-                Missao.status == 'autorizada',
-                Missao.fonte_dinheiro == 'CRPIV'  # Apenas CRPIV
-            ).scalar() or 0
-            
             saldo_subunidades = total_distribuido - autorizado_subunidades
             
-            print(f"  💰 Total Disponibilizado (Cota + Complementações): R$ {total_disponibilizado:,.2f}")
-            print(f"  📤 Distribuído para Subunidades: R$ {total_distribuido:,.2f}")
-            print(f"  🏛️  Saldo CRPIV (não distribuído): R$ {saldo_crpiv_disponivel:,.2f}")
-            print(f"  ✅ Total Autorizado (TODAS as missões): R$ {total_autorizado:,.2f}")
-            print(f"     - Autorizado por CRPIV: R$ {autorizado_crpiv:,.2f}")
-            print(f"     - Autorizado por Subunidades: R$ {autorizado_subunidades:,.2f}")
-            print(f"  💸 Saldo Subunidades: R$ {saldo_subunidades:,.2f}")
-            print(f"  📊 SALDO FINAL: R$ {saldo:,.2f}")
+            logger.debug('Total Disponibilizado (Cota + Complementações): R$ %.2f | Distribuído para Subunidades: R$ %.2f | Saldo CRPIV (não distribuído): R$ %.2f | Total Autorizado (TODAS as missões): R$ %.2f | Autorizado por CRPIV: R$ %.2f | Autorizado por Subunidades: R$ %.2f | Saldo Subunidades: R$ %.2f | SALDO FINAL: R$ %.2f', total_disponibilizado, total_distribuido, saldo_crpiv_disponivel, total_autorizado, autorizado_crpiv, autorizado_subunidades, saldo_subunidades, saldo)
             
             saldos_lista.append({
                 'orcamento': orcamento,
@@ -2647,9 +2553,7 @@ def calcular_saldo_por_bimestre():
         return saldos_lista
         
     except Exception as e:
-        print(f"❌ Erro ao calcular saldos por bimestre: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro ao calcular saldos por bimestre')
         return []
 
 def calcular_orcamento_total_com_complementacao(orcamento):
@@ -2658,7 +2562,7 @@ def calcular_orcamento_total_com_complementacao(orcamento):
         return {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
     
     try:
-        print(f"🔍 Calculando saldo disponível para orçamento {orcamento.bimestre}/{orcamento.ano}")
+        logger.debug('Calculando saldo disponível para orçamento %s/%s', orcamento.bimestre, orcamento.ano)
         
         # ✅ PASSO 1: Total base + complementações
         totais_base = {
@@ -2668,9 +2572,7 @@ def calcular_orcamento_total_com_complementacao(orcamento):
             'derso_pav': float(orcamento.derso_pav or 0)
         }
         
-        print(f"📊 Orçamento base:")
-        for tipo, valor in totais_base.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Orçamento base: %s', totais_base)
         
         # Somar complementações
         complementacoes_agregadas = db.session.query(
@@ -2690,9 +2592,7 @@ def calcular_orcamento_total_com_complementacao(orcamento):
             elif tipo == 'DERSO PAV':
                 totais_base['derso_pav'] += total or 0
         
-        print(f"📈 Após complementações:")
-        for tipo, valor in totais_base.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Após complementações: %s', totais_base)
         
         # ✅ PASSO 2: Subtrair distribuições já feitas PARA SUBUNIDADES
         distribuicoes_agregadas = db.session.query(
@@ -2716,136 +2616,133 @@ def calcular_orcamento_total_com_complementacao(orcamento):
             elif tipo == 'DERSO PAV':
                 saldos_disponiveis['derso_pav'] -= total_distribuido or 0
         
-        print(f"📤 Após subtrair distribuições:")
-        for tipo, valor in saldos_disponiveis.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Após subtrair distribuições: %s', saldos_disponiveis)
         
         # ✅ Garantir que não há valores negativos
         for tipo in saldos_disponiveis:
             saldos_disponiveis[tipo] = max(0, saldos_disponiveis[tipo])
         
-        print(f"✅ Saldos disponíveis finais:")
-        for tipo, valor in saldos_disponiveis.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Saldos disponíveis finais: %s', saldos_disponiveis)
         
         return saldos_disponiveis
         
     except Exception as e:
-        print(f"❌ Erro em calcular_orcamento_total_com_complementacao: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro em calcular_orcamento_total_com_complementacao')
         return {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
 
 
 
-@app.route('/')
+@rotas.route('/')
 def index():
-    try:
-        # Calcular orçamento total de todos os bimestres
-        totais_geral = calcular_orcamento_total_todos_bimestres()
-        total_disponibilizado = sum(totais_geral.values())
-        
-        # Calcular saldos disponíveis para distribuir
-        saldos_para_distribuir = calcular_saldos_para_distribuir()
-        total_para_distribuir = sum(saldos_para_distribuir.values())
-        
-        # Total de missões
-        total_previsoes = db.session.query(
-            db.func.sum(Missao.valor)
-        ).filter(Missao.status == 'previsao').scalar() or 0
-        
-        total_autorizadas = db.session.query(
-            db.func.sum(Missao.valor)
-        ).filter(Missao.status == 'autorizada').scalar() or 0
-        
-        disponivel = max(0, total_disponibilizado - total_autorizadas)
-        
-        # ✅ NOVO: Calcular saldos detalhados por unidade e tipo
-        saldos_unidades_detalhados = calcular_saldos_unidades_por_tipo()
-        
-        # Calcular saldos totais por unidade (para compatibilidade)
-        saldos_unidades = {}
-        distribuicoes_unidades = {}
-        
-        for unidade in UNIDADES[1:]:  # Excluir CRPIV
-            total_unidade = 0
-            distribuido_unidade = 0
-            
-            if unidade in saldos_unidades_detalhados:
-                for tipo_data in saldos_unidades_detalhados[unidade].values():
-                    total_unidade += tipo_data['saldo']
-                    distribuido_unidade += tipo_data['distribuido']
-            
-            saldos_unidades[unidade] = total_unidade
-            distribuicoes_unidades[unidade] = distribuido_unidade
-        
-        # Calcular saldos por bimestre
-        saldos_bimestre = calcular_saldo_por_bimestre()
-        
-        # Logs para debug
-        print("📊 DASHBOARD - Resumo dos cálculos:")
-        print(f"💰 Total disponibilizado (Cota + Complementações): R$ {total_disponibilizado:,.2f}")
-        print(f"📤 Total distribuído para subunidades: R$ {sum(distribuicoes_unidades.values()):,.2f}")
-        print(f"✅ Total autorizado: R$ {total_autorizadas:,.2f}")
-        print(f"📊 Disponível restante: R$ {disponivel:,.2f}")
-        print(f"🔄 Total para distribuir (CRPIV): R$ {total_para_distribuir:,.2f}")
-        
-        dashboard_data = {
-            'total_disponibilizado': total_disponibilizado,
-            'total_previsoes': total_previsoes,
-            'total_autorizadas': total_autorizadas,
-            'disponivel': disponivel,
-            'distribuicoes_unidades': distribuicoes_unidades
-        }
-        # Saldo não distribuído do CRPIV - pode ser usado pelo CRPIV ou redistribuído
-        saldo_crpiv = sum([saldos_para_distribuir.get(k, 0) for k in ['diarias', 'derso', 'diarias_pav', 'derso_pav']])
-        dashboard_data['saldo_crpiv'] = saldo_crpiv
-        dashboard_data['saldo_crpiv_detalhado'] = {
-            'diarias': saldos_para_distribuir.get('diarias', 0),
-            'derso': saldos_para_distribuir.get('derso', 0),
-            'diarias_pav': saldos_para_distribuir.get('diarias_pav', 0),
-            'derso_pav': saldos_para_distribuir.get('derso_pav', 0),
-        }
+    """Estrutura do dashboard; cada painel é carregado em paralelo de /painel/<nome>"""
+    return render_template('index.html', paineis=list(PAINEIS_DASHBOARD))
 
 
-        dashboard_data['saldo_crpiv'] = saldo_crpiv
-        dashboard_data['saldo_crpiv_detalhado'] = {
-            'diarias': saldos_para_distribuir.get('diarias', 0),
-            'derso': saldos_para_distribuir.get('derso', 0),
-            'diarias_pav': saldos_para_distribuir.get('diarias_pav', 0),
-            'derso_pav': saldos_para_distribuir.get('derso_pav', 0)
-        }
-        
-        return render_template('index.html', 
-                             totais_geral=totais_geral,
-                             saldos_para_distribuir=saldos_para_distribuir,
-                             total_para_distribuir=total_para_distribuir,
-                             dashboard_data=dashboard_data,
-                             saldos_unidades=saldos_unidades,
-                             saldos_unidades_detalhados=saldos_unidades_detalhados,  # ✅ NOVO
-                             saldos_bimestre=saldos_bimestre)
-                             
-    except Exception as e:
-        print(f"❌ Erro na rota index: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Erro ao carregar dados do dashboard', 'error')
-        return render_template('index.html', 
-                             totais_geral={'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0},
-                             saldos_para_distribuir={'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0},
-                             total_para_distribuir=0,
-                             dashboard_data={},
-                             saldos_unidades={},
-                             saldos_unidades_detalhados={},  # ✅ NOVO
-                             saldos_bimestre=[])
+# ✅ PAINÉIS DO DASHBOARD
+# Cada painel calcula apenas os próprios dados e é renderizado como um
+# fragmento HTML independente, guardado no cache de relatórios.
+
+PAINEIS_DASHBOARD = {}
+
+
+def painel_dashboard(nome):
+    """Registra a função que monta o contexto do painel ``painel_<nome>.html``"""
+    def decorador(funcao):
+        PAINEIS_DASHBOARD[nome] = funcao
+        return funcao
+    return decorador
+
+
+@painel_dashboard('totais')
+def painel_totais():
+    totais_geral = calcular_orcamento_total_todos_bimestres()
+    total_disponibilizado = sum(totais_geral.values())
+
+    totais_status = dict(db.session.query(
+        Missao.status,
+        db.func.sum(Missao.valor)
+    ).group_by(Missao.status).all())
+    total_previsoes = totais_status.get('previsao') or 0
+    total_autorizadas = totais_status.get('autorizada') or 0
+
+    return {
+        'total_disponibilizado': total_disponibilizado,
+        'total_previsoes': total_previsoes,
+        'total_autorizadas': total_autorizadas,
+        'disponivel': max(0, total_disponibilizado - total_autorizadas)
+    }
+
+
+@painel_dashboard('crpiv')
+def painel_crpiv():
+    # Saldo não distribuído do CRPIV - pode ser usado pelo CRPIV ou redistribuído
+    saldos_para_distribuir = calcular_saldos_para_distribuir()
+    saldo_crpiv_detalhado = {campo: saldos_para_distribuir.get(campo, 0) for campo in TIPO_PARA_CAMPO.values()}
+
+    return {
+        'totais_geral': calcular_orcamento_total_todos_bimestres(),
+        'saldos_para_distribuir': saldos_para_distribuir,
+        'total_para_distribuir': sum(saldos_para_distribuir.values()),
+        'saldo_crpiv': sum(saldo_crpiv_detalhado.values()),
+        'saldo_crpiv_detalhado': saldo_crpiv_detalhado
+    }
+
+
+@painel_dashboard('unidades')
+def painel_unidades():
+    saldos_unidades_detalhados = calcular_saldos_unidades_por_tipo()
+
+    # Totais por unidade a partir do detalhamento por tipo
+    saldos_unidades = {}
+    distribuicoes_unidades = {}
+    for unidade in UNIDADES[1:]:  # Excluir CRPIV
+        tipos = saldos_unidades_detalhados.get(unidade, {}).values()
+        saldos_unidades[unidade] = sum(tipo_data['saldo'] for tipo_data in tipos)
+        distribuicoes_unidades[unidade] = sum(tipo_data['distribuido'] for tipo_data in tipos)
+
+    return {
+        'saldos_unidades': saldos_unidades,
+        'saldos_unidades_detalhados': saldos_unidades_detalhados,
+        'distribuicoes_unidades': distribuicoes_unidades
+    }
+
+
+@painel_dashboard('bimestres')
+def painel_bimestres():
+    return {'saldos_bimestre': calcular_saldo_por_bimestre()[:3]}
+
+
+@rotas.route('/painel/<nome>')
+def painel(nome):
+    """Fragmento HTML de um painel do dashboard (servido do cache de relatórios)"""
+    if nome not in PAINEIS_DASHBOARD:
+        abort(404)
+
+    cache = reports.report_cache
+    conteudo = cache.obter('painel', 'html', {'nome': nome})
+    if conteudo is None:
+        try:
+            contexto = PAINEIS_DASHBOARD[nome]()
+            conteudo = render_template(f'painel_{nome}.html', **contexto).encode('utf-8')
+        except Exception as e:
+            logger.exception('Erro no painel %s', nome)
+            db.session.rollback()
+            return render_template('painel_erro.html', nome=nome), 500
+        cache.guardar('painel', 'html', {'nome': nome}, conteudo)
+
+    resposta = Response(conteudo, mimetype='text/html')
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
 
 
 def calcular_saldos_unidades_por_tipo():
     """Calcula saldos detalhados por unidade e tipo orçamentário"""
     try:
-        print("🔍 Calculando saldos detalhados por unidade e tipo...")
+        logger.debug('Calculando saldos detalhados por unidade e tipo...')
         
         saldos_detalhados = {}
+        distribuido_por_chave, autorizado_por_chave = somar_distribuido_e_autorizado()
         
         # Para cada unidade (exceto CRPIV)
         for unidade in UNIDADES[1:]:
@@ -2853,31 +2750,13 @@ def calcular_saldos_unidades_por_tipo():
             
             # Para cada tipo orçamentário
             for tipo in TIPOS_ORCAMENTO:
-                print(f"  Calculando {unidade} - {tipo}")
-                
-                # Total distribuído para esta unidade/tipo
-                distribuido = db.session.query(
-                    db.func.sum(Distribuicao.valor)
-                ).filter(
-                    Distribuicao.unidade == unidade,
-                    Distribuicao.tipo_orcamento == tipo
-                ).scalar() or 0
-                
-                # Total autorizado para esta unidade/tipo
-                autorizado = db.session.query(
-                    db.func.sum(Missao.valor)
-                ).filter(
-                    Missao.fonte_dinheiro == unidade,
-                    Missao.tipo == tipo,
-                    Missao.status == 'autorizada'
-                ).scalar() or 0
+                distribuido = distribuido_por_chave.get((unidade, tipo), 0)
+                autorizado = autorizado_por_chave.get((unidade, tipo), 0)
                 
                 # Saldo = Distribuído - Autorizado
                 saldo = distribuido - autorizado
                 
-                print(f"    Distribuído: R$ {distribuido:,.2f}")
-                print(f"    Autorizado: R$ {autorizado:,.2f}")
-                print(f"    Saldo: R$ {saldo:,.2f}")
+                logger.debug('Distribuído: R$ %.2f | Autorizado: R$ %.2f | Saldo: R$ %.2f', distribuido, autorizado, saldo)
                 
                 # Armazenar dados detalhados
                 saldos_detalhados[unidade][tipo] = {
@@ -2886,349 +2765,30 @@ def calcular_saldos_unidades_por_tipo():
                     'saldo': saldo
                 }
         
-        print(f"✅ Saldos detalhados calculados para {len(saldos_detalhados)} unidades")
+        logger.debug('Saldos detalhados calculados para %s unidades', len(saldos_detalhados))
         return saldos_detalhados
         
     except Exception as e:
-        print(f"❌ Erro em calcular_saldos_unidades_por_tipo: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro em calcular_saldos_unidades_por_tipo')
         return {}
 
-@app.route('/exportar_missoes_pdf')
-def exportar_missoes_pdf():
-    """Exportar missões para PDF separadas por unidades"""
-    try:
-        # Buscar filtros
-        omp_filtro = request.args.get('opm_filtro', '')
-        fonte_filtro = request.args.get('fonte_filtro', '')
-        
-        print(f"🔍 Exportando PDF de missões - Filtros: OMP='{omp_filtro}', Fonte='{fonte_filtro}'")
-        
-        # Buscar missões com filtros
-        query = Missao.query
-        
-        if omp_filtro:
-            query = query.filter(Missao.opm_destino == omp_filtro)
-        
-        if fonte_filtro:
-            query = query.filter(Missao.fonte_dinheiro == fonte_filtro)
-        
-        missoes = query.order_by(Missao.fonte_dinheiro, Missao.status.desc(), Missao.data_criacao.desc()).all()
-        
-        print(f"📋 {len(missoes)} missões encontradas para exportação")
-        
-        # Organizar missões por unidade
-        missoes_por_unidade = {}
-        for missao in missoes:
-            unidade = missao.fonte_dinheiro
-            if unidade not in missoes_por_unidade:
-                missoes_por_unidade[unidade] = {
-                    'previsao': [],
-                    'autorizada': [],
-                    'total_previsao': 0,
-                    'total_autorizada': 0,
-                    'total_geral': 0
-                }
-            
-            missoes_por_unidade[unidade][missao.status].append(missao)
-            
-            if missao.status == 'previsao':
-                missoes_por_unidade[unidade]['total_previsao'] += missao.valor
-            else:
-                missoes_por_unidade[unidade]['total_autorizada'] += missao.valor
-            
-            missoes_por_unidade[unidade]['total_geral'] += missao.valor
-        
-        # Criar buffer para o PDF
-        buffer = io.BytesIO()
-        
-        # Configurar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=50,
-            leftMargin=50,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # ✅ ESTILOS CUSTOMIZADOS
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#1f4e79'),
-            fontName='Helvetica-Bold'
-        )
-        
-        subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            textColor=colors.grey
-        )
-        
-        unidade_style = ParagraphStyle(
-            'UnidadeTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=15,
-            spaceBefore=20,
-            textColor=colors.HexColor('#2c5aa0'),
-            fontName='Helvetica-Bold'
-        )
-        
-        # ✅ CABEÇALHO
-        elements.append(Paragraph("RELATÓRIO DE MISSÕES POR UNIDADE", title_style))
-        elements.append(Paragraph("CRPIV - Comando Regional de Polícia IV", subtitle_style))
-        
-        # Informações dos filtros
-        filtro_info = []
-        if omp_filtro:
-            filtro_info.append(f"OPM Destino: {omp_filtro}")
-        if fonte_filtro:
-            filtro_info.append(f"Fonte: {fonte_filtro}")
-        
-        if filtro_info:
-            elements.append(Paragraph(f"Filtros aplicados: {' | '.join(filtro_info)}", subtitle_style))
-        
-        elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", subtitle_style))
-        elements.append(Spacer(1, 20))
-        
-        # ✅ RESUMO EXECUTIVO
-        total_missoes = len(missoes)
-        total_previsoes = sum([m.valor for m in missoes if m.status == 'previsao'])
-        total_autorizadas = sum([m.valor for m in missoes if m.status == 'autorizada'])
-        total_geral = total_previsoes + total_autorizadas
-        
-        resumo_data = [
-            ['RESUMO EXECUTIVO', ''],
-            ['Total de Missões:', f'{total_missoes:,}'],
-            ['Total em Previsão:', f'R$ {total_previsoes:,.2f}'.replace('.', ',')],
-            ['Total Autorizada:', f'R$ {total_autorizadas:,.2f}'.replace('.', ',')],
-            ['Valor Total Geral:', f'R$ {total_geral:,.2f}'.replace('.', ',')],
-            ['Unidades Envolvidas:', f'{len(missoes_por_unidade)} unidade(s)']
-        ]
-        
-        resumo_table = Table(resumo_data, colWidths=[3.5*inch, 2.5*inch])
-        resumo_table.setStyle(get_table_style_header())
-        
-        elements.append(resumo_table)
-        elements.append(Spacer(1, 30))
-        
-        # ✅ MISSÕES POR UNIDADE
-        for unidade, dados in missoes_por_unidade.items():
-            # Título da unidade
-            elements.append(Paragraph(f"📍 {unidade}", unidade_style))
-            
-            # Resumo da unidade
-            unidade_resumo = [
-                ['Resumo da Unidade', 'Quantidade', 'Valor Total'],
-                ['Missões em Previsão', f"{len(dados['previsao'])}", f"R$ {dados['total_previsao']:,.2f}".replace('.', ',')],
-                ['Missões Autorizadas', f"{len(dados['autorizada'])}", f"R$ {dados['total_autorizada']:,.2f}".replace('.', ',')],
-                ['TOTAL DA UNIDADE', f"{len(dados['previsao']) + len(dados['autorizada'])}", f"R$ {dados['total_geral']:,.2f}".replace('.', ',')]
-            ]
-            
-            unidade_resumo_table = Table(unidade_resumo, colWidths=[3*inch, 1.5*inch, 2*inch])
-            unidade_resumo_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5aa0')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ]))
-            
-            elements.append(unidade_resumo_table)
-            elements.append(Spacer(1, 15))
-            
-            # ✅ MISSÕES AUTORIZADAS
-            if dados['autorizada']:
-                elements.append(Paragraph(f"✅ Missões Autorizadas ({len(dados['autorizada'])})", 
-                                       ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, 
-                                                    textColor=colors.HexColor('#28a745'), fontName='Helvetica-Bold')))
-                
-                auth_data = [['OPM Destino', 'Descrição', 'Tipo', 'Período', 'Valor']]
-                
-                for missao in dados['autorizada']:
-                    auth_data.append([
-                        missao.opm_destino,
-                        (missao.descricao or '')[:35] + ('...' if len(missao.descricao or '') > 35 else ''),
-                        missao.tipo,
-                        missao.periodo or '-',
-                        f'R$ {missao.valor:,.2f}'.replace('.', ',')
-                    ])
-                
-                auth_table = Table(auth_data, colWidths=[1.2*inch, 2.3*inch, 1*inch, 1*inch, 1*inch])
-                auth_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#28a745')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Última coluna à direita
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 8),
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ]))
-                
-                elements.append(auth_table)
-                elements.append(Spacer(1, 10))
-            
-            # ✅ MISSÕES EM PREVISÃO
-            if dados['previsao']:
-                elements.append(Paragraph(f"⏳ Missões em Previsão ({len(dados['previsao'])})", 
-                                       ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12, 
-                                                    textColor=colors.HexColor('#ffc107'), fontName='Helvetica-Bold')))
-                
-                prev_data = [['OPM Destino', 'Descrição', 'Tipo', 'Período', 'Valor']]
-                
-                for missao in dados['previsao']:
-                    prev_data.append([
-                        missao.opm_destino,
-                        (missao.descricao or '')[:35] + ('...' if len(missao.descricao or '') > 35 else ''),
-                        missao.tipo,
-                        missao.periodo or '-',
-                        f'R$ {missao.valor:,.2f}'.replace('.', ',')
-                    ])
-                
-                prev_table = Table(prev_data, colWidths=[1.2*inch, 2.3*inch, 1*inch, 1*inch, 1*inch])
-                prev_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#ffc107')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 8),
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.lightyellow),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ]))
-                
-                elements.append(prev_table)
-                elements.append(Spacer(1, 10))
-            
-            # Se não há missões na unidade
-            if not dados['autorizada'] and not dados['previsao']:
-                elements.append(Paragraph("ℹ️ Nenhuma missão encontrada para esta unidade", 
-                                       ParagraphStyle('Info', parent=styles['Normal'], fontSize=10, 
-                                                    textColor=colors.grey, alignment=TA_CENTER)))
-            
-            elements.append(Spacer(1, 20))
-        
-        # ✅ RODAPÉ
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("_" * 80, ParagraphStyle('Line', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER)))
-        elements.append(Paragraph(
-            f"Relatório gerado automaticamente pelo Sistema CRPIV em {datetime.now().strftime('%d/%m/%Y às %H:%M')}",
-            ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-        ))
-        
-        # Gerar PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        # Nome do arquivo com filtros
-        nome_arquivo = "missoes_por_unidade"
-        if fonte_filtro:
-            nome_arquivo += f"_{fonte_filtro.replace(' ', '_')}"
-        if omp_filtro:
-            nome_arquivo += f"_destino_{omp_filtro.replace(' ', '_')}"
-        nome_arquivo += f"_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
-        
-        print(f"✅ PDF gerado: {nome_arquivo}")
-        
-        return Response(
-            buffer.getvalue(),
-            mimetype='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename={nome_arquivo}'
-            }
-        )
-        
-    except Exception as e:
-        print(f"❌ Erro na exportação PDF de missões: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Erro ao exportar relatório de missões em PDF', 'error')
-        return redirect(url_for('missoes'))
-
-
-def get_table_style_header():
-    """Estilo padrão para tabelas com cabeçalho"""
-    return TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-    ])
-
-
-def create_missoes_table_style(header_color, body_color):
-    """Criar estilo específico para tabelas de missões"""
-    return TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black if header_color == '#ffc107' else colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Última coluna à direita
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, 1), (-1, -1), body_color),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ])
-
-
-@app.route('/salvar_distribuicao', methods=['POST'])
+@rotas.route('/salvar_distribuicao', methods=['POST'])
 def salvar_distribuicao():
     """VERSÃO CORRIGIDA - Compatível com HTML"""
-    print("=" * 50)
-    print("🔍 INICIANDO DISTRIBUIÇÃO - DEBUG ATIVO")
-    print("=" * 50)
-    
     try:
-        # Debug: Mostrar TODOS os dados recebidos
-        print("📋 TODOS OS DADOS DO FORMULÁRIO:")
-        for key, value in request.form.items():
-            print(f"  '{key}' = '{value}'")
-        print("-" * 30)
-        
         orcamento_id = request.form['orcamento_id']
-        print(f"📊 Orçamento ID: {orcamento_id}")
+        logger.debug('Iniciando distribuição do orçamento %s', orcamento_id)
         
         orcamento = db.session.get(Orcamento, orcamento_id)
         if not orcamento:
             flash('Orçamento não encontrado', 'error')
             return redirect(url_for('orcamento'))
         
-        print(f"✅ Orçamento encontrado: {orcamento.bimestre}/{orcamento.ano}")
+        logger.debug('Orçamento encontrado: %s/%s', orcamento.bimestre, orcamento.ano)
         
         # Verificar saldos disponíveis
         saldos_para_distribuir = calcular_saldos_para_distribuir()
-        print("💰 Saldos disponíveis:")
-        for tipo, valor in saldos_para_distribuir.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
+        logger.debug('Saldos disponíveis: %s', saldos_para_distribuir)
         
         # ✅ MAPEAMENTO CORRETO - HTML usa nomes sem acento
         mapeamento_html_para_python = {
@@ -3254,7 +2814,7 @@ def salvar_distribuicao():
                 campo_nome = f"{unidade}_{tipo_html}"
                 valor_str = request.form.get(campo_nome, '0').strip()
                 
-                print(f"🔍 {unidade} - {tipo_html}: '{valor_str}'")
+                logger.debug("%s - %s: '%s'", unidade, tipo_html, valor_str)
                 
                 if not valor_str or valor_str == '0' or valor_str == '':
                     continue
@@ -3267,8 +2827,7 @@ def salvar_distribuicao():
                         # ✅ CONVERTER PARA O TIPO PYTHON CORRETO
                         tipo_python = mapeamento_html_para_python[tipo_html]
                         
-                        print(f"✅ Valor válido: {campo_nome} = R$ {valor_float:,.2f}")
-                        print(f"   Convertido para: {tipo_python}")
+                        logger.debug('Valor válido: %s = R$ %.2f | Convertido para: %s', campo_nome, valor_float, tipo_python)
                         
                         totais_por_tipo[tipo_python] += valor_float
                         distribuicoes_para_salvar.append({
@@ -3277,25 +2836,23 @@ def salvar_distribuicao():
                             'valor': valor_float
                         })
                     else:
-                        print(f"⚠️ Valor zero ignorado")
+                        logger.warning('Valor zero ignorado')
                         
                 except (ValueError, TypeError) as e:
-                    print(f"❌ Erro ao converter valor '{valor_str}': {e}")
+                    logger.warning("Erro ao converter valor '%s': %s", valor_str, e)
                     flash(f'Valor inválido para {unidade} - {tipo_html}: {valor_str}', 'error')
                     return redirect(url_for('distribuir', orcamento_id=orcamento_id))
         
-        print("📊 Totais por tipo a distribuir:")
-        for tipo, total in totais_por_tipo.items():
-            print(f"  {tipo}: R$ {total:,.2f}")
+        logger.debug('Totais por tipo a distribuir: %s', totais_por_tipo)
         
         # Verificar se há distribuições para salvar
         if not distribuicoes_para_salvar:
-            print("⚠️ NENHUMA DISTRIBUIÇÃO VÁLIDA ENCONTRADA!")
+            logger.warning('NENHUMA DISTRIBUIÇÃO VÁLIDA ENCONTRADA!')
             flash('⚠️ Nenhum valor válido foi encontrado para distribuir. Verifique se preencheu os campos.', 'warning')
             return redirect(url_for('distribuir', orcamento_id=orcamento_id))
         
         # Validação de saldos
-        print("🔍 Validando saldos...")
+        logger.debug('Validando saldos...')
         erros_validacao = []
         
         mapeamento_tipos_saldo = {
@@ -3309,25 +2866,25 @@ def salvar_distribuicao():
             disponivel = saldos_para_distribuir[tipo_saldo]
             solicitado = totais_por_tipo[tipo_orcamento]
             
-            print(f"  {tipo_orcamento}: Solicitado R$ {solicitado:,.2f} / Disponível R$ {disponivel:,.2f}")
+            logger.debug('%s: Solicitado R$ %.2f / Disponível R$ %.2f', tipo_orcamento, solicitado, disponivel)
             
             if solicitado > disponivel:
                 erro_msg = (f"{tipo_orcamento}: Tentando distribuir R$ {solicitado:,.2f}, "
                            f"mas só há R$ {disponivel:,.2f} disponível")
                 erros_validacao.append(erro_msg)
-                print(f"❌ {erro_msg}")
+                logger.info('%s', erro_msg)
         
         if erros_validacao:
-            print(f"❌ {len(erros_validacao)} erros de validação encontrados")
+            logger.info('%s erros de validação encontrados', len(erros_validacao))
             for erro in erros_validacao:
                 flash(erro, 'error')
             return redirect(url_for('distribuir', orcamento_id=orcamento_id))
         
-        print("✅ Validação passou - Salvando distribuições...")
+        logger.debug('Validação passou - Salvando distribuições...')
         
         # Limpar distribuições anteriores
         distribuicoes_anteriores = Distribuicao.query.filter_by(orcamento_id=orcamento_id).count()
-        print(f"🗑️ Removendo {distribuicoes_anteriores} distribuições anteriores")
+        logger.debug('Removendo %s distribuições anteriores', distribuicoes_anteriores)
         
         Distribuicao.query.filter_by(orcamento_id=orcamento_id).delete()
         
@@ -3342,9 +2899,9 @@ def salvar_distribuicao():
             )
             db.session.add(distribuicao)
             distribuicoes_salvas += 1
-            print(f"💾 Salvando: {item['unidade']} - {item['tipo']} - R$ {item['valor']:,.2f}")
+            logger.debug('Salvando: %s - %s - R$ %.2f', item['unidade'], item['tipo'], item['valor'])
         
-        print(f"💾 Commitando {distribuicoes_salvas} distribuições...")
+        logger.debug('Commitando %s distribuições...', distribuicoes_salvas)
         db.session.commit()
         # ✅ REGISTRAR LOGS DAS DISTRIBUIÇÕES
         for item in distribuicoes_para_salvar:
@@ -3358,24 +2915,18 @@ def salvar_distribuicao():
                 orcamento_id=orcamento_id
             )
         
-        print("✅ DISTRIBUIÇÃO CONCLUÍDA COM SUCESSO!")
+        logger.info('Distribuição do orçamento %s salva: %s itens', orcamento_id, distribuicoes_salvas)
         flash(f'✅ Distribuição salva com sucesso! {distribuicoes_salvas} itens distribuídos.', 'success')
         
         return redirect(url_for('distribuir', orcamento_id=orcamento_id))
         
     except Exception as e:
-        print(f"❌ ERRO CRÍTICO:")
-        print(f"   Tipo: {type(e).__name__}")
-        print(f"   Mensagem: {str(e)}")
-        
-        import traceback
-        traceback.print_exc()
-        
+        logger.exception('Erro ao salvar distribuição do orçamento %s', orcamento_id)
         db.session.rollback()
         flash(f'❌ Erro ao salvar distribuição: {str(e)}', 'error')
         return redirect(url_for('distribuir', orcamento_id=orcamento_id))
 
-@app.route('/relatorio_movimentacoes')
+@rotas.route('/relatorio_movimentacoes')
 def relatorio_movimentacoes():
     """Relatório geral de movimentações - VERSÃO CORRIGIDA"""
     try:
@@ -3384,70 +2935,30 @@ def relatorio_movimentacoes():
         data_inicio = request.args.get('data_inicio', '')
         data_fim = request.args.get('data_fim', '')
         
-        print(f"🔍 Carregando relatório de movimentações...")
-        print(f"   Filtros: unidade='{filtro_unidade}', tipo='{filtro_tipo}', inicio='{data_inicio}', fim='{data_fim}'")
-        
-        # ✅ VERIFICAR SE A TABELA EXISTE E TEM DADOS
+        # ✅ TOTAIS CALCULADOS NO BANCO (uma única consulta agregada)
         try:
-            total_registros = MovimentacaoOrcamentaria.query.count()
-            print(f"📊 Total de registros na tabela MovimentacaoOrcamentaria: {total_registros}")
+            totais_query = db.session.query(
+                db.func.count(MovimentacaoOrcamentaria.id),
+                db.func.coalesce(db.func.sum(MovimentacaoOrcamentaria.valor), 0)
+            )
+            total_movimentacoes, valor_total = filtrar_movimentacoes(
+                totais_query, filtro_unidade, filtro_tipo, data_inicio, data_fim).one()
         except Exception as e:
-            print(f"❌ Erro ao acessar tabela MovimentacaoOrcamentaria: {e}")
+            logger.error('Erro ao acessar tabela MovimentacaoOrcamentaria: %s', e)
+            db.session.rollback()
             # Se a tabela não existe, usar dados simulados
             return relatorio_movimentacoes_simulado(filtro_unidade, filtro_tipo, data_inicio, data_fim)
-        
-        # ✅ CONSTRUIR QUERY COM FILTROS
-        query = MovimentacaoOrcamentaria.query
-        
-        # Aplicar filtros
-        if filtro_unidade:
-            query = query.filter(
-                or_(
-                    MovimentacaoOrcamentaria.unidade_origem == filtro_unidade,
-                    MovimentacaoOrcamentaria.unidade_destino == filtro_unidade
-                )
-            )
-            print(f"   Aplicado filtro de unidade: {filtro_unidade}")
-        
-        if filtro_tipo:
-            query = query.filter(MovimentacaoOrcamentaria.tipo == filtro_tipo)
-            print(f"   Aplicado filtro de tipo: {filtro_tipo}")
-        
-        if data_inicio:
-            try:
-                data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
-                query = query.filter(MovimentacaoOrcamentaria.data_movimentacao >= data_inicio_obj)
-                print(f"   Aplicado filtro data início: {data_inicio}")
-            except ValueError:
-                print(f"   Erro ao converter data início: {data_inicio}")
-        
-        if data_fim:
-            try:
-                data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d')
-                query = query.filter(MovimentacaoOrcamentaria.data_movimentacao <= data_fim_obj)
-                print(f"   Aplicado filtro data fim: {data_fim}")
-            except ValueError:
-                print(f"   Erro ao converter data fim: {data_fim}")
-        
-        # ✅ EXECUTAR QUERY E BUSCAR DADOS
-        movimentacoes = query.order_by(MovimentacaoOrcamentaria.data_movimentacao.desc()).all()
-        print(f"📋 Movimentações encontradas: {len(movimentacoes)}")
-        
-        # ✅ LOG DETALHADO DAS MOVIMENTAÇÕES
-        if movimentacoes:
-            print("📋 Primeiras 5 movimentações:")
-            for i, mov in enumerate(movimentacoes[:5]):
-                print(f"  {i+1}. {mov.data_movimentacao} - {mov.tipo} - {mov.unidade_origem} → {mov.unidade_destino} - R$ {mov.valor or 0:,.2f}")
-        else:
-            print("⚠️ Nenhuma movimentação encontrada!")
-        
-        # Estatísticas
-        total_movimentacoes = len(movimentacoes)
-        valor_total = sum([m.valor for m in movimentacoes if m.valor])
-        
-        print(f"📊 Estatísticas calculadas:")
-        print(f"   Total de movimentações: {total_movimentacoes}")
-        print(f"   Valor total: R$ {valor_total:,.2f}")
+
+        valor_total = float(valor_total or 0)
+
+        # ✅ APENAS A PÁGINA ATUAL É CARREGADA, PAGINADA POR (data_movimentacao, id)
+        query = filtrar_movimentacoes(MovimentacaoOrcamentaria.query,
+                                      filtro_unidade, filtro_tipo, data_inicio, data_fim)
+        por_pagina = pagination.por_pagina_da_requisicao()
+        pagina = pagination.paginar(query, MovimentacaoOrcamentaria.data_movimentacao, MovimentacaoOrcamentaria.id,
+                                    apos=request.args.get('apos'),
+                                    antes=request.args.get('antes'),
+                                    por_pagina=por_pagina)
         
         tipos_movimento = ['orcamento_criado', 'distribuicao', 'autorizacao_missao', 
                           'transferencia_entre_unidades', 'nova_distribuicao_crpiv', 'recolhimento']
@@ -3456,13 +2967,13 @@ def relatorio_movimentacoes():
             'unidade_filtro': filtro_unidade,
             'tipo_filtro': filtro_tipo,
             'data_inicio': data_inicio,
-            'data_fim': data_fim
+            'data_fim': data_fim,
+            'por_pagina': por_pagina
         }
         
-        print(f"🎯 Renderizando template com {len(movimentacoes)} movimentações")
-        
         return render_template('relatorio_movimentacoes.html',
-                             movimentacoes=movimentacoes,
+                             movimentacoes=pagina.itens,
+                             pagina=pagina,
                              total_movimentacoes=total_movimentacoes,
                              valor_total=valor_total,
                              unidades=UNIDADES,
@@ -3470,9 +2981,7 @@ def relatorio_movimentacoes():
                              filtros=filtros_retorno)
                              
     except Exception as e:
-        print(f"❌ Erro no relatório: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro no relatório')
         flash('Erro ao carregar relatório de movimentações', 'error')
         
         # Retornar template vazio em caso de erro
@@ -3491,211 +3000,62 @@ def relatorio_movimentacoes():
 
 
 def relatorio_movimentacoes_simulado(filtro_unidade='', filtro_tipo='', data_inicio='', data_fim=''):
-    """Função auxiliar para dados simulados quando tabela não existe"""
-    print("📊 Gerando dados simulados para movimentações...")
-    
+    """Relatório com o histórico reconstruído quando a tabela de movimentações não existe"""
+    logger.debug('Usando histórico de movimentações reconstruído...')
+
+    filtros = {
+        'unidade_filtro': filtro_unidade,
+        'tipo_filtro': filtro_tipo,
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'por_pagina': pagination.por_pagina_da_requisicao()
+    }
+    tipos_movimento = ['orcamento_criado', 'distribuicao', 'autorizacao_missao']
+
     try:
-        # Simular movimentações baseadas em dados existentes
-        movimentacoes_simuladas = []
-        
-        # 1. Simular criação de orçamentos
-        orcamentos = Orcamento.query.all()
-        for orc in orcamentos:
-            class MovimentacaoSimulada:
-                def __init__(self, data, tipo, descricao, origem=None, destino=None, tipo_orc=None, valor=None, usuario="Sistema"):
-                    self.data_movimentacao = data
-                    self.tipo = tipo
-                    self.descricao = descricao  
-                    self.unidade_origem = origem
-                    self.unidade_destino = destino
-                    self.tipo_orcamento = tipo_orc
-                    self.valor = valor
-                    self.usuario = usuario
-            
-            mov = MovimentacaoSimulada(
-                data=orc.data_criacao,
-                tipo='orcamento_criado',
-                descricao=f'Orçamento criado: {orc.bimestre}/{orc.ano}',
-                valor=sum([orc.diarias, orc.derso, orc.diarias_pav, orc.derso_pav])
-            )
-            movimentacoes_simuladas.append(mov)
-        
-        # 2. Simular distribuições
-        distribuicoes = Distribuicao.query.all()
-        for dist in distribuicoes:
-            mov = MovimentacaoSimulada(
-                data=dist.data_distribuicao,
-                tipo='distribuicao',
-                descricao=f'Distribuição para {dist.unidade}',
-                origem='CRPIV',
-                destino=dist.unidade,
-                tipo_orc=dist.tipo_orcamento,
-                valor=dist.valor
-            )
-            movimentacoes_simuladas.append(mov)
-        
-        # 3. Simular autorizações
-        missoes = Missao.query.filter_by(status='autorizada').all()
-        for missao in missoes:
-            mov = MovimentacaoSimulada(
-                data=missao.data_autorizacao or missao.data_criacao,
-                tipo='autorizacao_missao',
-                descricao=f'Missão autorizada: {missao.descricao[:30]}...',
-                origem=missao.fonte_dinheiro,
-                destino=missao.omp_destino,
-                tipo_orc=missao.tipo,
-                valor=missao.valor
-            )
-            movimentacoes_simuladas.append(mov)
-        
-        # Ordenar por data
-        movimentacoes_simuladas.sort(key=lambda x: x.data_movimentacao, reverse=True)
-        
-        # Aplicar filtros
-        if filtro_unidade:
-            movimentacoes_simuladas = [
-                m for m in movimentacoes_simuladas 
-                if m.unidade_origem == filtro_unidade or m.unidade_destino == filtro_unidade
-            ]
-        
-        if filtro_tipo:
-            movimentacoes_simuladas = [
-                m for m in movimentacoes_simuladas 
-                if m.tipo == filtro_tipo
-            ]
-        
-        total_movimentacoes = len(movimentacoes_simuladas)
-        valor_total = sum([m.valor for m in movimentacoes_simuladas if m.valor])
-        
-        print(f"✅ Dados simulados: {total_movimentacoes} movimentações, valor total: R$ {valor_total:,.2f}")
-        
-        tipos_movimento = ['orcamento_criado', 'distribuicao', 'autorizacao_missao']
-        
+        historico = movimentacoes_reconstruidas()
+
+        total_movimentacoes, valor_total = filtrar_movimentacoes(
+            db.session.query(
+                db.func.count(historico.c.id),
+                db.func.coalesce(db.func.sum(historico.c.valor), 0)
+            ), filtro_unidade, filtro_tipo, data_inicio, data_fim, colunas=historico.c).one()
+
+        query = filtrar_movimentacoes(db.session.query(historico),
+                                      filtro_unidade, filtro_tipo, data_inicio, data_fim, colunas=historico.c)
+        pagina = pagination.paginar(query, historico.c.data_movimentacao, historico.c.id,
+                                    apos=request.args.get('apos'),
+                                    antes=request.args.get('antes'),
+                                    por_pagina=filtros['por_pagina'])
+
         return render_template('relatorio_movimentacoes.html',
-                             movimentacoes=movimentacoes_simuladas,
+                             movimentacoes=pagina.itens,
+                             pagina=pagina,
                              total_movimentacoes=total_movimentacoes,
-                             valor_total=valor_total,
+                             valor_total=float(valor_total or 0),
                              unidades=UNIDADES,
                              tipos_movimento=tipos_movimento,
-                             filtros={
-                                 'unidade_filtro': filtro_unidade,
-                                 'tipo_filtro': filtro_tipo,
-                                 'data_inicio': data_inicio,
-                                 'data_fim': data_fim
-                             })
+                             filtros=filtros)
                              
     except Exception as e:
-        print(f"❌ Erro ao gerar dados simulados: {e}")
+        logger.error('Erro ao gerar dados simulados: %s', e)
+        db.session.rollback()
         return render_template('relatorio_movimentacoes.html', 
                              movimentacoes=[],
                              total_movimentacoes=0,
                              valor_total=0,
                              unidades=UNIDADES,
-                             tipos_movimento=[],
-                             filtros={})
+                             tipos_movimento=tipos_movimento,
+                             filtros=filtros)
 
 
-@app.route('/exportar_movimentacoes_csv')
+@rotas.route('/exportar_movimentacoes_csv')
 def exportar_movimentacoes_csv():
     """Exportar movimentações para CSV"""
-    try:
-        movimentacoes = MovimentacaoOrcamentaria.query.order_by(
-            MovimentacaoOrcamentaria.data_movimentacao.desc()
-        ).all()
-        
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        
-        # Cabeçalho
-        writer.writerow([
-            'Data', 'Tipo', 'Descrição', 'Unidade Origem', 'Unidade Destino',
-            'Tipo Orçamento', 'Valor', 'Usuário', 'Orçamento ID', 'Missão ID'
-        ])
-        
-        # Dados
-        for mov in movimentacoes:
-            writer.writerow([
-                mov.data_movimentacao.strftime('%d/%m/%Y %H:%M'),
-                mov.tipo,
-                mov.descricao or '',
-                mov.unidade_origem or '',
-                mov.unidade_destino or '',
-                mov.tipo_orcamento or '',
-                f"{mov.valor:,.2f}".replace('.', ',') if mov.valor else '',
-                mov.usuario,
-                mov.orcamento_id or '',
-                mov.missao_id or ''
-            ])
-        
-        output.seek(0)
-        
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv; charset=utf-8',
-            headers={
-                'Content-Disposition': 'attachment; filename=movimentacoes_orcamentarias.csv'
-            }
-        )
-        
-    except Exception as e:
-        print(f"❌ Erro na exportação: {e}")
-        flash('Erro ao exportar relatório', 'error')
-        return redirect(url_for('relatorio_movimentacoes'))
-
-# ✅ FUNÇÃO DE DEBUG MELHORADA
-def debug_distribuicao_completo():
-    """Função para diagnosticar todos os problemas de distribuição"""
-    print("=" * 60)
-    print("🔍 DIAGNÓSTICO COMPLETO DO SISTEMA DE DISTRIBUIÇÃO")
-    print("=" * 60)
-    
-    try:
-        # 1. Verificar orçamentos
-        orcamentos = Orcamento.query.all()
-        print(f"📊 Total de orçamentos: {len(orcamentos)}")
-        
-        total_geral = {'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0}
-        for orc in orcamentos:
-            total_geral['diarias'] += orc.diarias or 0
-            total_geral['derso'] += orc.derso or 0
-            total_geral['diarias_pav'] += orc.diarias_pav or 0
-            total_geral['derso_pav'] += orc.derso_pav or 0
-        
-        print("💰 Orçamento total base:")
-        for tipo, valor in total_geral.items():
-            print(f"  {tipo}: R$ {valor:,.2f}")
-        
-        # 2. Verificar complementações
-        complementacoes = ComplementacaoOrcamento.query.all()
-        print(f"📈 Total de complementações: {len(complementacoes)}")
-        
-        # 3. Verificar distribuições
-        distribuicoes = Distribuicao.query.all()
-        print(f"📤 Total de distribuições: {len(distribuicoes)}")
-        
-        total_distribuido = sum([d.valor for d in distribuicoes])
-        print(f"💸 Total distribuído: R$ {total_distribuido:,.2f}")
-        
-        # 4. Verificar missões
-        missoes_prev = Missao.query.filter_by(status='previsao').all()
-        missoes_aut = Missao.query.filter_by(status='autorizada').all()
-        
-        print(f"📋 Missões em previsão: {len(missoes_prev)}")
-        print(f"✅ Missões autorizadas: {len(missoes_aut)}")
-        
-        total_prev = sum([m.valor for m in missoes_prev])
-        total_aut = sum([m.valor for m in missoes_aut])
-        
-        print(f"💰 Valor previsões: R$ {total_prev:,.2f}")
-        print(f"💰 Valor autorizadas: R$ {total_aut:,.2f}")
-        
-        print("=" * 60)
-        
-    except Exception as e:
-        print(f"❌ Erro no diagnóstico: {e}")
+    return responder_relatorio('movimentacoes', 'csv', request.args, rota_erro='relatorio_movimentacoes')
 
 
-@app.route('/saldos_bimestre')
+@rotas.route('/saldos_bimestre')
 def saldos_bimestre():
     try:
         saldos = calcular_saldo_por_bimestre()
@@ -3704,14 +3064,14 @@ def saldos_bimestre():
                              saldos_bimestre=saldos,
                              totais_geral=totais_geral)
     except Exception as e:
-        print(f"❌ Erro em saldos_bimestre: {e}")
+        logger.error('Erro em saldos_bimestre: %s', e)
         flash('Erro ao carregar saldos por bimestre', 'error')
         return render_template('saldos_bimestre.html', 
                              saldos_bimestre=[],
                              totais_geral={'diarias': 0, 'derso': 0, 'diarias_pav': 0, 'derso_pav': 0})
 
 
-@app.route('/complementacao', methods=['GET', 'POST'])
+@rotas.route('/complementacao', methods=['GET', 'POST'])
 def complementacao():
     if request.method == 'POST':
         nova_complementacao = ComplementacaoOrcamento(
@@ -3745,7 +3105,7 @@ def complementacao():
                          complementacoes=complementacoes,
                          tipos=TIPOS_ORCAMENTO)
 
-@app.route('/editar_complementacao/<int:comp_id>', methods=['GET', 'POST'])
+@rotas.route('/editar_complementacao/<int:comp_id>', methods=['GET', 'POST'])
 def editar_complementacao(comp_id):
     complementacao = db.session.get(ComplementacaoOrcamento, comp_id) or abort(404)
     
@@ -3766,7 +3126,7 @@ def editar_complementacao(comp_id):
                          orcamentos=orcamentos,
                          tipos=TIPOS_ORCAMENTO)
 
-@app.route('/remover_complementacao/<int:comp_id>')
+@rotas.route('/remover_complementacao/<int:comp_id>')
 def remover_complementacao(comp_id):
     complementacao = db.session.get(ComplementacaoOrcamento, comp_id) or abort(404)
     db.session.delete(complementacao)
@@ -3774,7 +3134,7 @@ def remover_complementacao(comp_id):
     flash('Complementação removida com sucesso!', 'success')
     return redirect(url_for('complementacao'))
 
-@app.route('/distribuir/<int:orcamento_id>')
+@rotas.route('/distribuir/<int:orcamento_id>')
 def distribuir(orcamento_id):
     """Página de distribuição com saldos CORRETOS"""
     try:
@@ -3783,7 +3143,7 @@ def distribuir(orcamento_id):
             flash('Orçamento não encontrado', 'error')
             return redirect(url_for('orcamento'))
         
-        print(f"🔍 Carregando página de distribuição - Orçamento {orcamento_id}")
+        logger.debug('Carregando página de distribuição - Orçamento %s', orcamento_id)
         
         # ✅ CALCULAR SALDOS DISPONÍVEIS (não total bruto)
         orcamento_totais = calcular_orcamento_total_com_complementacao(orcamento)
@@ -3791,7 +3151,7 @@ def distribuir(orcamento_id):
         # Buscar distribuições existentes
         distribuicoes = Distribuicao.query.filter_by(orcamento_id=orcamento_id).all()
         
-        print(f"📋 Distribuições existentes: {len(distribuicoes)}")
+        logger.debug('Distribuições existentes: %s', len(distribuicoes))
         
         return render_template('distribuir.html', 
                              orcamento=orcamento, 
@@ -3801,17 +3161,35 @@ def distribuir(orcamento_id):
                              tipos=TIPOS_ORCAMENTO)
                              
     except Exception as e:
-        print(f"❌ Erro na rota distribuir: {e}")
+        logger.error('Erro na rota distribuir: %s', e)
         flash('Erro ao carregar página de distribuição', 'error')
         return redirect(url_for('orcamento'))
 
 
 
-@app.route('/missoes', methods=['GET', 'POST'])
+def filtrar_missoes(query, opm_filtro='', fonte_filtro='', status_filtro='', tipo_filtro='', mes_filtro=''):
+    """Aplica os filtros da listagem de missões a uma query"""
+    if opm_filtro:
+        query = query.filter(Missao.opm_destino == opm_filtro)
+    if fonte_filtro:
+        query = query.filter(Missao.fonte_dinheiro == fonte_filtro)
+    if status_filtro:
+        query = query.filter(Missao.status == status_filtro)
+    if tipo_filtro:
+        query = query.filter(Missao.tipo == tipo_filtro)
+    if mes_filtro:
+        query = query.filter(Missao.mes == mes_filtro)
+    return query
+
+
+@rotas.route('/missoes', methods=['GET', 'POST'])
 def missoes():
     # Filtros
     opm_filtro = request.args.get('opm_filtro', '')
     fonte_filtro = request.args.get('fonte_filtro', '')
+    status_filtro = request.args.get('status', '')
+    tipo_filtro = request.args.get('tipo', '')
+    mes_filtro = request.args.get('mes', '')
     
     if request.method == 'POST':
         nova_missao = Missao(
@@ -3835,24 +3213,99 @@ def missoes():
         flash('Missão cadastrada com sucesso!', 'success')
         return redirect(url_for('missoes'))
     
-    # Query com filtros
-    query = Missao.query
-    if opm_filtro:
-        query = query.filter(Missao.opm_destino == opm_filtro)
-    if fonte_filtro:
-        query = query.filter(Missao.fonte_dinheiro == fonte_filtro)
-    
-    missoes = query.order_by(Missao.data_criacao.desc()).all()
-    
+    filtros = {
+        'opm_filtro': opm_filtro,
+        'fonte_filtro': fonte_filtro,
+        'status': status_filtro,
+        'tipo': tipo_filtro,
+        'mes': mes_filtro,
+        'por_pagina': pagination.por_pagina_da_requisicao()
+    }
+    termo_busca = request.args.get('q', '').strip()
+
+    # Filtros aplicados no banco
+    query = filtrar_missoes(Missao.query, opm_filtro, fonte_filtro, status_filtro, tipo_filtro, mes_filtro)
+    totais_query = filtrar_missoes(db.session.query(
+        db.func.count(Missao.id),
+        db.func.coalesce(db.func.sum(Missao.valor), 0),
+        db.func.coalesce(db.func.sum(db.case((Missao.status == 'previsao', 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(db.case((Missao.status == 'autorizada', 1), else_=0)), 0)
+    ), opm_filtro, fonte_filtro, status_filtro, tipo_filtro, mes_filtro)
+
+    if termo_busca:
+        # ✅ BUSCA TEXTUAL: resultados ranqueados, paginados por número de página
+        numero_pagina = request.args.get('pagina', 1, type=int)
+        itens, tem_mais = search.buscar_missoes(query, termo_busca, numero_pagina, filtros['por_pagina'])
+        totais_query = search.aplicar_busca(totais_query, termo_busca).order_by(None)
+        url_anterior = url_for('missoes', q=termo_busca, pagina=numero_pagina - 1, **filtros) if numero_pagina > 1 else None
+        url_proxima = url_for('missoes', q=termo_busca, pagina=numero_pagina + 1, **filtros) if tem_mais else None
+    else:
+        # ✅ LISTAGEM: paginada por (data_criacao, id)
+        pagina = pagination.paginar(query, Missao.data_criacao, Missao.id,
+                                    apos=request.args.get('apos'),
+                                    antes=request.args.get('antes'),
+                                    por_pagina=filtros['por_pagina'])
+        itens = pagina.itens
+        url_anterior = url_for('missoes', antes=pagina.anterior, **filtros) if pagina.anterior else None
+        url_proxima = url_for('missoes', apos=pagina.proximo, **filtros) if pagina.proximo else None
+
+    # Totais de todas as missões filtradas em uma única consulta agregada
+    total, valor_total, qtd_previsao, qtd_autorizada = totais_query.one()
+
     return render_template('missoes.html', 
-                         missoes=missoes,
+                         missoes=itens,
+                         url_anterior=url_anterior,
+                         url_proxima=url_proxima,
+                         termo_busca=termo_busca,
+                         totais={
+                             'total': total,
+                             'valor_total': float(valor_total or 0),
+                             'previsao': qtd_previsao,
+                             'autorizada': qtd_autorizada
+                         },
+                         filtros=filtros,
                          unidades=UNIDADES,
                          tipos=TIPOS_ORCAMENTO,
                          meses=MESES,
                          opm_filtro=opm_filtro,
                          fonte_filtro=fonte_filtro)
 
-@app.route('/editar_missao/<int:missao_id>', methods=['GET', 'POST'])
+
+@rotas.route('/buscar_missoes')
+def buscar_missoes():
+    """Busca textual de missões em JSON (ranqueada e paginada)"""
+    termo_busca = request.args.get('q', '').strip()
+    numero_pagina = request.args.get('pagina', 1, type=int)
+    por_pagina = pagination.por_pagina_da_requisicao()
+
+    query = filtrar_missoes(Missao.query,
+                            request.args.get('opm_filtro', ''),
+                            request.args.get('fonte_filtro', ''),
+                            request.args.get('status', ''),
+                            request.args.get('tipo', ''),
+                            request.args.get('mes', ''))
+    itens, tem_mais = search.buscar_missoes(query, termo_busca, numero_pagina, por_pagina)
+
+    return jsonify({
+        'q': termo_busca,
+        'pagina': numero_pagina,
+        'por_pagina': por_pagina,
+        'tem_mais': tem_mais,
+        'missoes': [{
+            'id': m.id,
+            'fonte_dinheiro': m.fonte_dinheiro,
+            'opm_destino': m.opm_destino,
+            'processo_sei': m.processo_sei,
+            'descricao': m.descricao,
+            'tipo': m.tipo,
+            'mes': m.mes,
+            'valor': m.valor,
+            'status': m.status,
+            'url': url_for('editar_missao', missao_id=m.id)
+        } for m in itens]
+    })
+
+@rotas.route('/editar_missao/<int:missao_id>', methods=['GET', 'POST'])
 def editar_missao(missao_id):
     missao = db.session.get(Missao, missao_id) or abort(404)
     
@@ -3886,7 +3339,7 @@ def editar_missao(missao_id):
                          tipos=TIPOS_ORCAMENTO,
                          meses=MESES)
 
-@app.route('/remover_missao/<int:missao_id>', methods=['POST'])
+@rotas.route('/remover_missao/<int:missao_id>', methods=['POST'])
 def remover_missao(missao_id):
     missao = db.session.get(Missao, missao_id)
     if not missao:
@@ -3900,62 +3353,22 @@ def remover_missao(missao_id):
     except Exception as e:
         db.session.rollback()
         flash('Erro ao remover missão.', 'error')
-        print(f"Erro ao remover missão: {e}")
+        logger.debug('Erro ao remover missão: %s', e)
 
     return redirect(url_for('missoes'))
 
-@app.route('/relatorios')
+@rotas.route('/relatorios')
 def relatorios():
     # Filtros
     unidade_filtro = request.args.get('unidade_filtro', '')
     
-    # Usar orçamento total de todos os bimestres
-    totais_geral = calcular_orcamento_total_todos_bimestres()
-    tipos_valores = [
-        totais_geral['diarias'],
-        totais_geral['derso'],
-        totais_geral['diarias_pav'],
-        totais_geral['derso_pav']
-    ]
-    
-    # Gráfico por unidade (gastos autorizados) - com filtro
-    gastos_unidade = {}
-    for unidade in UNIDADES:
-        if unidade_filtro and unidade != unidade_filtro:
-            continue
-            
-        total_gasto = db.session.query(Missao).filter_by(
-            fonte_dinheiro=unidade, 
-            status='autorizada'
-        ).with_entities(db.func.sum(Missao.valor)).scalar() or 0
-        gastos_unidade[unidade] = total_gasto
-    
-    # Gráfico por status - considerando filtro de unidade
-    query_previsoes = db.session.query(Missao).filter_by(status='previsao')
-    query_autorizadas = db.session.query(Missao).filter_by(status='autorizada')
-    
-    if unidade_filtro:
-        query_previsoes = query_previsoes.filter(Missao.fonte_dinheiro == unidade_filtro)
-        query_autorizadas = query_autorizadas.filter(Missao.fonte_dinheiro == unidade_filtro)
-    
-    total_previsoes = query_previsoes.with_entities(db.func.sum(Missao.valor)).scalar() or 0
-    total_autorizadas = query_autorizadas.with_entities(db.func.sum(Missao.valor)).scalar() or 0
-    
-    dados = {
-        'tipos_orcamento': TIPOS_ORCAMENTO,
-        'tipos_valores': tipos_valores,
-        'unidades': list(gastos_unidade.keys()),
-        'gastos_unidade': list(gastos_unidade.values()),
-        'status_labels': ['Previsões', 'Autorizadas'],
-        'status_valores': [total_previsoes, total_autorizadas],
-        'unidade_filtro': unidade_filtro
-    }
-    
-    return render_template('relatorios.html', dados=dados, unidades_filtro=UNIDADES)
+    # ✅ Os gráficos buscam seus dados em /dados_graficos no navegador
+    return render_template('relatorios.html', unidade_filtro=unidade_filtro, unidades_filtro=UNIDADES)
+
 
 
 # Rotas para Orçamentos
-@app.route('/editar_orcamento/<int:orcamento_id>', methods=['GET', 'POST'])
+@rotas.route('/editar_orcamento/<int:orcamento_id>', methods=['GET', 'POST'])
 def editar_orcamento(orcamento_id):
     orcamento = db.session.get(Orcamento, orcamento_id) or abort(404)
 
@@ -3983,7 +3396,7 @@ def editar_orcamento(orcamento_id):
                          orcamento=orcamento,
                          bimestres=BIMESTRES)
 
-@app.route('/remover_orcamento/<int:orcamento_id>')
+@rotas.route('/remover_orcamento/<int:orcamento_id>')
 def remover_orcamento(orcamento_id):
     orcamento = db.session.get(Orcamento, orcamento_id) or abort(404)
 
@@ -4001,29 +3414,30 @@ def remover_orcamento(orcamento_id):
     flash('Orçamento removido com sucesso!', 'success')
     return redirect(url_for('orcamento'))
 
-@app.route('/debug_recolhimento/<int:orcamento_id>')
+@rotas.route('/debug_recolhimento/<int:orcamento_id>')
 def debug_recolhimento(orcamento_id):
     """Rota de debug para testar cálculos de recolhimento"""
     try:
-        print(f"🔍 DEBUG RECOLHIMENTO - Orçamento {orcamento_id}")
+        logger.debug('DEBUG RECOLHIMENTO - Orçamento %s', orcamento_id)
         
         # Verificar orçamento
         orcamento = db.session.get(Orcamento, orcamento_id)
         if not orcamento:
             return {"erro": "Orçamento não encontrado"}
         
-        print(f"✅ Orçamento: {orcamento.bimestre}/{orcamento.ano}")
+        logger.debug('Orçamento: %s/%s', orcamento.bimestre, orcamento.ano)
         
         # Verificar distribuições
         distribuicoes = Distribuicao.query.filter_by(orcamento_id=orcamento_id).all()
-        print(f"📊 Distribuições encontradas: {len(distribuicoes)}")
+        logger.debug('Distribuições encontradas: %s', len(distribuicoes))
         
-        for dist in distribuicoes:
-            print(f"  {dist.unidade} - {dist.tipo_orcamento}: R$ {dist.valor:,.2f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for dist in distribuicoes:
+                logger.debug('%s - %s: R$ %.2f', dist.unidade, dist.tipo_orcamento, dist.valor)
         
         # Verificar missões autorizadas
         missoes = Missao.query.filter_by(status='autorizada').all()
-        print(f"🎯 Missões autorizadas: {len(missoes)}")
+        logger.debug('Missões autorizadas: %s', len(missoes))
         
         # Calcular saldos
         saldos = calcular_saldos_para_recolher_bimestre_corrigido(orcamento_id)
@@ -4037,13 +3451,49 @@ def debug_recolhimento(orcamento_id):
         }
         
     except Exception as e:
-        print(f"❌ Erro no debug: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Erro no debug')
         return {"erro": str(e)}
 
+def create_app(config=None):
+    """Cria a aplicação; ``config`` sobrescreve os valores de ``Config``.
+
+    Pode rodar com ``gunicorn --preload``: a app é criada uma vez no processo
+    mestre e nenhuma conexão com o banco atravessa o fork. Cada worker abre
+    as suas na primeira requisição.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB máximo
+    if config:
+        app.config.update(config)
+
+    logs.init_app(app)
+    metricas.init_app(app)
+    consultas_lentas.init_app(app)
+    perfil.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    reports.report_cache.init_app(app)
+    rotas.registrar(app)
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            banco.configurar_engine(engine, app.config, somente_leitura=bind == banco.BIND_LEITURA)
+        if app.config['CRIAR_TABELAS']:
+            db.create_all()
+        # ✅ Conexões abertas aqui ficariam compartilhadas com os workers depois do fork
+        for engine in db.engines.values():
+            engine.dispose()
+            engines_criados.add(engine)
+
+    if app.config['PRECARREGAR_MODULOS']:
+        # ✅ Com --preload, carregados uma vez no mestre e compartilhados pelos workers (copy-on-write)
+        import pandas  # noqa: F401
+        reports.precarregar()
+
+    return app
+
+
 if __name__ == '__main__':
-    create_tables()
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-    app.run(debug=True)
+    create_app().run(host='0.0.0.0', port=port)
@@ -0,0 +1,302 @@
+"""Perfis de engine do banco de dados (pool de conexões e timeouts).
+
+``opcoes_engine`` monta o ``SQLALCHEMY_ENGINE_OPTIONS`` de acordo com o banco
+da URL. Em MySQL e PostgreSQL o pool é dimensionado pelo número de workers e
+threads do gunicorn, as conexões são testadas antes do uso (pre-ping),
+recicladas antes do timeout do servidor e cada instrução tem tempo máximo.
+
+O tempo de checkout do pool (espera por conexão livre + pre-ping) é medido
+por ``PoolInstrumentado``; checkouts lentos são registrados no log.
+
+Em SQLite, ``configurar_engine`` aplica os pragmas de concorrência (WAL,
+busy_timeout etc.) em cada conexão e faz as transações de escrita começarem
+com ``BEGIN IMMEDIATE``: há um único escritor por vez e quem chega depois
+espera o lock no início da transação, em vez de falhar com "database is
+locked" no meio dela.
+
+Com ``DATABASE_URL_LEITURA`` (réplica) ou ``SQLITE_LEITURA_SEPARADA``, o bind
+``leitura`` recebe as consultas das rotas marcadas com ``marcar_leitura``;
+escritas (flush) continuam indo para o banco principal.
+"""
+import contextvars
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(nome, padrao):
+    try:
+        return int(os.environ.get(nome, padrao))
+    except (TypeError, ValueError):
+        return padrao
+
+
+def normalizar_url(url):
+    """Aceita o esquema ``postgres://`` usado por alguns provedores"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def dimensionar_pool(workers, threads, max_conexoes=0):
+    """(pool_size, max_overflow) de cada worker.
+
+    Cada thread do worker pode precisar de uma conexão; o overflow absorve
+    picos (ex.: fluxos SSE abertos). Com ``max_conexoes`` (limite do servidor
+    de banco) o total é repartido entre os workers.
+    """
+    pool_size = max(threads, 2)
+    max_overflow = max(threads // 2, 2)
+    if max_conexoes:
+        por_worker = max(max_conexoes // max(workers, 1), 1)
+        pool_size = min(pool_size, por_worker)
+        max_overflow = max(por_worker - pool_size, 0)
+    return pool_size, max_overflow
+
+
+def opcoes_engine(url):
+    """SQLALCHEMY_ENGINE_OPTIONS para a URL informada"""
+    if not url:
+        return {}
+    backend = make_url(url).get_backend_name()
+    if backend not in ('mysql', 'mariadb', 'postgresql'):
+        return {}
+
+    pool_size, max_overflow = dimensionar_pool(
+        _env_int('WEB_CONCURRENCY', 1),
+        _env_int('THREADS_POR_WORKER', 8),
+        _env_int('DB_MAX_CONEXOES', 0),
+    )
+    opcoes = {
+        'poolclass': PoolInstrumentado,
+        'pool_size': _env_int('DB_POOL_SIZE', pool_size),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', max_overflow),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 280),
+        'pool_pre_ping': True,
+    }
+
+    timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if timeout_ms:
+        if backend == 'postgresql':
+            opcoes['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+        elif backend == 'mariadb':
+            opcoes['connect_args'] = {'init_command': f'SET SESSION max_statement_time={timeout_ms / 1000}'}
+        else:
+            # MySQL 5.7+: vale para SELECTs, que é onde os relatórios pesam
+            opcoes['connect_args'] = {'init_command': f'SET SESSION max_execution_time={timeout_ms}'}
+    return opcoes
+
+
+class EstatisticasCheckout:
+    """Contadores do tempo de checkout de conexões (por processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.alerta_ms = _env_int('DB_CHECKOUT_ALERTA_MS', 200)
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.quantidade = 0
+            self.total_ms = 0.0
+            self.maximo_ms = 0.0
+            self.lentos = 0
+            self.falhas = 0
+
+    def registrar(self, duracao_ms, falhou=False):
+        with self._lock:
+            self.quantidade += 1
+            self.total_ms += duracao_ms
+            self.maximo_ms = max(self.maximo_ms, duracao_ms)
+            if falhou:
+                self.falhas += 1
+            if duracao_ms >= self.alerta_ms:
+                self.lentos += 1
+        if duracao_ms >= self.alerta_ms:
+            logger.warning('Checkout de conexão lento: %.1f ms', duracao_ms)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                'checkouts': self.quantidade,
+                'media_ms': round(self.total_ms / self.quantidade, 3) if self.quantidade else 0,
+                'maximo_ms': round(self.maximo_ms, 3),
+                'lentos': self.lentos,
+                'falhas': self.falhas,
+            }
+
+
+estatisticas_checkout = EstatisticasCheckout()
+
+
+class PoolInstrumentado(QueuePool):
+    """QueuePool que mede quanto cada checkout esperou"""
+
+    def connect(self):
+        inicio = time.perf_counter()
+        falhou = True
+        try:
+            conexao = super().connect()
+            falhou = False
+            return conexao
+        finally:
+            estatisticas_checkout.registrar((time.perf_counter() - inicio) * 1000, falhou)
+
+
+def status_pool(engine):
+    """Situação do pool do engine e estatísticas de checkout"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'tamanho': pool.size(),
+            'em_uso': pool.checkedout(),
+            'livres': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    status['checkout'] = estatisticas_checkout.resumo()
+    return status
+
+
+# ---------------------------------------------------------------------------
+# SQLite: pragmas e política de escritor único
+# ---------------------------------------------------------------------------
+
+_escrita = contextvars.ContextVar('transacao_escrita', default=False)
+
+
+def marcar_escrita(ativo=True):
+    """Define se as próximas transações do contexto atual vão escrever"""
+    _escrita.set(ativo)
+
+
+@contextmanager
+def escrita():
+    """Bloco cujas transações começam com BEGIN IMMEDIATE (scripts e comandos)"""
+    token = _escrita.set(True)
+    try:
+        yield
+    finally:
+        _escrita.reset(token)
+
+
+def pragmas_sqlite(config):
+    pragmas = [
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -int(config.get('SQLITE_CACHE_SIZE_KB', 64000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        ('temp_store', 'MEMORY'),
+    ]
+    if config.get('SQLITE_WAL', True):
+        pragmas.insert(0, ('journal_mode', 'WAL'))
+    return pragmas
+
+
+def _banco_ocupado(erro):
+    mensagem = str(getattr(erro, 'orig', erro)).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
+def configurar_engine(engine, config, somente_leitura=False):
+    """Ajustes por conexão; só faz algo em SQLite"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = pragmas_sqlite(config)
+    if somente_leitura:
+        # O modo WAL é definido pela conexão de escrita e fica gravado no arquivo
+        pragmas = [(nome, valor) for nome, valor in pragmas if nome != 'journal_mode']
+    tentativas = max(int(config.get('SQLITE_TENTATIVAS_ESCRITA', 5)), 1)
+
+    @event.listens_for(engine, 'connect')
+    def _aplicar_pragmas(conexao_dbapi, registro):
+        if not isinstance(conexao_dbapi, sqlite3.Connection):
+            return
+        # O BEGIN passa a ser emitido pelo evento abaixo, não pelo driver
+        conexao_dbapi.isolation_level = None
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in pragmas:
+                cursor.execute(f'PRAGMA {nome}={valor}')
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _iniciar_transacao(conexao):
+        if not _escrita.get():
+            conexao.exec_driver_sql('BEGIN')
+            return
+
+        # Nada foi feito ainda nesta transação, então repetir o BEGIN é seguro.
+        # Cada tentativa já espera até busy_timeout pelo lock.
+        for tentativa in range(1, tentativas + 1):
+            try:
+                conexao.exec_driver_sql('BEGIN IMMEDIATE')
+                return
+            except exc.OperationalError as e:
+                if not _banco_ocupado(e) or tentativa == tentativas:
+                    raise
+                espera = min(0.05 * 2 ** tentativa, 1.0) * random.uniform(0.5, 1.5)
+                logger.warning('Banco ocupado ao iniciar escrita (tentativa %d/%d); nova tentativa em %.2fs',
+                               tentativa, tentativas, espera)
+                time.sleep(espera)
+
+
+# ---------------------------------------------------------------------------
+# Bind somente leitura (réplica)
+# ---------------------------------------------------------------------------
+
+BIND_LEITURA = 'leitura'
+
+_leitura = contextvars.ContextVar('consultas_na_replica', default=False)
+
+
+def url_sqlite_somente_leitura(url):
+    """Mesma base SQLite aberta em modo somente leitura (URI do driver)"""
+    url = make_url(url)
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'}) \
+        .render_as_string(hide_password=False)
+
+
+def binds_leitura(url_principal, url_leitura=None, sqlite_separado=False):
+    """SQLALCHEMY_BINDS com o bind de leitura, se configurado"""
+    if not url_leitura and sqlite_separado and url_principal \
+            and make_url(url_principal).get_backend_name() == 'sqlite':
+        url_leitura = url_sqlite_somente_leitura(url_principal)
+    if not url_leitura:
+        return {}
+    return {BIND_LEITURA: {'url': url_leitura, **opcoes_engine(url_leitura)}}
+
+
+def marcar_leitura(ativo=True):
+    """Define se as consultas do contexto atual podem ir para a réplica"""
+    _leitura.set(ativo)
+
+
+def lendo_da_replica():
+    return _leitura.get()
+
+
+class SessaoRoteada(Session):
+    """Sessão que manda as leituras das rotas de relatório para o bind de leitura"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _leitura.get() and not self._flushing:
+            engine = self._db.engines.get(BIND_LEITURA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
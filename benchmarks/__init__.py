@@ -0,0 +1 @@
+"""Scripts de benchmark do sistema de orçamento (não fazem parte da aplicação)."""
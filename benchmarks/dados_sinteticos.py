@@ -0,0 +1,235 @@
+"""Gerador de dados sintéticos coerentes para os benchmarks.
+
+Diferente do gerador de ``planos_indices`` (linhas aleatórias, só para os
+planos de consulta), aqui os dados respeitam as regras do sistema, para que as
+rotas reais rodem sobre eles:
+
+- um orçamento por bimestre durante ``anos`` anos, com complementações;
+- a distribuição de cada orçamento numa gravação só, como ``/salvar_distribuicao``;
+- missões autorizadas em ordem cronológica com as verificações e os efeitos de
+  ``autorizar_missao`` (saldo da fonte naquele momento, distribuição automática
+  no orçamento mais recente e os dois registros no log);
+- o log de movimentações correspondente a cada uma dessas operações.
+
+``criar_app`` cria a aplicação apontando para um banco SQLite novo; precisa
+ser chamada antes de qualquer outro import da aplicação no processo.
+"""
+import io
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+UNIDADES = ['CRPIV', '7º BPM', '8º BPM', 'CIPO']
+SUBUNIDADES = ['7º BPM', '8º BPM', 'CIPO']
+TIPOS_ORCAMENTO = ['DIÁRIAS', 'DERSO', 'DIÁRIAS PAV', 'DERSO PAV']
+CAMPOS_TIPO = {'DIÁRIAS': 'diarias', 'DERSO': 'derso', 'DIÁRIAS PAV': 'diarias_pav', 'DERSO PAV': 'derso_pav'}
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+COTA_BIMESTRE = {'diarias': 120000.0, 'derso': 90000.0, 'diarias_pav': 60000.0, 'derso_pav': 45000.0}
+
+
+def criar_app(pasta, **config):
+    """Cria a aplicação com um banco SQLite vazio em ``pasta`` (as tabelas saem da fábrica)"""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(pasta, 'benchmark.db')}",
+        'REPORT_CACHE_DIR': os.path.join(pasta, 'report_cache'),
+        'LOG_LEVEL': 'WARNING',
+        'CONSULTA_LENTA_MS': '0',
+        **{chave: str(valor) for chave, valor in config.items()},
+    })
+    from app import create_app
+    return create_app()
+
+
+def popular(db, anos=3, missoes=20000, semente=42, ano_final=None):
+    """Insere dados sintéticos e devolve a contagem de linhas por tabela"""
+    from models import (Orcamento, Distribuicao, Missao,
+                        ComplementacaoOrcamento, MovimentacaoOrcamentaria)
+
+    rnd = random.Random(semente)
+    ano_final = ano_final or date.today().year
+    anos_gerados = range(ano_final - anos + 1, ano_final + 1)
+
+    orcamentos, complementacoes, distribuicoes, movimentacoes = [], [], [], []
+    # (quando, efeito no saldo) em ordem cronológica, para autorizar as missões
+    # com os saldos que a aplicação veria naquele momento
+    linha_do_tempo = []
+
+    for ano in anos_gerados:
+        for b in range(1, 7):
+            orcamento_id = len(orcamentos) + 1
+            inicio = datetime(ano, 2 * b - 1, 1, 8)
+            cotas = {campo: round(valor * rnd.uniform(0.8, 1.2), 2) for campo, valor in COTA_BIMESTRE.items()}
+            orcamentos.append({
+                'id': orcamento_id, 'bimestre': f'{b}º Bimestre', 'ano': ano,
+                'data_inicio': inicio.date(), 'data_fim': date(ano, 2 * b, 28),
+                'status': 'ativo', 'data_criacao': inicio, **cotas,
+            })
+            linha_do_tempo.append((inicio, 'orcamento', orcamento_id, cotas))
+            movimentacoes.append({
+                'data_movimentacao': inicio, 'tipo': 'orcamento_criado',
+                'descricao': f'Orçamento {b}º Bimestre/{ano} criado',
+                'valor': round(sum(cotas.values()), 2), 'orcamento_id': orcamento_id,
+            })
+
+            # A distribuição manual é uma gravação só, como em /salvar_distribuicao (que
+            # substitui as do orçamento): a cota, na criação, antes das autorizações que
+            # somam as distribuições automáticas a este orçamento. Até 85% vai para as
+            # subunidades; o resto, e as complementações que chegam depois, ficam no CRPIV
+            for tipo, campo in CAMPOS_TIPO.items():
+                partes = [rnd.uniform(0.2, 0.3) for _ in SUBUNIDADES]
+                for unidade, parte in zip(SUBUNIDADES, partes):
+                    valor = round(cotas[campo] * parte, 2)
+                    distribuicoes.append({
+                        'orcamento_id': orcamento_id, 'unidade': unidade, 'tipo_orcamento': tipo,
+                        'valor': valor, 'data_distribuicao': inicio,
+                    })
+                    linha_do_tempo.append((inicio, 'distribuicao', (unidade, tipo), valor))
+                    movimentacoes.append({
+                        'data_movimentacao': inicio, 'tipo': 'distribuicao',
+                        'descricao': f'Distribuição para {unidade}', 'unidade_origem': 'CRPIV',
+                        'unidade_destino': unidade, 'tipo_orcamento': tipo, 'valor': valor,
+                        'orcamento_id': orcamento_id,
+                    })
+
+            for tipo, campo in CAMPOS_TIPO.items():
+                if rnd.random() < 0.3:
+                    valor = round(cotas[campo] * rnd.uniform(0.05, 0.2), 2)
+                    quando = inicio + timedelta(days=rnd.randrange(1, 20))
+                    complementacoes.append({
+                        'orcamento_id': orcamento_id, 'processo_sei': f'SEI-C-{orcamento_id}-{campo}',
+                        'tipo_orcamento': tipo, 'valor': valor, 'descricao': 'Complementação sintética',
+                        'data_criacao': quando,
+                    })
+                    movimentacoes.append({
+                        'data_movimentacao': quando, 'tipo': 'complementacao_orcamento',
+                        'descricao': f'Complementação {tipo}', 'unidade_destino': 'CRPIV',
+                        'tipo_orcamento': tipo, 'valor': valor, 'orcamento_id': orcamento_id,
+                    })
+                    linha_do_tempo.append((quando, 'complementacao', tipo, valor))
+
+    # Missões: cerca de 70% pedem autorização; o total pedido cabe no que o CRPIV
+    # não distribuiu, que é o que as autorizações consomem
+    orcado_total = sum(o[campo] for o in orcamentos for campo in COTA_BIMESTRE) + sum(c['valor'] for c in complementacoes)
+    media = orcado_total * 0.2 / max(missoes, 1)
+    periodo_total = (datetime(ano_final, 12, 31) - datetime(anos_gerados[0], 1, 1)).days
+    linhas_missao = []
+    for i in range(missoes):
+        fonte = rnd.choices(UNIDADES, weights=(1, 3, 3, 2))[0]
+        tipo = rnd.choice(TIPOS_ORCAMENTO)
+        valor = round(rnd.uniform(0.3, 1.7) * media, 2)
+        criada = datetime(anos_gerados[0], 1, 1) + timedelta(days=rnd.randrange(periodo_total),
+                                                               minutes=rnd.randrange(24 * 60))
+        linha = {
+            'id': i + 1, 'fonte_dinheiro': fonte, 'opm_destino': rnd.choice(SUBUNIDADES),
+            'processo_sei': f'SEI-{criada.year}-{i:06d}', 'descricao': f'Missão sintética {i}',
+            'periodo': f'{criada:%d/%m} a {criada + timedelta(days=4):%d/%m}', 'mes': MESES[criada.month - 1],
+            'tipo': tipo, 'valor': valor, 'status': 'previsao',
+            'data_criacao': criada, 'data_autorizacao': None, 'numero_autorizacao': None,
+        }
+        linhas_missao.append(linha)
+        if rnd.random() < 0.7:
+            linha_do_tempo.append((criada + timedelta(hours=2), 'autorizacao', linha, None))
+
+    autorizar_em_ordem(linha_do_tempo, distribuicoes, movimentacoes)
+
+    db.session.execute(insert(Orcamento), orcamentos)
+    db.session.execute(insert(ComplementacaoOrcamento), complementacoes)
+    db.session.execute(insert(Distribuicao), distribuicoes)
+    for inicio in range(0, len(linhas_missao), 5000):
+        db.session.execute(insert(Missao), linhas_missao[inicio:inicio + 5000])
+
+    movimentacoes.sort(key=lambda m: m['data_movimentacao'])
+    for inicio in range(0, len(movimentacoes), 5000):
+        db.session.execute(insert(MovimentacaoOrcamentaria), movimentacoes[inicio:inicio + 5000])
+    db.session.commit()
+
+    return {
+        'orcamentos': len(orcamentos), 'complementacoes': len(complementacoes),
+        'distribuicoes': len(distribuicoes), 'missoes': len(linhas_missao),
+        'movimentacoes': len(movimentacoes),
+    }
+
+
+def autorizar_em_ordem(linha_do_tempo, distribuicoes, movimentacoes):
+    """Autoriza as missões pedidas como ``autorizar_missao`` faria em cada momento.
+
+    Subunidade: exige distribuído - autorizado >= valor. CRPIV: exige orçado +
+    complementado - distribuído >= valor. Autorizada, a missão soma o valor à
+    distribuição da fonte no orçamento mais recente (criando-a se preciso) e
+    gera os registros ``distribuicao`` e ``autorizacao_missao``. A aplicação não
+    olha o saldo do CRPIV nas missões de subunidade, mas a distribuição
+    automática sai dele; o gerador deixa em previsão os pedidos que o deixariam
+    negativo, para que as gravações de distribuição seguintes continuem válidas.
+    """
+    orcado = {tipo: 0.0 for tipo in TIPOS_ORCAMENTO}
+    distribuido = {(u, t): 0.0 for u in UNIDADES for t in TIPOS_ORCAMENTO}
+    autorizado = {(u, t): 0.0 for u in UNIDADES for t in TIPOS_ORCAMENTO}
+    linhas_distribuicao = {(d['orcamento_id'], d['unidade'], d['tipo_orcamento']): d for d in distribuicoes}
+    orcamento_recente = None
+
+    for quando, evento, chave, valor in sorted(linha_do_tempo, key=lambda e: e[0]):
+        if evento == 'orcamento':
+            orcamento_recente = chave
+            for tipo, campo in CAMPOS_TIPO.items():
+                orcado[tipo] += valor[campo]
+        elif evento == 'complementacao':
+            orcado[chave] += valor
+        elif evento == 'distribuicao':
+            distribuido[chave] += valor
+        elif orcamento_recente is not None:
+            missao = chave
+            fonte, tipo, valor = missao['fonte_dinheiro'], missao['tipo'], missao['valor']
+            saldo_crpiv = orcado[tipo] - sum(distribuido[(u, tipo)] for u in UNIDADES)
+            if fonte != 'CRPIV' and distribuido[(fonte, tipo)] - autorizado[(fonte, tipo)] < valor:
+                continue
+            if saldo_crpiv < valor:
+                continue
+
+            missao.update(status='autorizada', data_autorizacao=quando, numero_autorizacao=f"AUT-{missao['id']}")
+            distribuido[(fonte, tipo)] += valor
+            autorizado[(fonte, tipo)] += valor
+            linha = linhas_distribuicao.get((orcamento_recente, fonte, tipo))
+            if linha:
+                linha['valor'] = round(linha['valor'] + valor, 2)
+                linha['data_distribuicao'] = quando
+            else:
+                linha = {'orcamento_id': orcamento_recente, 'unidade': fonte, 'tipo_orcamento': tipo,
+                         'valor': valor, 'data_distribuicao': quando}
+                linhas_distribuicao[(orcamento_recente, fonte, tipo)] = linha
+                distribuicoes.append(linha)
+            movimentacoes.append({
+                'data_movimentacao': quando, 'tipo': 'distribuicao',
+                'descricao': f"Distribuição automática: Missão {missao['id']} - {fonte} → {missao['opm_destino']}",
+                'unidade_origem': 'CRPIV' if fonte != 'CRPIV' else 'Sistema', 'unidade_destino': fonte,
+                'tipo_orcamento': tipo, 'valor': valor, 'orcamento_id': orcamento_recente,
+                'missao_id': missao['id'],
+            })
+            movimentacoes.append({
+                'data_movimentacao': quando, 'tipo': 'autorizacao_missao',
+                'descricao': f"Missão autorizada: {missao['descricao'][:50]}...",
+                'unidade_origem': fonte, 'unidade_destino': missao['opm_destino'],
+                'tipo_orcamento': tipo, 'valor': valor, 'missao_id': missao['id'],
+            })
+
+
+def csv_missoes(linhas, semente=42):
+    """Arquivo de importação de missões (separado por TAB, como o modelo)"""
+    rnd = random.Random(semente)
+    saida = io.StringIO()
+    saida.write('fonte_dinheiro\topm_destino\tprocesso_sei\tdescricao\tperiodo\tmes\ttipo\tvalor\tstatus\n')
+    for i in range(linhas):
+        mes = rnd.randrange(12)
+        saida.write('\t'.join([
+            rnd.choice(UNIDADES), rnd.choice(SUBUNIDADES), f'SEI-IMP-{semente}-{i:06d}',
+            f'Missão importada {i}', f'01/{mes + 1:02d} a 05/{mes + 1:02d}', MESES[mes],
+            rnd.choice(TIPOS_ORCAMENTO), f'{rnd.uniform(100, 3000):.2f}'.replace('.', ','), 'previsao',
+        ]) + '\n')
+    return io.BytesIO(saida.getvalue().encode('utf-8'))
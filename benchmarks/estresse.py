@@ -0,0 +1,330 @@
+"""Teste de estresse das operações com dinheiro sob concorrência.
+
+Dispara milhares de operações aleatórias (transferências, autorizações de
+missão, resoluções de missão sem saldo e recolhimentos) a partir de várias
+threads contra uma instância local da aplicação, e depois confere:
+
+1. nenhum saldo negativo (subunidade: distribuído - autorizado; CRPIV:
+   orçado + complementado - distribuído, como na tela de transferência);
+2. distribuído às subunidades <= orçado + complementações, por tipo;
+3. o log de movimentações explica a variação de cada saldo durante o teste.
+
+Por padrão a aplicação roda num processo separado (servidor do werkzeug com
+threads) sobre uma base sintética. Com ``--url`` e ``--banco`` o teste usa um
+servidor já em execução (ex.: gunicorn com vários workers) e confere o banco
+informado.
+
+Uso:
+    python -m benchmarks.estresse --operacoes 2000 --clientes 16
+    python -m benchmarks.estresse --url http://127.0.0.1:8000 --banco sqlite:////tmp/estresse.db
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+from benchmarks.dados_sinteticos import SUBUNIDADES, TIPOS_ORCAMENTO, UNIDADES  # noqa: E402
+
+PESOS = {'transferencia': 4, 'autorizacao': 3, 'resolver_sem_saldo': 2, 'recolhimento': 1}
+TIPOS_AUTORIZACAO = ('autorizacao_missao', 'autorizacao_com_transferencia', 'autorizacao_com_nova_distribuicao')
+TOLERANCIA = 0.01
+
+
+# ---------------------------------------------------------------------------
+# Servidor local
+# ---------------------------------------------------------------------------
+
+def _servir(pasta, porta):
+    from werkzeug.serving import make_server
+    app = dados_sinteticos.criar_app(pasta)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server('127.0.0.1', porta, app, threaded=True).serve_forever()
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _aguardar(host, porta, limite=30):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            socket.create_connection((host, porta), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'servidor não respondeu em {host}:{porta}')
+
+
+# ---------------------------------------------------------------------------
+# Operações
+# ---------------------------------------------------------------------------
+
+def sortear_operacao(rnd, alvos, pesos):
+    """(tipo, método, caminho, formulário)"""
+    tipo = rnd.choices(list(pesos), weights=list(pesos.values()))[0]
+    if tipo == 'transferencia':
+        origem, destino = rnd.sample(UNIDADES, 2)
+        return tipo, 'POST', '/transferir_saldo', {
+            'unidade_origem': origem, 'unidade_destino': destino,
+            'tipo_orcamento': rnd.choice(TIPOS_ORCAMENTO),
+            'valor': f'{rnd.uniform(1, 500):.2f}', 'motivo': 'estresse',
+        }
+    if tipo == 'autorizacao':
+        return tipo, 'GET', f"/autorizar_missao/{rnd.choice(alvos['missoes'])}", None
+    if tipo == 'resolver_sem_saldo':
+        missao = rnd.choice(alvos['missoes'])
+        if rnd.random() < 0.5:
+            formulario = {'tipo_resolucao': 'transferencia', 'unidade_origem': rnd.choice(SUBUNIDADES),
+                          'valor_transferir': f'{rnd.uniform(1, 300):.2f}'}
+        else:
+            formulario = {'tipo_resolucao': 'nova_distribuicao', 'valor_solicitar': f'{rnd.uniform(1, 300):.2f}'}
+        return tipo, 'POST', f'/resolver_sem_saldo/{missao}', formulario
+    campos = {f'recolher_{u}_{t}': 'on' for u in SUBUNIDADES for t in TIPOS_ORCAMENTO if rnd.random() < 0.2}
+    return tipo, 'POST', f"/confirmar_recolhimento_simples/{rnd.choice(alvos['orcamentos'])}", campos
+
+
+def executar(host, porta, operacoes, clientes):
+    """Roda as operações e devolve (resultados por tipo, duração total)"""
+    local = threading.local()
+    resultados = defaultdict(lambda: {'latencias': [], 'status': defaultdict(int), 'erros': 0})
+    trava = threading.Lock()
+
+    def uma(indice):
+        tipo, metodo, caminho, formulario = operacoes[indice]
+        if not hasattr(local, 'conexao'):
+            local.conexao = http.client.HTTPConnection(host, porta, timeout=60)
+        corpo = urlencode(formulario) if formulario is not None else None
+        cabecalhos = {'Content-Type': 'application/x-www-form-urlencoded'} if corpo is not None else {}
+        inicio = time.perf_counter()
+        try:
+            local.conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+            resposta = local.conexao.getresponse()
+            resposta.read()
+            status = resposta.status
+        except (OSError, http.client.HTTPException):
+            local.conexao.close()
+            del local.conexao
+            status = None
+        duracao = (time.perf_counter() - inicio) * 1000
+        with trava:
+            r = resultados[tipo]
+            r['latencias'].append(duracao)
+            r['status'][status] += 1
+            if status is None or status >= 500:
+                r['erros'] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        list(executor.map(uma, range(len(operacoes))))
+    return resultados, time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+# ---------------------------------------------------------------------------
+# Invariantes
+# ---------------------------------------------------------------------------
+
+def saldos(db):
+    """{(unidade, tipo): saldo}, com as regras da tela de transferência"""
+    from models import Orcamento, Distribuicao, Missao, ComplementacaoOrcamento
+
+    distribuido = defaultdict(float)
+    for unidade, tipo, total in db.session.query(
+            Distribuicao.unidade, Distribuicao.tipo_orcamento, db.func.sum(Distribuicao.valor)
+    ).group_by(Distribuicao.unidade, Distribuicao.tipo_orcamento):
+        distribuido[(unidade, tipo)] = float(total or 0)
+    autorizado = defaultdict(float)
+    for fonte, tipo, total in db.session.query(
+            Missao.fonte_dinheiro, Missao.tipo, db.func.sum(Missao.valor)
+    ).filter(Missao.status == 'autorizada').group_by(Missao.fonte_dinheiro, Missao.tipo):
+        autorizado[(fonte, tipo)] = float(total or 0)
+    cotas = db.session.query(*(db.func.sum(getattr(Orcamento, campo))
+                               for campo in dados_sinteticos.CAMPOS_TIPO.values())).one()
+    orcado = {tipo: float(valor or 0) for tipo, valor in zip(dados_sinteticos.CAMPOS_TIPO, cotas)}
+    for tipo, total in db.session.query(ComplementacaoOrcamento.tipo_orcamento,
+                                        db.func.sum(ComplementacaoOrcamento.valor)
+                                        ).group_by(ComplementacaoOrcamento.tipo_orcamento):
+        orcado[tipo] = orcado.get(tipo, 0) + float(total or 0)
+
+    resultado = {}
+    for tipo in TIPOS_ORCAMENTO:
+        resultado[('CRPIV', tipo)] = orcado.get(tipo, 0) - sum(distribuido[(u, tipo)] for u in UNIDADES)
+        for unidade in SUBUNIDADES:
+            resultado[(unidade, tipo)] = distribuido[(unidade, tipo)] - autorizado[(unidade, tipo)]
+    return resultado, orcado, distribuido
+
+
+def variacao_pelo_log(db, a_partir_de):
+    """{(unidade, tipo): variação} explicada pelas movimentações com id > a_partir_de"""
+    import eventos
+    from models import Missao, MovimentacaoOrcamentaria
+
+    variacao = defaultdict(float)
+    sem_efeito = defaultdict(int)
+    for mov in MovimentacaoOrcamentaria.query.filter(MovimentacaoOrcamentaria.id > a_partir_de):
+        if mov.tipo in TIPOS_AUTORIZACAO:
+            # O saldo consumido é o valor da missão, não o valor registrado na resolução
+            missao = db.session.get(Missao, mov.missao_id) if mov.missao_id else None
+            if missao and missao.fonte_dinheiro != 'CRPIV':
+                variacao[(missao.fonte_dinheiro, missao.tipo)] -= missao.valor
+            continue
+        deltas = eventos.deltas_movimentacao(mov)
+        if deltas is None:
+            sem_efeito[mov.tipo] += 1
+            continue
+        for unidade, valor in deltas.items():
+            variacao[(unidade, mov.tipo_orcamento)] += valor
+    return variacao, dict(sem_efeito)
+
+
+def conferir(db, inicial, ultimo_id_inicial):
+    atuais, orcado, distribuido = saldos(db)
+    violacoes = []
+    for (unidade, tipo), saldo in sorted(atuais.items()):
+        if saldo < -TOLERANCIA:
+            violacoes.append(f'saldo negativo: {unidade} {tipo} = {saldo:.2f}')
+    for tipo in TIPOS_ORCAMENTO:
+        total = sum(distribuido[(u, tipo)] for u in SUBUNIDADES)
+        if total > orcado.get(tipo, 0) + TOLERANCIA:
+            violacoes.append(f'distribuído acima do orçado: {tipo} {total:.2f} > {orcado.get(tipo, 0):.2f}')
+    if inicial is not None:
+        variacao, sem_efeito = variacao_pelo_log(db, ultimo_id_inicial)
+        for chave, saldo in sorted(atuais.items()):
+            esperado = inicial[chave] + variacao.get(chave, 0)
+            if abs(saldo - esperado) > TOLERANCIA:
+                violacoes.append(f'log não explica o saldo de {chave[0]} {chave[1]}: '
+                                 f'{saldo:.2f} no banco, {esperado:.2f} pelo log')
+        if sem_efeito:
+            violacoes.append(f'movimentações sem efeito definido no saldo: {sem_efeito}')
+    return violacoes, atuais
+
+
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operacoes', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=16, help='threads disparando requisições')
+    parser.add_argument('--anos', type=int, default=1)
+    parser.add_argument('--missoes', type=int, default=2000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--somente', help=f"tipos de operação, separados por vírgula ({', '.join(PESOS)})")
+    parser.add_argument('--url', help='servidor já em execução (exige --banco)')
+    parser.add_argument('--banco', help='URL do banco usado pelo servidor de --url')
+    parser.add_argument('--json', dest='saida_json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+    if args.url and not args.banco:
+        parser.error('--url exige --banco')
+    pesos = {tipo: PESOS[tipo] for tipo in args.somente.split(',')} if args.somente else PESOS
+
+    with tempfile.TemporaryDirectory() as pasta:
+        config = {'DATABASE_URL': args.banco} if args.url else {}
+        app = dados_sinteticos.criar_app(pasta, **config)
+        from models import db, Missao, Orcamento, MovimentacaoOrcamentaria
+
+        with app.app_context():
+            if not args.url:
+                print(f"Populando {args.anos} ano(s), {args.missoes} missões (semente {args.semente})...")
+                dados_sinteticos.popular(db, args.anos, args.missoes, args.semente)
+            alvos = {
+                'missoes': [m.id for m in Missao.query.filter_by(status='previsao').limit(500)],
+                'orcamentos': [o.id for o in Orcamento.query.order_by(Orcamento.id.desc()).limit(3)],
+            }
+            violacoes_antes, inicial = conferir(db, None, None)
+            ultimo_id = db.session.query(db.func.max(MovimentacaoOrcamentaria.id)).scalar() or 0
+            db.session.remove()
+
+        servidor = None
+        if args.url:
+            partes = urlsplit(args.url)
+            host, porta = partes.hostname, partes.port or 80
+        else:
+            host, porta = '127.0.0.1', _porta_livre()
+            servidor = multiprocessing.get_context('spawn').Process(target=_servir, args=(pasta, porta), daemon=True)
+            servidor.start()
+        try:
+            _aguardar(host, porta)
+            rnd = random.Random(args.semente)
+            operacoes = [sortear_operacao(rnd, alvos, pesos) for _ in range(args.operacoes)]
+            print(f"Disparando {args.operacoes} operações com {args.clientes} clientes em {host}:{porta}...")
+            resultados, duracao = executar(host, porta, operacoes, args.clientes)
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.join()
+
+        with app.app_context():
+            violacoes, _ = conferir(db, inicial, ultimo_id)
+            registradas = dict(db.session.query(MovimentacaoOrcamentaria.tipo, db.func.count())
+                               .filter(MovimentacaoOrcamentaria.id > ultimo_id)
+                               .group_by(MovimentacaoOrcamentaria.tipo).all())
+            db.session.remove()
+
+    todas = [latencia for r in resultados.values() for latencia in r['latencias']]
+    print(f"\n{len(todas)} operações em {duracao:.1f} s ({len(todas) / duracao:.1f} op/s)")
+    print(f"{'operação':20s} {'qtd':>6s} {'p50 ms':>9s} {'p99 ms':>9s} {'erros':>6s}  status")
+    resumo = {}
+    for tipo, r in sorted(resultados.items()):
+        resumo[tipo] = {
+            'quantidade': len(r['latencias']),
+            'p50_ms': round(statistics.median(r['latencias']), 2),
+            'p99_ms': round(percentil(r['latencias'], 0.99), 2),
+            'erros': r['erros'],
+            'status': {str(s): n for s, n in r['status'].items()},
+        }
+        print(f"{tipo:20s} {resumo[tipo]['quantidade']:6d} {resumo[tipo]['p50_ms']:9.1f} "
+              f"{resumo[tipo]['p99_ms']:9.1f} {r['erros']:6d}  {resumo[tipo]['status']}")
+    print(f"{'total':20s} {len(todas):6d} {statistics.median(todas):9.1f} {percentil(todas, 0.99):9.1f}")
+    print(f"\nMovimentações registradas: {registradas}")
+
+    if violacoes_antes:
+        print(f"\nA base já violava {len(violacoes_antes)} invariante(s) antes do teste.")
+    if violacoes:
+        print(f"\nFALHOU - {len(violacoes)} violação(ões) de invariante:")
+        for violacao in violacoes[:50]:
+            print(f'  - {violacao}')
+    else:
+        print('\nInvariantes preservadas.')
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'parametros': vars(args),
+                'duracao_s': round(duracao, 3),
+                'operacoes_por_segundo': round(len(todas) / duracao, 2),
+                'p50_ms': round(statistics.median(todas), 2),
+                'p99_ms': round(percentil(todas, 0.99), 2),
+                'operacoes': resumo,
+                'movimentacoes_registradas': registradas,
+                'violacoes_antes': violacoes_antes,
+                'violacoes': violacoes,
+            }, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.saida_json}")
+
+    sys.exit(1 if violacoes or any(r['erros'] for r in resultados.values()) else 0)
+
+
+if __name__ == '__main__':
+    main()
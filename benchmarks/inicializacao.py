@@ -0,0 +1,104 @@
+"""Custo de inicialização de um worker e módulos pesados no caminho comum.
+
+Em processos novos (como um worker do gunicorn), mede o tempo de ``import app`` +
+``create_app()`` e o RSS logo depois. Em seguida chama as páginas comuns e confere quais
+módulos pesados (pandas, numpy, ReportLab, openpyxl) foram carregados. Eles
+devem aparecer só na importação de missões e nas exportações. Termina com
+erro (código 1) se algum for carregado no import ou nas páginas comuns.
+
+Uso:
+    python -m benchmarks.inicializacao --repeticoes 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+
+MODULOS_PESADOS = ('pandas', 'numpy', 'reportlab', 'openpyxl')
+PAGINAS_COMUNS = ('/', '/painel/totais', '/painel/crpiv', '/painel/unidades', '/painel/bimestres',
+                  '/missoes', '/orcamento', '/transferir_saldo', '/saldos_bimestre', '/relatorio_movimentacoes')
+
+# Roda num processo novo: imprime um JSON com as medições
+MEDICAO = '''
+import json, resource, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from app import create_app
+app = create_app()
+duracao = time.perf_counter() - inicio
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+pesados = lambda: sorted(m for m in {pesados!r} if m in sys.modules)
+no_import = pesados()
+cliente = app.test_client()
+status = {{pagina: cliente.get(pagina).status_code for pagina in {paginas!r}}}
+print(json.dumps({{'import_ms': duracao * 1000, 'rss_kb': rss, 'no_import': no_import,
+                  'nas_paginas': pesados(), 'status': status}}))
+'''
+
+
+def medir(pasta, repeticoes):
+    codigo = MEDICAO.format(raiz=dados_sinteticos.RAIZ, pesados=MODULOS_PESADOS, paginas=PAGINAS_COMUNS)
+    ambiente = dict(os.environ,
+                    DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'benchmark.db')}",
+                    REPORT_CACHE_DIR=os.path.join(pasta, 'report_cache'),
+                    LOG_LEVEL='WARNING', CONSULTA_LENTA_MS='0')
+    medicoes = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente, cwd=pasta,
+                               capture_output=True, text=True, check=True).stdout
+        medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+    return medicoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--missoes', type=int, default=2000)
+    parser.add_argument('--json', dest='saida_json', help='grava as medições neste arquivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = dados_sinteticos.criar_app(pasta)
+        from models import db
+        with app.app_context():
+            dados_sinteticos.popular(db, 1, args.missoes)
+            db.session.remove()
+        medicoes = medir(pasta, args.repeticoes)
+
+    tempos = [m['import_ms'] for m in medicoes]
+    rss = [m['rss_kb'] / 1024 for m in medicoes]
+    print(f"import app + create_app(): mediana {statistics.median(tempos):.0f} ms (mín {min(tempos):.0f}, máx {max(tempos):.0f})")
+    print(f"RSS após o import: mediana {statistics.median(rss):.1f} MB")
+
+    ultima = medicoes[-1]
+    erros = {pagina: status for pagina, status in ultima['status'].items() if status >= 500}
+    problemas = []
+    if ultima['no_import']:
+        problemas.append(f"carregados no import: {', '.join(ultima['no_import'])}")
+    if ultima['nas_paginas']:
+        problemas.append(f"carregados pelas páginas comuns: {', '.join(ultima['nas_paginas'])}")
+    if erros:
+        problemas.append(f'páginas com erro: {erros}')
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({'parametros': vars(args), 'medicoes': medicoes}, arquivo, ensure_ascii=False, indent=2)
+        print(f"Medições gravadas em {args.saida_json}")
+
+    if problemas:
+        print('\nFALHOU:')
+        for problema in problemas:
+            print(f'  - {problema}')
+        sys.exit(1)
+    print('\nNenhum módulo pesado no import nem nas páginas comuns.')
+
+
+if __name__ == '__main__':
+    main()
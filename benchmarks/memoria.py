@@ -0,0 +1,260 @@
+"""Orçamento de memória das exportações e da importação de missões.
+
+Mede o pico de memória alocada (tracemalloc) de cada exportação e de
+``importar_missoes`` sobre bases sintéticas de tamanhos diferentes e falha
+(código de saída 1) se alguma rota:
+
+- responder com status fora de 2xx (um redirecionamento de erro não conta
+  como medição) ou, na importação, não gravar todas as linhas do CSV;
+- passar do teto fixo em ``ORCAMENTO_MEMORIA``, em qualquer tamanho;
+- crescer de forma linear com a base: entre as duas maiores bases, o pico
+  pode crescer no máximo ``(linhas_maior / linhas_menor) ** EXPOENTE_MAXIMO``
+  vezes. ``linhas`` é o tamanho da tabela que a rota percorre (missões,
+  movimentações ou linhas do CSV importado). Nos PDFs, que o ReportLab
+  mantém inteiros em memória até salvar, o pico pode crescer no máximo
+  ``FATOR_PDF`` bytes por byte a mais no arquivo gerado.
+
+Uma rota que volte a carregar a tabela inteira de uma vez (objetos ORM,
+listas de dicionários, DataFrames inteiros) cresce junto com a base e falha
+na verificação de crescimento, mesmo que ainda caiba no teto.
+
+O tracemalloc enxerga as alocações do Python e do numpy/pandas; com
+``--rss`` cada medição roda num processo novo e o pico de RSS
+(``ru_maxrss``) também é informado, para incluir o que fica fora dele.
+
+Ao reduzir a memória de uma rota, baixe o teto correspondente.
+
+Uso:
+    python -m benchmarks.memoria
+    python -m benchmarks.memoria --tamanhos 1:1000:500,3:20000:10000 --rss
+"""
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+
+
+# Entre as duas maiores bases, o pico pode crescer no máximo
+# (linhas_maior / linhas_menor) ** EXPOENTE_MAXIMO vezes
+EXPOENTE_MAXIMO = 0.5
+
+# Picos abaixo disso são dominados por ruído e não entram na razão de crescimento
+PICO_MINIMO = 512 * 1024
+
+# O ReportLab guarda o conteúdo de todas as páginas, sem compressão, até salvar
+# o arquivo, então o pico de um PDF cresce com o PDF (~9 bytes por byte gerado).
+# Nas rotas PDF, o pico pode crescer no máximo FATOR_PDF bytes por byte a mais
+# no arquivo; carregar a tabela inteira numa lista de novo leva a ~18
+FATOR_PDF = 12
+
+# nome: (método, url, tabela que define ``linhas``, teto em MB)
+ORCAMENTO_MEMORIA = {
+    'importar_missoes': ('POST', '/importar_missoes', 'importacao', 6),
+    'exportar_movimentacoes_csv': ('GET', '/exportar_movimentacoes_csv', 'movimentacoes', 4),
+    'exportar_movimentacoes_pdf': ('GET', '/exportar_movimentacoes_pdf', 'movimentacoes', 12),
+    'exportar_relatorio_orcamento_pdf': ('GET', '/exportar_relatorio/orcamento?formato=pdf', None, 4),
+    'exportar_relatorio_orcamento_csv': ('GET', '/exportar_relatorio/orcamento?formato=csv', None, 4),
+    'exportar_relatorio_orcamento_xlsx': ('GET', '/exportar_relatorio/orcamento?formato=xlsx', None, 4),
+    'exportar_relatorio_orcamento_json': ('GET', '/exportar_relatorio/orcamento?formato=json', None, 4),
+    'exportar_relatorio_missoes_pdf': ('GET', '/exportar_relatorio/missoes?formato=pdf', 'missoes', 12),
+    'exportar_relatorio_missoes_csv': ('GET', '/exportar_relatorio/missoes?formato=csv', 'missoes', 4),
+    'exportar_relatorio_missoes_xlsx': ('GET', '/exportar_relatorio/missoes?formato=xlsx', 'missoes', 4),
+    'exportar_relatorio_missoes_json': ('GET', '/exportar_relatorio/missoes?formato=json', 'missoes', 4),
+    'exportar_relatorio_movimentacoes_pdf': ('GET', '/exportar_relatorio/movimentacoes?formato=pdf',
+                                             'movimentacoes', 12),
+    'exportar_relatorio_movimentacoes_csv': ('GET', '/exportar_relatorio/movimentacoes?formato=csv',
+                                             'movimentacoes', 4),
+    'exportar_relatorio_movimentacoes_xlsx': ('GET', '/exportar_relatorio/movimentacoes?formato=xlsx',
+                                              'movimentacoes', 4),
+    'exportar_relatorio_movimentacoes_json': ('GET', '/exportar_relatorio/movimentacoes?formato=json',
+                                              'movimentacoes', 4),
+    # Agregados: não dependem do tamanho da base (graficos não tem layout PDF)
+    'exportar_relatorio_graficos_csv': ('GET', '/exportar_relatorio/graficos?formato=csv', None, 4),
+    'exportar_relatorio_graficos_xlsx': ('GET', '/exportar_relatorio/graficos?formato=xlsx', None, 4),
+    'exportar_relatorio_graficos_json': ('GET', '/exportar_relatorio/graficos?formato=json', None, 4),
+}
+
+
+def medir_rota(app, nome, linhas_importacao, rastrear=True):
+    """(pico tracemalloc em bytes, erro ou None, bytes da resposta) de uma chamada à rota"""
+    import reports
+
+    metodo, url, _, _ = ORCAMENTO_MEMORIA[nome]
+    dados = None
+    if nome == 'importar_missoes':
+        dados = {'arquivo': (dados_sinteticos.csv_missoes(linhas_importacao, semente=7), 'missoes.csv')}
+    with app.app_context():
+        reports.report_cache.invalidar()
+    cliente = app.test_client()
+
+    gc.collect()
+    if rastrear:
+        tracemalloc.start()
+    try:
+        # Sem buffer: o corpo é consumido em partes, como faria o servidor WSGI
+        resposta = cliente.open(url, method=metodo, data=dados, buffered=False,
+                                content_type='multipart/form-data' if dados else None)
+        tamanho = sum(len(parte) for parte in resposta.iter_encoded())
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    resposta.close()
+    erro = None if 200 <= resposta.status_code < 300 else f'status {resposta.status_code}'
+    if nome == 'importar_missoes':
+        # Sucesso e erro redirecionam: a importação vale se todas as linhas entraram.
+        # Desfaz a importação para não inflar as medições seguintes
+        from models import db, Missao
+        with app.app_context():
+            importadas = Missao.query.filter(Missao.processo_sei.like('SEI-IMP-%')).delete(synchronize_session=False)
+            db.session.commit()
+        erro = None if importadas == linhas_importacao else f'importou {importadas} de {linhas_importacao} linhas'
+    return pico, erro, tamanho
+
+
+def _medir_em_processo(pasta, nome, linhas_importacao, fila):
+    app = dados_sinteticos.criar_app(pasta)
+    medir_rota(app, nome, linhas_importacao, rastrear=False)
+    antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico, erro, tamanho = medir_rota(app, nome, linhas_importacao)
+    depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fila.put((pico, erro, tamanho, (depois - antes) * 1024))
+
+
+def medir(app, pasta, tamanhos, semente, rss):
+    """{rota: [(linhas, pico tracemalloc, pico RSS ou None, erro ou None, bytes da resposta) em cada tamanho]}"""
+    from models import db
+
+    medicoes = {nome: [] for nome in ORCAMENTO_MEMORIA}
+    contexto = multiprocessing.get_context('spawn')
+    for indice, (anos, missoes, importacao) in enumerate(tamanhos):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            linhas = dados_sinteticos.popular(db, anos, missoes, semente)
+            db.session.remove()
+        linhas['importacao'] = importacao
+        if indice == 0 and not rss:
+            # Aquecimento: imports tardios (openpyxl, fontes do ReportLab) não entram no pico
+            for nome in ORCAMENTO_MEMORIA:
+                medir_rota(app, nome, importacao, rastrear=False)
+        print(f"Base com {linhas['missoes']} missões, {linhas['movimentacoes']} movimentações, "
+              f"CSV de {importacao} linhas")
+
+        for nome, (_, _, tabela, _) in ORCAMENTO_MEMORIA.items():
+            if rss:
+                fila = contexto.Queue()
+                processo = contexto.Process(target=_medir_em_processo, args=(pasta, nome, importacao, fila))
+                processo.start()
+                pico, erro, tamanho, pico_rss = fila.get()
+                processo.join()
+            else:
+                (pico, erro, tamanho), pico_rss = medir_rota(app, nome, importacao), None
+            medicoes[nome].append((linhas[tabela] if tabela else 0, pico, pico_rss, erro, tamanho))
+    return medicoes
+
+
+def teto_bytes(nome):
+    return ORCAMENTO_MEMORIA[nome][3] * 1024 * 1024
+
+
+def expoente_crescimento(valores):
+    """Expoente do crescimento do pico entre as duas maiores bases (0 = constante, 1 = linear)"""
+    (linhas_menor, pico_menor, *_), (linhas_maior, pico_maior, *_) = sorted(valores)[-2:]
+    if linhas_maior <= linhas_menor:
+        return None
+    return (math.log(max(pico_maior, PICO_MINIMO) / max(pico_menor, PICO_MINIMO))
+            / math.log(linhas_maior / linhas_menor))
+
+
+def bytes_por_byte_de_pdf(valores):
+    """Crescimento do pico por byte a mais no PDF, entre as duas maiores bases"""
+    (_, pico_menor, _, _, pdf_menor), (_, pico_maior, _, _, pdf_maior) = sorted(valores)[-2:]
+    if pdf_maior <= pdf_menor:
+        return None
+    return (pico_maior - pico_menor) / (pdf_maior - pdf_menor)
+
+
+def verificar_crescimento(nome, valores):
+    """(descrição do crescimento, problema ou None)"""
+    if not ORCAMENTO_MEMORIA[nome][2] or len(valores) < 2:
+        return '', None
+    if nome.endswith('_pdf'):
+        fator = bytes_por_byte_de_pdf(valores)
+        if fator is None:
+            return '', None
+        if fator > FATOR_PDF:
+            return f'{fator:.1f}x PDF', f'pico cresce mais que o PDF ({fator:.1f} > {FATOR_PDF} bytes por byte)'
+        return f'{fator:.1f}x PDF', None
+    expoente = expoente_crescimento(valores)
+    if expoente is None:
+        return '', None
+    if expoente > EXPOENTE_MAXIMO:
+        return f'{expoente:.2f}', f'pico cresce com a base (expoente {expoente:.2f} > {EXPOENTE_MAXIMO})'
+    return f'{expoente:.2f}', None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', default='1:500:250,2:2500:1000,3:8000:4000',
+                        help='bases medidas, como anos:missoes:linhas_importacao separados por vírgula')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--rss', action='store_true', help='mede cada rota num processo novo e informa o RSS')
+    parser.add_argument('--json', dest='saida_json', help='grava as medições neste arquivo')
+    args = parser.parse_args()
+    tamanhos = [tuple(int(parte) for parte in tamanho.split(':')) for tamanho in args.tamanhos.split(',')]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = dados_sinteticos.criar_app(pasta)
+        medicoes = medir(app, pasta, tamanhos, args.semente, args.rss)
+
+    falhas = []
+    print(f"\n{'rota':40s}  teto MB  pico MB por tamanho  crescimento")
+    for nome, valores in medicoes.items():
+        teto = teto_bytes(nome)
+        partes, problemas = [], []
+        for linhas, pico, pico_rss, erro, _ in valores:
+            parte = f'{pico / 2**20:6.1f}'
+            if pico_rss is not None:
+                parte += f' (RSS +{pico_rss / 2**20:.0f})'
+            partes.append(parte)
+            if erro:
+                problemas.append(f'{linhas} linhas: {erro}')
+            if pico > teto:
+                problemas.append(f'{linhas} linhas: {pico / 2**20:.1f} MB > {teto / 2**20:.0f} MB')
+        crescimento, problema = verificar_crescimento(nome, valores)
+        if problema:
+            problemas.append(problema)
+        print(f"{nome:40s}  {teto / 2**20:7.0f}  {'  '.join(partes)}  {crescimento:>11s}  "
+              f"{'; '.join(problemas) or 'ok'}")
+        falhas += [f'{nome}: {problema}' for problema in problemas]
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({nome: {'teto_bytes': teto_bytes(nome),
+                              'crescimento': verificar_crescimento(nome, valores)[0],
+                              'medicoes': [{'linhas': linhas, 'pico_bytes': pico, 'pico_rss_bytes': pico_rss,
+                                            'erro': erro, 'bytes_resposta': tamanho}
+                                           for linhas, pico, pico_rss, erro, tamanho in valores]}
+                       for nome, valores in medicoes.items()}, arquivo, indent=2)
+        print(f"\nMedições gravadas em {args.saida_json}")
+
+    if falhas:
+        print('\nFALHOU - orçamento de memória estourado:')
+        for falha in falhas:
+            print(f'  - {falha}')
+        sys.exit(1)
+    print('\nTodas as rotas dentro do orçamento de memória.')
+
+
+if __name__ == '__main__':
+    main()
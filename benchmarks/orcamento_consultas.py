@@ -0,0 +1,146 @@
+"""Orçamento de consultas SQL por rota.
+
+Conta as consultas de cada rota sobre bases sintéticas de tamanhos diferentes
+e falha (código de saída 1) se alguma rota passar do seu limite em
+``ORCAMENTO_CONSULTAS`` ou se o número de consultas crescer com o tamanho da
+base. Esse crescimento é o sinal de um laço com consulta por item (N+1) sobre
+unidades, tipos orçamentários, orçamentos ou missões.
+
+Ao reduzir as consultas de uma rota, baixe o limite correspondente.
+
+Uso:
+    python -m benchmarks.orcamento_consultas
+    python -m benchmarks.orcamento_consultas --tamanhos 1:500,4:8000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+
+
+TRANSFERENCIA = {'unidade_origem': 'CRPIV', 'unidade_destino': '7º BPM',
+                 'tipo_orcamento': 'DIÁRIAS', 'valor': '10', 'motivo': 'orçamento de consultas'}
+
+# nome: (método, url, dados do formulário, máximo de consultas por requisição)
+ORCAMENTO_CONSULTAS = {
+    'dashboard': ('GET', '/', None, 0),
+    'painel_totais': ('GET', '/painel/totais', None, 4),
+    'painel_crpiv': ('GET', '/painel/crpiv', None, 6),
+    'painel_unidades': ('GET', '/painel/unidades', None, 3),
+    'painel_bimestres': ('GET', '/painel/bimestres', None, 5),
+    'saldos_bimestre': ('GET', '/saldos_bimestre', None, 7),
+    'transferir_saldo_get': ('GET', '/transferir_saldo', None, 7),
+    'transferir_saldo_post': ('POST', '/transferir_saldo', TRANSFERENCIA, 8),
+    'autorizar_missao': ('GET', '/autorizar_missao/{missao}', None, 13),
+    'distribuir': ('GET', '/distribuir/{orcamento}', None, 5),
+    'verificar_recolhimento': ('GET', '/verificar_recolhimento/{orcamento}', None, 5),
+    'confirmar_recolhimento_simples': ('POST', '/confirmar_recolhimento_simples/{orcamento}',
+                                       {'recolher_7º BPM_DIÁRIAS': 'on'}, 8),
+    'exportar_pdf_orcamento': ('GET', '/exportar_pdf?tipo=orcamento', None, 4),
+    'exportar_pdf_missoes': ('GET', '/exportar_pdf?tipo=missoes', None, 3),
+    'exportar_pdf_movimentacoes': ('GET', '/exportar_pdf?tipo=movimentacoes', None, 3),
+    'exportar_relatorio_missoes_xlsx': ('GET', '/exportar_relatorio/missoes?formato=xlsx', None, 3),
+    'exportar_relatorio_graficos_json': ('GET', '/exportar_relatorio/graficos?formato=json', None, 4),
+    'exportar_movimentacoes_csv': ('GET', '/exportar_movimentacoes_csv', None, 3),
+}
+
+
+def garantir_saldo_a_recolher(db, orcamento_id, unidade='7º BPM', tipo='DIÁRIAS'):
+    """Deixa saldo em (unidade, tipo) para confirmar_recolhimento_simples sempre recolher.
+
+    Sem isso a contagem da rota dependeria de a base sorteada ter ou não saldo
+    a recolher, e não do tamanho da base.
+    """
+    from models import Distribuicao, Missao
+
+    autorizado = db.session.query(db.func.sum(Missao.valor)).filter(
+        Missao.fonte_dinheiro == unidade, Missao.tipo == tipo, Missao.status == 'autorizada'
+    ).scalar() or 0
+    distribuicao = Distribuicao.query.filter_by(
+        orcamento_id=orcamento_id, unidade=unidade, tipo_orcamento=tipo).first()
+    if distribuicao is None:
+        distribuicao = Distribuicao(orcamento_id=orcamento_id, unidade=unidade, tipo_orcamento=tipo, valor=0)
+        db.session.add(distribuicao)
+    distribuicao.valor = max(distribuicao.valor, autorizado + 100)
+    db.session.commit()
+
+
+def contar_consultas(app, tamanhos, semente):
+    """{rota: [consultas em cada tamanho]}"""
+    import reports
+    from models import db, Missao, Orcamento
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    contador = {'consultas': 0}
+
+    def contar(*args):
+        contador['consultas'] += 1
+
+    contagens = {nome: [] for nome in ORCAMENTO_CONSULTAS}
+    cliente = app.test_client()
+    for anos, missoes in tamanhos:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            dados_sinteticos.popular(db, anos, missoes, semente)
+            ids = {
+                'orcamento': Orcamento.query.order_by(Orcamento.id.desc()).first().id,
+                'missao': Missao.query.filter_by(status='previsao').order_by(Missao.valor).first().id,
+            }
+            garantir_saldo_a_recolher(db, ids['orcamento'])
+            db.session.remove()
+
+        event.listen(Engine, 'before_cursor_execute', contar)
+        try:
+            for nome, (metodo, url, dados, _) in ORCAMENTO_CONSULTAS.items():
+                with app.app_context():
+                    reports.report_cache.invalidar()
+                contador['consultas'] = 0
+                resposta = cliente.open(url.format(**ids), method=metodo, data=dados)
+                if resposta.status_code >= 500:
+                    raise RuntimeError(f'{nome}: status {resposta.status_code}')
+                contagens[nome].append(contador['consultas'])
+        finally:
+            event.remove(Engine, 'before_cursor_execute', contar)
+    return contagens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', default='1:300,3:3000',
+                        help='bases comparadas, como anos:missoes separados por vírgula')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    tamanhos = [tuple(int(parte) for parte in tamanho.split(':')) for tamanho in args.tamanhos.split(',')]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = dados_sinteticos.criar_app(pasta)
+        contagens = contar_consultas(app, tamanhos, args.semente)
+
+    falhas = []
+    print(f"{'rota':36s} {'limite':>6s}  consultas por tamanho")
+    for nome, valores in contagens.items():
+        limite = ORCAMENTO_CONSULTAS[nome][3]
+        problemas = []
+        if max(valores) > limite:
+            problemas.append(f'acima do limite ({max(valores)} > {limite})')
+        if len(set(valores)) > 1:
+            problemas.append('cresce com o tamanho da base (N+1?)')
+        print(f"{nome:36s} {limite:6d}  {valores}  {'; '.join(problemas) or 'ok'}")
+        falhas += [f'{nome}: {problema}' for problema in problemas]
+
+    if falhas:
+        print('\nFALHOU - orçamento de consultas estourado:')
+        for falha in falhas:
+            print(f'  - {falha}')
+        sys.exit(1)
+    print('\nTodas as rotas dentro do orçamento de consultas.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Compara os planos de execução das consultas mais usadas sem e com os índices compostos.
+
+Cria um banco SQLite temporário com dados sintéticos, roda EXPLAIN QUERY PLAN e
+mede o tempo de cada consulta duas vezes: sem os índices declarados em
+models.py ("antes") e com eles ("depois").
+
+Uso:
+    python -m benchmarks.planos_indices --linhas 50000 --json resultados.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (db, Orcamento, Distribuicao, Missao,  # noqa: E402
+                    ComplementacaoOrcamento, MovimentacaoOrcamentaria)
+
+UNIDADES = ['CRPIV', '7º BPM', '8º BPM', 'CIPO']
+TIPOS_ORCAMENTO = ['DIÁRIAS', 'DERSO', 'DIÁRIAS PAV', 'DERSO PAV']
+TIPOS_MOVIMENTACAO = ['orcamento_criado', 'distribuicao', 'autorizacao_missao',
+                      'transferencia_entre_unidades', 'nova_distribuicao_crpiv', 'recolhimento']
+TABELAS = [Missao, Distribuicao, ComplementacaoOrcamento, MovimentacaoOrcamentaria]
+INICIO = datetime(2022, 1, 1)
+
+
+def popular(linhas, semente):
+    """Insere dados sintéticos proporcionais a ``linhas``"""
+    rnd = random.Random(semente)
+    orcamentos = [
+        {'bimestre': f'{b}º BIMESTRE', 'ano': ano,
+         'data_inicio': datetime(ano, 2 * b - 1, 1).date(),
+         'data_fim': datetime(ano, 2 * b, 28).date(),
+         'diarias': 100000.0, 'derso': 80000.0, 'diarias_pav': 50000.0, 'derso_pav': 40000.0}
+        for ano in range(2022, 2026) for b in range(1, 7)
+    ]
+    db.session.execute(insert(Orcamento), orcamentos)
+    ids_orcamento = list(range(1, len(orcamentos) + 1))
+
+    def data_aleatoria():
+        return INICIO + timedelta(minutes=rnd.randrange(4 * 365 * 24 * 60))
+
+    db.session.execute(insert(Distribuicao), [
+        {'orcamento_id': rnd.choice(ids_orcamento), 'unidade': rnd.choice(UNIDADES),
+         'tipo_orcamento': rnd.choice(TIPOS_ORCAMENTO), 'valor': rnd.uniform(100, 5000),
+         'data_distribuicao': data_aleatoria()}
+        for _ in range(linhas)
+    ])
+    db.session.execute(insert(ComplementacaoOrcamento), [
+        {'orcamento_id': rnd.choice(ids_orcamento), 'processo_sei': f'SEI-{i}',
+         'tipo_orcamento': rnd.choice(TIPOS_ORCAMENTO), 'valor': rnd.uniform(100, 5000)}
+        for i in range(max(linhas // 10, 1))
+    ])
+    db.session.execute(insert(Missao), [
+        {'fonte_dinheiro': rnd.choice(UNIDADES), 'opm_destino': rnd.choice(UNIDADES),
+         'processo_sei': f'SEI-{i}', 'descricao': 'Missão sintética', 'periodo': '01/01 a 05/01',
+         'mes': 'Janeiro', 'tipo': rnd.choice(TIPOS_ORCAMENTO), 'valor': rnd.uniform(50, 3000),
+         'status': rnd.choice(['previsao', 'autorizada']), 'data_criacao': data_aleatoria()}
+        for i in range(linhas)
+    ])
+    db.session.execute(insert(MovimentacaoOrcamentaria), [
+        {'data_movimentacao': data_aleatoria(), 'tipo': rnd.choice(TIPOS_MOVIMENTACAO),
+         'unidade_origem': rnd.choice(UNIDADES), 'unidade_destino': rnd.choice(UNIDADES),
+         'tipo_orcamento': rnd.choice(TIPOS_ORCAMENTO), 'valor': round(rnd.uniform(50, 3000), 2),
+         'orcamento_id': rnd.choice(ids_orcamento)}
+        for _ in range(linhas * 2)
+    ])
+    db.session.commit()
+
+
+def consultas():
+    """Consultas equivalentes às usadas pelas rotas de saldo, missões e relatórios"""
+    periodo = (datetime(2024, 3, 1), datetime(2024, 4, 30))
+    return {
+        'saldo_distribuido_unidade_tipo': select(db.func.sum(Distribuicao.valor)).where(
+            Distribuicao.unidade == '7º BPM', Distribuicao.tipo_orcamento == 'DIÁRIAS'),
+        'saldo_distribuido_orcamento': select(db.func.sum(Distribuicao.valor)).where(
+            Distribuicao.unidade == '7º BPM', Distribuicao.tipo_orcamento == 'DERSO',
+            Distribuicao.orcamento_id == 5),
+        'missoes_autorizadas_fonte_tipo': select(db.func.sum(Missao.valor)).where(
+            Missao.fonte_dinheiro == '8º BPM', Missao.tipo == 'DIÁRIAS',
+            Missao.status == 'autorizada'),
+        'complementacoes_orcamento_tipo': select(db.func.sum(ComplementacaoOrcamento.valor)).where(
+            ComplementacaoOrcamento.orcamento_id == 5,
+            ComplementacaoOrcamento.tipo_orcamento == 'DIÁRIAS'),
+        'pagina_missoes': select(Missao.id, Missao.valor).order_by(
+            Missao.data_criacao.desc(), Missao.id.desc()).limit(50),
+        'movimentacoes_periodo_tipo': select(
+            db.func.count(MovimentacaoOrcamentaria.id),
+            db.func.sum(MovimentacaoOrcamentaria.valor)).where(
+            MovimentacaoOrcamentaria.data_movimentacao.between(*periodo),
+            MovimentacaoOrcamentaria.tipo == 'distribuicao'),
+        'pagina_movimentacoes': select(MovimentacaoOrcamentaria.id).order_by(
+            MovimentacaoOrcamentaria.data_movimentacao.desc(),
+            MovimentacaoOrcamentaria.id.desc()).limit(50),
+    }
+
+
+def plano(stmt):
+    """Linhas de EXPLAIN QUERY PLAN para uma instrução SQLAlchemy"""
+    compilado = stmt.compile(dialect=db.engine.dialect)
+    parametros = [compilado.params[nome] for nome in compilado.positiontup]
+    parametros = [str(p) if isinstance(p, datetime) else p for p in parametros]
+    conexao = db.engine.raw_connection()
+    try:
+        cursor = conexao.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + str(compilado), parametros)
+        return [linha[-1] for linha in cursor.fetchall()]
+    finally:
+        conexao.close()
+
+
+def cronometrar(stmt, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        db.session.execute(stmt).all()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def alternar_indices(criar):
+    for modelo in TABELAS:
+        for indice in modelo.__table__.indexes:
+            if criar:
+                indice.create(db.engine, checkfirst=True)
+            else:
+                indice.drop(db.engine, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=20000, help='missões/distribuições sintéticas')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--json', dest='saida_json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            print(f"Populando {args.linhas} linhas sintéticas (semente {args.semente})...")
+            popular(args.linhas, args.semente)
+
+            resultados = {}
+            for fase, criar in (('antes', False), ('depois', True)):
+                alternar_indices(criar)
+                for nome, stmt in consultas().items():
+                    resultados.setdefault(nome, {})[fase] = {
+                        'plano': plano(stmt),
+                        'tempo_ms': round(cronometrar(stmt, args.repeticoes), 3),
+                    }
+
+    for nome, fases in resultados.items():
+        antes, depois = fases['antes'], fases['depois']
+        print(f"\n{nome}: {antes['tempo_ms']:.2f} ms -> {depois['tempo_ms']:.2f} ms")
+        print(f"  antes : {' | '.join(antes['plano'])}")
+        print(f"  depois: {' | '.join(depois['plano'])}")
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({'linhas': args.linhas, 'semente': args.semente, 'consultas': resultados},
+                      arquivo, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida_json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+"""Reprodução de carga real a partir do log de movimentações.
+
+``despejar`` lê um banco (produção ou cópia dele) e grava em JSON o log de
+``MovimentacaoOrcamentaria``, os orçamentos e missões que ele referencia e os
+saldos finais. ``reproduzir`` executa esse log, na ordem, contra um banco
+novo, chamando as mesmas rotas que os usuários chamaram:
+
+- ``orcamento_criado`` -> POST /orcamento
+- ``complementacao_orcamento`` -> POST /complementacao
+- ``distribuicao`` (sem missão) -> POST /salvar_distribuicao, uma chamada por
+  sequência de linhas do mesmo orçamento (cada salvamento grava uma por item)
+- ``autorizacao_missao`` -> GET /autorizar_missao/<id>
+- ``transferencia_entre_unidades``, ``nova_distribuicao_crpiv`` e
+  ``recolhimento`` -> POST /transferir_saldo, ou POST /resolver_sem_saldo/<id>
+  quando a linha seguinte é a autorização que essa movimentação viabilizou
+
+Distribuições automáticas (com ``missao_id``) não são chamadas: a própria
+autorização as recria. Missões não têm log de criação e entram no banco novo
+antes da reprodução, em previsão quando a autorização está no log. Orçamentos
+sem ``orcamento_criado`` também entram antes.
+
+Com ``--velocidade N`` os intervalos entre as movimentações são respeitados,
+N vezes mais curtos (``--pausa-maxima`` limita noites e fins de semana); sem
+ela tudo roda sem pausa.
+
+Cada entrada reproduzida falha se a chamada levantar exceção, responder
+4xx/5xx, deixar mensagem de erro ou aviso, ou terminar sem a mensagem de
+sucesso da rota (por exemplo, uma autorização que cai na tela de missão sem
+saldo). Ao final o relatório traz vazão, p50/p99 e falhas por operação, cada
+entrada que falhou com a movimentação de origem e a mensagem da rota,
+movimentações geradas por tipo e a diferença entre os saldos finais da
+reprodução e os do banco de origem.
+
+Uso:
+    python -m benchmarks.reproducao despejar --banco sqlite:////tmp/copia.db --saida log.json
+    python -m benchmarks.reproducao reproduzir log.json --velocidade 3600 --pausa-maxima 2
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+from benchmarks.estresse import TOLERANCIA, percentil, saldos  # noqa: E402
+
+TIPOS_AUTORIZACAO = ('autorizacao_missao', 'autorizacao_com_transferencia', 'autorizacao_com_nova_distribuicao')
+# Movimentação que precede cada autorização com resolução de saldo
+RESOLUCOES = {'autorizacao_com_transferencia': 'transferencia_entre_unidades',
+              'autorizacao_com_nova_distribuicao': 'nova_distribuicao_crpiv'}
+CAMPOS_ORCAMENTO = ('id', 'bimestre', 'ano', 'data_inicio', 'data_fim', 'diarias', 'derso',
+                    'diarias_pav', 'derso_pav', 'status', 'data_criacao', 'data_finalizacao')
+CAMPOS_MISSAO = ('id', 'fonte_dinheiro', 'opm_destino', 'processo_sei', 'descricao', 'periodo', 'mes',
+                 'tipo', 'valor', 'numero_autorizacao', 'status', 'data_criacao', 'data_autorizacao',
+                 'observacoes')
+# Categorias de flash que indicam que a rota não aplicou a operação
+CATEGORIAS_FALHA = ('error', 'warning')
+# Entradas com falha listadas no terminal; o --json traz todas
+FALHAS_EXIBIDAS = 20
+CAMPOS_MOVIMENTACAO = ('id', 'data_movimentacao', 'tipo', 'descricao', 'unidade_origem', 'unidade_destino',
+                       'tipo_orcamento', 'valor', 'usuario', 'orcamento_id', 'missao_id')
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def _linha(objeto, campos):
+    return {campo: _serializar(getattr(objeto, campo)) for campo in campos}
+
+
+def _chave_saldo(unidade, tipo):
+    return f'{unidade}|{tipo}'
+
+
+# ---------------------------------------------------------------------------
+# Despejo
+# ---------------------------------------------------------------------------
+
+def despejar(banco, saida):
+    with tempfile.TemporaryDirectory() as pasta:
+        # A origem costuma ser uma cópia de produção ou o banco versionado: sem WAL nem tabelas novas
+        os.environ.update({'DATABASE_URL': banco, 'REPORT_CACHE_DIR': os.path.join(pasta, 'report_cache'),
+                           'LOG_LEVEL': 'WARNING', 'CONSULTA_LENTA_MS': '0', 'SQLITE_WAL': '0'})
+        from app import create_app
+        from models import db, Orcamento, Missao, MovimentacaoOrcamentaria
+
+        app = create_app({'CRIAR_TABELAS': False, 'SQLITE_WAL': False})
+
+        with app.app_context():
+            movimentacoes = [_linha(mov, CAMPOS_MOVIMENTACAO) for mov in MovimentacaoOrcamentaria.query.order_by(
+                MovimentacaoOrcamentaria.data_movimentacao, MovimentacaoOrcamentaria.id)]
+            dump = {
+                'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                'orcamentos': [_linha(o, CAMPOS_ORCAMENTO) for o in Orcamento.query.order_by(Orcamento.id)],
+                'missoes': [_linha(m, CAMPOS_MISSAO) for m in Missao.query.order_by(Missao.id)],
+                'movimentacoes': movimentacoes,
+                'saldos': {_chave_saldo(*chave): round(valor, 2) for chave, valor in saldos(db)[0].items()},
+            }
+            db.session.remove()
+
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(dump, arquivo, ensure_ascii=False)
+    print(f"{len(dump['movimentacoes'])} movimentações, {len(dump['orcamentos'])} orçamentos e "
+          f"{len(dump['missoes'])} missões gravados em {saida}")
+
+
+# ---------------------------------------------------------------------------
+# Planejamento: log -> chamadas às rotas
+# ---------------------------------------------------------------------------
+
+def _distribuicao_manual(mov):
+    return (mov['tipo'] == 'distribuicao' and not mov['missao_id'] and mov['orcamento_id']
+            and mov['unidade_destino'] in dados_sinteticos.SUBUNIDADES)
+
+
+def planejar(movimentacoes, missoes, orcamentos):
+    """Lista de operações (quando, nome, chamada) e contagem das linhas ignoradas.
+
+    ``chamada`` é um dicionário com a movimentação de origem, método, url e
+    formulário; os ids de orçamento ficam como ``orcamento_origem`` e são
+    traduzidos na execução, porque os orçamentos recriados pela rota recebem
+    ids novos.
+    """
+    fonte = {m['id']: m for m in missoes}
+    existentes = {o['id'] for o in orcamentos}
+    operacoes, ignoradas = [], Counter()
+    indice = 0
+    while indice < len(movimentacoes):
+        mov = movimentacoes[indice]
+        seguinte = movimentacoes[indice + 1] if indice + 1 < len(movimentacoes) else None
+        quando = datetime.fromisoformat(mov['data_movimentacao'])
+        tipo = mov['tipo']
+        indice += 1
+
+        if tipo == 'orcamento_criado' and mov['orcamento_id'] in existentes:
+            operacoes.append((quando, 'orcamento', {'movimentacao': mov['id'], 'criar_orcamento': mov['orcamento_id']}))
+        elif tipo == 'complementacao_orcamento' and mov['orcamento_id']:
+            operacoes.append((quando, 'complementacao', {
+                'movimentacao': mov['id'], 'metodo': 'POST', 'url': '/complementacao', 'orcamento_origem': mov['orcamento_id'],
+                'formulario': {'processo_sei': f"REPRODUCAO-{mov['id']}", 'tipo_orcamento': mov['tipo_orcamento'],
+                               'valor': mov['valor'], 'descricao': mov['descricao'] or ''},
+            }))
+        elif _distribuicao_manual(mov):
+            # Um salvamento da tela de distribuição grava uma linha por item, em sequência
+            itens = [mov]
+            while indice < len(movimentacoes) and _distribuicao_manual(movimentacoes[indice]) \
+                    and movimentacoes[indice]['orcamento_id'] == mov['orcamento_id']:
+                itens.append(movimentacoes[indice])
+                indice += 1
+            formulario = {f"{item['unidade_destino']}_{item['tipo_orcamento'].replace('Á', 'A').replace(' ', '_')}":
+                          item['valor'] for item in itens}
+            operacoes.append((quando, 'distribuicao', {
+                'movimentacao': mov['id'], 'metodo': 'POST', 'url': '/salvar_distribuicao', 'orcamento_origem': mov['orcamento_id'],
+                'formulario': formulario,
+            }))
+        elif tipo == 'autorizacao_missao' and mov['missao_id'] in fonte:
+            operacoes.append((quando, 'autorizacao', {'movimentacao': mov['id'], 'metodo': 'GET',
+                                                      'url': f"/autorizar_missao/{mov['missao_id']}"}))
+        elif tipo in RESOLUCOES.values() and seguinte and RESOLUCOES.get(seguinte['tipo']) == tipo \
+                and seguinte['missao_id'] in fonte \
+                and fonte[seguinte['missao_id']]['fonte_dinheiro'] == mov['unidade_destino']:
+            # Transferência feita pela tela de missão sem saldo: uma única chamada
+            if tipo == 'transferencia_entre_unidades':
+                formulario = {'tipo_resolucao': 'transferencia', 'unidade_origem': mov['unidade_origem'],
+                              'valor_transferir': mov['valor']}
+            else:
+                formulario = {'tipo_resolucao': 'nova_distribuicao', 'valor_solicitar': mov['valor']}
+            operacoes.append((quando, 'resolver_sem_saldo', {
+                'movimentacao': mov['id'], 'metodo': 'POST', 'url': f"/resolver_sem_saldo/{seguinte['missao_id']}", 'formulario': formulario,
+            }))
+            indice += 1
+        elif tipo == 'distribuicao' and mov['missao_id']:
+            continue
+        elif tipo in ('transferencia_entre_unidades', 'nova_distribuicao_crpiv', 'recolhimento'):
+            operacoes.append((quando, 'transferencia', {
+                'movimentacao': mov['id'], 'metodo': 'POST', 'url': '/transferir_saldo',
+                'formulario': {'unidade_origem': mov['unidade_origem'], 'unidade_destino': mov['unidade_destino'],
+                               'tipo_orcamento': mov['tipo_orcamento'], 'valor': mov['valor'],
+                               'motivo': f"reprodução da movimentação {mov['id']}"},
+            }))
+        else:
+            ignoradas[tipo] += 1
+    return operacoes, ignoradas
+
+
+def agenda(operacoes, velocidade, pausa_maxima):
+    """Segundos desde o início em que cada operação deve ser disparada"""
+    if not velocidade:
+        return [0.0] * len(operacoes)
+    instantes, atual = [], 0.0
+    anterior = operacoes[0][0] if operacoes else None
+    for quando, _, _ in operacoes:
+        intervalo = max((quando - anterior).total_seconds(), 0) / velocidade
+        atual += min(intervalo, pausa_maxima) if pausa_maxima else intervalo
+        instantes.append(atual)
+        anterior = quando
+    return instantes
+
+
+# ---------------------------------------------------------------------------
+# Reprodução
+# ---------------------------------------------------------------------------
+
+def preparar_banco(db, dump):
+    """Cria missões e orçamentos anteriores ao log; devolve o mapa de ids de orçamento"""
+    from sqlalchemy import insert
+    from models import Orcamento, Missao
+
+    if db.session.query(Orcamento.id).first() or db.session.query(Missao.id).first():
+        raise SystemExit('O banco de destino precisa estar vazio')
+
+    criados_no_log = {mov['orcamento_id'] for mov in dump['movimentacoes'] if mov['tipo'] == 'orcamento_criado'}
+    autorizadas_no_log = {mov['missao_id'] for mov in dump['movimentacoes'] if mov['tipo'] in TIPOS_AUTORIZACAO}
+
+    def converter(linha, modelo):
+        convertida = {}
+        for campo, valor in linha.items():
+            coluna = modelo.__table__.columns[campo]
+            if valor is not None and coluna.type.python_type in (date, datetime):
+                valor = coluna.type.python_type.fromisoformat(valor)
+            convertida[campo] = valor
+        return convertida
+
+    anteriores = [converter(o, Orcamento) for o in dump['orcamentos'] if o['id'] not in criados_no_log]
+    if anteriores:
+        db.session.execute(insert(Orcamento), anteriores)
+    missoes = []
+    for linha in dump['missoes']:
+        missao = converter(linha, Missao)
+        if missao['id'] in autorizadas_no_log:
+            missao.update(status='previsao', data_autorizacao=None)
+        missoes.append(missao)
+    for inicio in range(0, len(missoes), 5000):
+        db.session.execute(insert(Missao), missoes[inicio:inicio + 5000])
+    db.session.commit()
+    return {o['id']: o['id'] for o in anteriores}
+
+
+def reproduzir(app, dump, velocidade, pausa_maxima, clientes):
+    from models import db, Orcamento, MovimentacaoOrcamentaria
+
+    orcamentos = {o['id']: o for o in dump['orcamentos']}
+    with app.app_context():
+        mapa_orcamentos = preparar_banco(db, dump)
+        db.session.remove()
+
+    operacoes, ignoradas = planejar(dump['movimentacoes'], dump['missoes'], dump['orcamentos'])
+    instantes = agenda(operacoes, velocidade, pausa_maxima)
+    local = threading.local()
+    trava_orcamentos = threading.Lock()
+    resultados = defaultdict(lambda: {'latencias': [], 'status': Counter(), 'falhas': 0})
+    falhas = []
+    trava = threading.Lock()
+
+    def chamar(cliente, chamada):
+        if 'criar_orcamento' in chamada:
+            origem = orcamentos[chamada['criar_orcamento']]
+            formulario = {campo: origem[campo] for campo in
+                          ('bimestre', 'ano', 'diarias', 'derso', 'diarias_pav', 'derso_pav')}
+            formulario.update(data_inicio=origem['data_inicio'][:10], data_fim=origem['data_fim'][:10])
+            # O id novo é o maior depois da chamada; criações simultâneas embaralhariam o mapa
+            with trava_orcamentos:
+                resposta = cliente.post('/orcamento', data={campo: str(valor) for campo, valor in formulario.items()})
+                with app.app_context():
+                    mapa_orcamentos[origem['id']] = db.session.query(db.func.max(Orcamento.id)).scalar()
+                    db.session.remove()
+            return resposta
+        formulario = dict(chamada.get('formulario') or {})
+        if 'orcamento_origem' in chamada:
+            formulario['orcamento_id'] = mapa_orcamentos.get(chamada['orcamento_origem'], 0)
+        return cliente.open(chamada['url'], method=chamada['metodo'],
+                            data={campo: str(valor) for campo, valor in formulario.items()} or None)
+
+    def executar(indice):
+        _, nome, chamada = operacoes[indice]
+        if not hasattr(local, 'cliente'):
+            local.cliente = app.test_client()
+        inicio = time.perf_counter()
+        try:
+            resposta = chamar(local.cliente, chamada)
+            resposta.get_data()
+            status = resposta.status_code
+            falha = verificar_resposta(local.cliente, status)
+        except Exception as e:
+            status, falha = None, f'{type(e).__name__}: {e}'
+        duracao = (time.perf_counter() - inicio) * 1000
+        with trava:
+            r = resultados[nome]
+            r['latencias'].append(duracao)
+            r['status'][status] += 1
+            if falha:
+                r['falhas'] += 1
+                falhas.append({'indice': indice, 'operacao': nome, 'movimentacao': chamada['movimentacao'],
+                               'url': chamada.get('url', '/orcamento'), 'status': status, 'mensagem': falha})
+
+    with app.app_context():
+        ultimo_id = db.session.query(db.func.max(MovimentacaoOrcamentaria.id)).scalar() or 0
+        db.session.remove()
+
+    print(f"Reproduzindo {len(operacoes)} operações com {clientes} cliente(s)"
+          f"{f', {velocidade:g}x mais rápido' if velocidade else ', sem pausas'}...")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        for indice, instante in enumerate(instantes):
+            espera = instante - (time.perf_counter() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(executar, indice)
+    duracao = time.perf_counter() - inicio
+
+    with app.app_context():
+        finais = {_chave_saldo(*chave): round(valor, 2) for chave, valor in saldos(db)[0].items()}
+        geradas = Counter(tipo for (tipo,) in db.session.query(MovimentacaoOrcamentaria.tipo)
+                          .filter(MovimentacaoOrcamentaria.id > ultimo_id))
+        db.session.remove()
+    return resultados, sorted(falhas, key=lambda falha: falha['indice']), duracao, ignoradas, geradas, finais
+
+
+def verificar_resposta(cliente, status):
+    """Motivo da falha de uma entrada reproduzida, ou None se a rota a aplicou.
+
+    As rotas respondem com redirecionamento e mensagens flash; as mensagens
+    são retiradas da sessão para não se acumularem nas próximas chamadas.
+    """
+    with cliente.session_transaction() as sessao:
+        mensagens = sessao.pop('_flashes', [])
+    for categoria, mensagem in mensagens:
+        if categoria in CATEGORIAS_FALHA:
+            return mensagem
+    if status >= 400:
+        return f'status {status}'
+    if not any(categoria == 'success' for categoria, _ in mensagens):
+        return f'sem mensagem de sucesso (status {status})'
+    return None
+
+
+def relatorio(dump, resultados, falhas, duracao, ignoradas, geradas, finais):
+    todas = [latencia for r in resultados.values() for latencia in r['latencias']]
+    print(f"\n{len(todas)} operações em {duracao:.1f} s ({len(todas) / duracao:.1f} op/s)" if todas else
+          '\nNenhuma operação reproduzida')
+    print(f"{'operação':20s} {'qtd':>6s} {'p50 ms':>9s} {'p99 ms':>9s} {'falhas':>6s}  status")
+    resumo = {}
+    for nome, r in sorted(resultados.items()):
+        resumo[nome] = {
+            'quantidade': len(r['latencias']),
+            'p50_ms': round(statistics.median(r['latencias']), 2),
+            'p99_ms': round(percentil(r['latencias'], 0.99), 2),
+            'falhas': r['falhas'],
+            'status': {str(s): n for s, n in r['status'].items()},
+        }
+        print(f"{nome:20s} {resumo[nome]['quantidade']:6d} {resumo[nome]['p50_ms']:9.1f} "
+              f"{resumo[nome]['p99_ms']:9.1f} {r['falhas']:6d}  {resumo[nome]['status']}")
+    if ignoradas:
+        print(f"Linhas do log sem rota correspondente: {dict(ignoradas)}")
+    if falhas:
+        print(f"\n{len(falhas)} entrada(s) do log não foram aplicadas:")
+        for falha in falhas[:FALHAS_EXIBIDAS]:
+            print(f"  - movimentação {falha['movimentacao']} ({falha['operacao']}, {falha['url']}): "
+                  f"{falha['mensagem']}")
+        if len(falhas) > FALHAS_EXIBIDAS:
+            print(f"  ... e mais {len(falhas) - FALHAS_EXIBIDAS} (todas no --json)")
+
+    originais = Counter(mov['tipo'] for mov in dump['movimentacoes'])
+    print(f"\n{'movimentação':36s} {'origem':>8s} {'reprodução':>11s}")
+    for tipo in sorted(set(originais) | set(geradas)):
+        print(f"{tipo:36s} {originais[tipo]:8d} {geradas[tipo]:11d}")
+
+    diferencas = {}
+    for chave in sorted(set(dump['saldos']) | set(finais)):
+        origem, reproducao = dump['saldos'].get(chave, 0), finais.get(chave, 0)
+        if abs(origem - reproducao) > TOLERANCIA:
+            diferencas[chave] = {'origem': origem, 'reproducao': reproducao}
+    if diferencas:
+        print(f"\nSaldos finais diferentes do banco de origem em {len(diferencas)} unidade(s)/tipo(s):")
+        for chave, valores in diferencas.items():
+            unidade, tipo = chave.split('|')
+            print(f"  - {unidade} {tipo}: {valores['origem']:,.2f} na origem, {valores['reproducao']:,.2f} na reprodução")
+    else:
+        print('\nSaldos finais iguais aos do banco de origem.')
+    return resumo, diferencas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_despejar = comandos.add_parser('despejar', help='grava o log e os dados de apoio de um banco em JSON')
+    p_despejar.add_argument('--banco', required=True, help='URL do banco de origem (use uma cópia)')
+    p_despejar.add_argument('--saida', required=True)
+
+    p_reproduzir = comandos.add_parser('reproduzir', help='executa um despejo contra um banco novo')
+    p_reproduzir.add_argument('despejo')
+    p_reproduzir.add_argument('--velocidade', type=float, default=0,
+                              help='compressão do tempo (ex.: 3600 = uma hora por segundo); 0 = sem pausas')
+    p_reproduzir.add_argument('--pausa-maxima', type=float, default=0, help='maior pausa entre operações, em segundos')
+    p_reproduzir.add_argument('--clientes', type=int, default=1,
+                              help='requisições simultâneas (a ordem do log só é garantida com 1)')
+    p_reproduzir.add_argument('--banco', help='URL de um banco vazio; o padrão é um SQLite temporário')
+    p_reproduzir.add_argument('--json', dest='saida_json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+
+    if args.comando == 'despejar':
+        despejar(args.banco, args.saida)
+        return
+
+    with open(args.despejo, encoding='utf-8') as arquivo:
+        dump = json.load(arquivo)
+    with tempfile.TemporaryDirectory() as pasta:
+        app = dados_sinteticos.criar_app(pasta, **({'DATABASE_URL': args.banco} if args.banco else {}))
+        resultados, falhas, duracao, ignoradas, geradas, finais = reproduzir(
+            app, dump, args.velocidade, args.pausa_maxima, args.clientes)
+    resumo, diferencas = relatorio(dump, resultados, falhas, duracao, ignoradas, geradas, finais)
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'parametros': vars(args),
+                'duracao_s': round(duracao, 3),
+                'operacoes': resumo,
+                'falhas': falhas,
+                'ignoradas': dict(ignoradas),
+                'movimentacoes_geradas': dict(geradas),
+                'diferencas_saldo': diferencas,
+            }, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.saida_json}")
+
+    sys.exit(1 if diferencas or falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Tempo de resposta das rotas mais usadas sobre uma base sintética.
+
+Gera a base com ``dados_sinteticos`` (semente fixa), chama cada rota pelo
+test client do Flask e registra, por rota, o tempo da primeira chamada, a
+mediana, o p95 e o número de consultas SQL. O cache de relatórios é
+invalidado antes de cada chamada (use ``--com-cache`` para medir o caminho
+com cache). Os resultados vão para um JSON, para comparar execuções.
+
+Uso:
+    python -m benchmarks.rotas --anos 3 --missoes 20000 --json rotas.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dados_sinteticos  # noqa: E402
+
+
+def casos(missoes_previsao, linhas_importacao):
+    """(nome, método, url, dados) de cada chamada; ``dados`` recebe o número da repetição"""
+    transferencia = {'unidade_origem': 'CRPIV', 'unidade_destino': '7º BPM',
+                     'tipo_orcamento': 'DIÁRIAS', 'valor': '10', 'motivo': 'benchmark'}
+    lista = [
+        ('dashboard', 'GET', lambda i: '/', None),
+        ('painel_totais', 'GET', lambda i: '/painel/totais', None),
+        ('painel_crpiv', 'GET', lambda i: '/painel/crpiv', None),
+        ('painel_unidades', 'GET', lambda i: '/painel/unidades', None),
+        ('painel_bimestres', 'GET', lambda i: '/painel/bimestres', None),
+        ('saldos_bimestre', 'GET', lambda i: '/saldos_bimestre', None),
+        ('transferir_saldo_get', 'GET', lambda i: '/transferir_saldo', None),
+        ('transferir_saldo_post', 'POST', lambda i: '/transferir_saldo', lambda i: dict(transferencia)),
+        ('autorizar_missao', 'GET', lambda i: f'/autorizar_missao/{missoes_previsao[i % len(missoes_previsao)]}', None),
+        ('importar_missoes', 'POST', lambda i: '/importar_missoes',
+         lambda i: {'arquivo': (dados_sinteticos.csv_missoes(linhas_importacao, semente=1000 + i), 'missoes.csv')}),
+        ('exportar_movimentacoes_csv', 'GET', lambda i: '/exportar_movimentacoes_csv', None),
+        ('exportar_movimentacoes_pdf', 'GET', lambda i: '/exportar_movimentacoes_pdf', None),
+    ]
+    for tipo in ('orcamento', 'missoes', 'movimentacoes'):
+        lista.append((f'exportar_pdf_{tipo}', 'GET', lambda i, t=tipo: f'/exportar_pdf?tipo={t}', None))
+        for formato in ('csv', 'xlsx', 'json'):
+            lista.append((f'exportar_relatorio_{tipo}_{formato}', 'GET',
+                          lambda i, t=tipo, f=formato: f'/exportar_relatorio/{t}?formato={f}', None))
+    return lista
+
+
+def medir(app, cliente, lista, repeticoes, com_cache):
+    import reports
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    contador = {'consultas': 0}
+
+    def contar(*args):
+        contador['consultas'] += 1
+
+    event.listen(Engine, 'before_cursor_execute', contar)
+    resultados = {}
+    try:
+        for nome, metodo, url, dados in lista:
+            tempos, consultas, status = [], [], set()
+            for i in range(repeticoes):
+                if not com_cache:
+                    with app.app_context():
+                        reports.report_cache.invalidar()
+                contador['consultas'] = 0
+                inicio = time.perf_counter()
+                resposta = cliente.open(url(i), method=metodo, data=dados(i) if dados else None,
+                                        content_type='multipart/form-data' if nome == 'importar_missoes' else None)
+                resposta.get_data()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(contador['consultas'])
+                status.add(resposta.status_code)
+
+            ordenados = sorted(tempos)
+            resultados[nome] = {
+                'metodo': metodo,
+                'url': url(0),
+                'status': sorted(status),
+                'primeira_ms': round(tempos[0], 2),
+                'mediana_ms': round(statistics.median(tempos), 2),
+                'p95_ms': round(ordenados[min(int(len(ordenados) * 0.95), len(ordenados) - 1)], 2),
+                'max_ms': round(ordenados[-1], 2),
+                'consultas_sql': max(consultas),
+            }
+            r = resultados[nome]
+            print(f"{nome:40s} {r['mediana_ms']:9.1f} ms (p95 {r['p95_ms']:9.1f})  {r['consultas_sql']:5d} consultas  {r['status']}")
+    finally:
+        event.remove(Engine, 'before_cursor_execute', contar)
+    return resultados
+
+
+def versao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=dados_sinteticos.RAIZ, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', type=int, default=3, help='anos de orçamentos bimestrais')
+    parser.add_argument('--missoes', type=int, default=20000)
+    parser.add_argument('--importacao', type=int, default=2000, help='linhas do CSV importado')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--com-cache', action='store_true', help='não invalida o cache de relatórios')
+    parser.add_argument('--json', dest='saida_json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = dados_sinteticos.criar_app(pasta)
+        from models import db, Missao
+
+        with app.app_context():
+            print(f"Populando {args.anos} anos, {args.missoes} missões (semente {args.semente})...")
+            linhas = dados_sinteticos.popular(db, args.anos, args.missoes, args.semente)
+            previsao = [m.id for m in Missao.query.filter_by(status='previsao')
+                        .order_by(Missao.valor).limit(args.repeticoes).all()]
+            db.session.remove()
+
+        cliente = app.test_client()
+        resultados = medir(app, cliente, casos(previsao, args.importacao), args.repeticoes, args.com_cache)
+
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'data': datetime.now().isoformat(timespec='seconds'),
+                'commit': versao_git(),
+                'python': platform.python_version(),
+                'parametros': vars(args),
+                'linhas': linhas,
+                'rotas': resultados,
+            }, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida_json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,68 @@
 import os
 
+from dotenv import load_dotenv
+
+import banco
+
+# O .env precisa ser lido antes de a classe Config avaliar as variáveis
+load_dotenv()
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'sua-chave-secreta-aqui'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///crpiv_orcamento.db'
+    SQLALCHEMY_DATABASE_URI = banco.normalizar_url(os.environ.get('DATABASE_URL')) or 'sqlite:///crpiv_orcamento.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool, pre-ping, reciclagem e timeout por instrução (MySQL/PostgreSQL); ver banco.py
+    SQLALCHEMY_ENGINE_OPTIONS = banco.opcoes_engine(SQLALCHEMY_DATABASE_URI)
+
+    # Bind de leitura para relatórios e exportações: réplica ou o próprio SQLite em modo somente leitura
+    DATABASE_URL_LEITURA = banco.normalizar_url(os.environ.get('DATABASE_URL_LEITURA'))
+    SQLITE_LEITURA_SEPARADA = os.environ.get('SQLITE_LEITURA_SEPARADA', '0') == '1'
+    SQLALCHEMY_BINDS = banco.binds_leitura(SQLALCHEMY_DATABASE_URI, DATABASE_URL_LEITURA, SQLITE_LEITURA_SEPARADA)
+    # Atraso máximo esperado da réplica: relatórios lidos dela logo após uma alteração não vão para o cache
+    REPLICA_ATRASO_MAX = float(os.environ.get('REPLICA_ATRASO_MAX', 10))
+
+    # Cache de relatórios (datasets e arquivos renderizados), compartilhado entre workers
+    REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR')  # padrão: instance/report_cache
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 12 * 3600))
+
+    # Paginação das listagens (missões, movimentações, recolhimentos)
+    ITENS_POR_PAGINA = int(os.environ.get('ITENS_POR_PAGINA', 50))
+    MAX_ITENS_POR_PAGINA = int(os.environ.get('MAX_ITENS_POR_PAGINA', 500))
+
+    # Eventos de saldo (SSE em /eventos_saldo)
+    SSE_INTERVALO = float(os.environ.get('SSE_INTERVALO', 2))  # consulta a novas movimentações (s)
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+    SSE_DURACAO_MAXIMA = float(os.environ.get('SSE_DURACAO_MAXIMA', 55))  # o navegador reconecta depois
+    SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+
+    # SQLite: pragmas aplicados em cada conexão e tentativas de iniciar escrita; ver banco.py
+    # O banco padrão (instance/crpiv_orcamento.db) é versionado: sem DATABASE_URL, o WAL só com SQLITE_WAL=1
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1' if os.environ.get('DATABASE_URL') else '0') != '0'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_TENTATIVAS_ESCRITA = int(os.environ.get('SQLITE_TENTATIVAS_ESCRITA', 5))
+
+    # Logs: nível (DEBUG, INFO, WARNING...) e formato (texto ou json); ver logs.py
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')  # padrão: INFO, ou DEBUG com o modo debug do Flask
+    LOG_FORMATO = os.environ.get('LOG_FORMATO', 'texto')
+
+    # Métricas por rota em /metrics (Prometheus); com METRICAS_TOKEN a coleta exige "Authorization: Bearer <token>"
+    METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', '1') != '0'
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+
+    # Rotas de diagnóstico (/consultas_lentas): sem ADMIN_TOKEN ficam desativadas
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # Consultas acima de CONSULTA_LENTA_MS vão para o log com o plano; 0 desliga
+    CONSULTA_LENTA_MS = float(os.environ.get('CONSULTA_LENTA_MS', 200))
+    CONSULTAS_LENTAS_MAX = int(os.environ.get('CONSULTAS_LENTAS_MAX', 100))  # ocorrências guardadas para /consultas_lentas
+    CONSULTA_LENTA_PLANO = os.environ.get('CONSULTA_LENTA_PLANO', '1') != '0'
+
+    # Perfil sob demanda (?perfil=texto|colapsado|pstats&token=<ADMIN_TOKEN>); ver perfil.py
+    PERFIL_ATIVO = os.environ.get('PERFIL_ATIVO', '0') == '1'
+
+    # Inicialização (create_app): cria as tabelas ausentes e, com gunicorn --preload,
+    # carrega pandas e ReportLab no processo mestre para os workers compartilharem
+    CRIAR_TABELAS = os.environ.get('CRIAR_TABELAS', '1') != '0'
+    PRECARREGAR_MODULOS = os.environ.get('PRECARREGAR_MODULOS', '0') == '1'
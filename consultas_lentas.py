@@ -0,0 +1,158 @@
+"""Registro de consultas lentas com o plano de execução.
+
+Cada consulta que passa de ``CONSULTA_LENTA_MS`` é registrada no log (nível
+WARNING) com os parâmetros, a rota e a função do projeto que a originou. Em
+SELECTs o plano é capturado na hora (``EXPLAIN QUERY PLAN`` no SQLite,
+``EXPLAIN`` no PostgreSQL e no MySQL) e varreduras completas das tabelas
+grandes (``TABELAS_MONITORADAS``) são sinalizadas.
+
+As últimas ``CONSULTAS_LENTAS_MAX`` ocorrências ficam em memória (por
+processo) e são listadas em ``/consultas_lentas`` para administradores. Com
+``CONSULTA_LENTA_MS=0`` o módulo nem se inscreve em ``cronometro_sql``.
+"""
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+
+from flask import has_request_context, request
+
+import cronometro_sql
+
+
+logger = logging.getLogger(__name__)
+
+TABELAS_MONITORADAS = ('missao', 'distribuicao', 'movimentacao_orcamentaria')
+
+_DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+# Quadros do próprio registro, que nunca são a origem da consulta
+_ARQUIVOS_DO_REGISTRO = {os.path.abspath(__file__), os.path.abspath(cronometro_sql.__file__)}
+_TAMANHO_MAXIMO_SQL = 4000
+_TAMANHO_MAXIMO_PARAMETROS = 1000
+
+# Tabela monitorada (ou alias gerado pelo SQLAlchemy, ex.: missao_1) lida por inteiro
+_NOMES = '|'.join(TABELAS_MONITORADAS)
+_VARREDURA_SQLITE = re.compile(rf'\bSCAN (?:TABLE )?({_NOMES})(?:_\d+)?\b')
+_VARREDURA_POSTGRESQL = re.compile(rf'\bSeq Scan on ({_NOMES})\b')
+
+
+class RegistroConsultasLentas:
+    """Buffer circular das consultas lentas deste processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limite_ms = 200.0
+        self.capturar_plano = True
+        self.ocorrencias = collections.deque(maxlen=100)
+        self.total = 0
+
+    def configurar(self, limite_ms, maximo, capturar_plano):
+        with self._lock:
+            self.limite_ms = float(limite_ms)
+            self.capturar_plano = capturar_plano
+            self.ocorrencias = collections.deque(self.ocorrencias, maxlen=max(int(maximo), 1))
+
+    def adicionar(self, ocorrencia):
+        with self._lock:
+            self.ocorrencias.append(ocorrencia)
+            self.total += 1
+
+    def listar(self):
+        with self._lock:
+            return list(reversed(self.ocorrencias))
+
+
+registro = RegistroConsultasLentas()
+
+
+def _origem():
+    """Primeira função do projeto na pilha (fora do registro e das bibliotecas)"""
+    quadro = sys._getframe(2)
+    while quadro is not None:
+        arquivo = os.path.abspath(quadro.f_code.co_filename)
+        if (arquivo.startswith(_DIRETORIO_PROJETO) and arquivo not in _ARQUIVOS_DO_REGISTRO
+                and 'site-packages' not in arquivo):
+            return f'{os.path.relpath(arquivo, _DIRETORIO_PROJETO)}:{quadro.f_lineno} {quadro.f_code.co_name}'
+        quadro = quadro.f_back
+    return None
+
+
+def _resumir(valor, limite):
+    texto = valor if isinstance(valor, str) else repr(valor)
+    return texto if len(texto) <= limite else texto[:limite] + '…'
+
+
+def _capturar_plano(conexao, instrucao, parametros):
+    """(linhas do plano, tabelas varridas por inteiro) de um SELECT"""
+    if not instrucao.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None, []
+    dialeto = conexao.dialect.name
+    prefixo = 'EXPLAIN QUERY PLAN ' if dialeto == 'sqlite' else 'EXPLAIN '
+    # Cursor do driver: a consulta do plano não passa pelos eventos do SQLAlchemy
+    cursor = conexao.connection.cursor()
+    try:
+        cursor.execute(prefixo + instrucao, parametros)
+        linhas = cursor.fetchall()
+        colunas = [coluna[0] for coluna in cursor.description or ()]
+    finally:
+        cursor.close()
+
+    if dialeto == 'sqlite':
+        plano = [linha[-1] for linha in linhas]
+        varridas = [m.group(1) for m in map(_VARREDURA_SQLITE.search, plano) if m]
+    elif dialeto == 'postgresql':
+        plano = [linha[0] for linha in linhas]
+        varridas = [m.group(1) for m in map(_VARREDURA_POSTGRESQL.search, plano) if m]
+    else:
+        # MySQL/MariaDB: uma linha por tabela; type=ALL é leitura completa
+        registros = [dict(zip(colunas, linha)) for linha in linhas]
+        plano = [', '.join(f'{chave}={valor}' for chave, valor in r.items() if valor is not None) for r in registros]
+        varridas = [r.get('table') for r in registros
+                    if r.get('type') == 'ALL' and re.sub(r'_\d+$', '', str(r.get('table'))) in TABELAS_MONITORADAS]
+    return plano, sorted(set(varridas))
+
+
+def _verificar_consulta(conexao, instrucao, parametros, executemany, duracao):
+    duracao_ms = duracao * 1000
+    if not registro.limite_ms or duracao_ms < registro.limite_ms:
+        return
+
+    ocorrencia = {
+        'quando': datetime.now().isoformat(timespec='seconds'),
+        'duracao_ms': round(duracao_ms, 1),
+        'sql': _resumir(instrucao, _TAMANHO_MAXIMO_SQL),
+        'parametros': _resumir(parametros, _TAMANHO_MAXIMO_PARAMETROS),
+        'rota': f'{request.method} {request.full_path.rstrip("?")}' if has_request_context() else None,
+        'endpoint': request.endpoint if has_request_context() else None,
+        'origem': _origem(),
+        'plano': None,
+        'varreduras_completas': [],
+    }
+    if registro.capturar_plano and not executemany:
+        try:
+            ocorrencia['plano'], ocorrencia['varreduras_completas'] = _capturar_plano(conexao, instrucao, parametros)
+        except Exception as e:
+            ocorrencia['plano'] = [f'plano indisponível: {e}']
+
+    registro.adicionar(ocorrencia)
+    varreduras = ocorrencia['varreduras_completas']
+    logger.warning('Consulta lenta (%.1f ms) em %s [%s]%s: %s | parâmetros: %s | plano: %s',
+                   duracao_ms, ocorrencia['rota'] or '-', ocorrencia['origem'] or '-',
+                   f" | varredura completa de {', '.join(varreduras)}" if varreduras else '',
+                   ocorrencia['sql'], ocorrencia['parametros'],
+                   ' / '.join(map(str, ocorrencia['plano'] or ['-'])))
+
+
+def init_app(app):
+    registro.configurar(
+        app.config.get('CONSULTA_LENTA_MS', 200),
+        app.config.get('CONSULTAS_LENTAS_MAX', 100),
+        app.config.get('CONSULTA_LENTA_PLANO', True),
+    )
+    if not registro.limite_ms:
+        return
+
+    cronometro_sql.inscrever(_verificar_consulta)
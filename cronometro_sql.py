@@ -0,0 +1,42 @@
+"""Cronômetro único das consultas SQL.
+
+Um só par ``before/after_cursor_execute`` (global, para todos os engines) mede
+cada consulta e entrega a duração aos consumidores inscritos: métricas por
+rota, log de consultas lentas e perfil sob demanda. Assim cada consulta paga
+dois ``perf_counter`` e uma escrita em ``conexao.info``, quantos forem os
+consumidores ligados. Sem nenhum inscrito os eventos nem são registrados.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Tupla: a leitura por consulta não precisa de lock e a inscrição a substitui
+_consumidores = ()
+
+
+def inscrever(consumidor):
+    """Chama ``consumidor(conexao, instrucao, parametros, executemany, duracao)``
+    ao fim de cada consulta, com ``duracao`` em segundos"""
+    global _consumidores
+    if consumidor not in _consumidores:
+        _consumidores = _consumidores + (consumidor,)
+
+    # Os ouvintes são globais; uma segunda app no mesmo processo não os duplica
+    if not event.contains(Engine, 'before_cursor_execute', _antes_da_consulta):
+        event.listen(Engine, 'before_cursor_execute', _antes_da_consulta)
+        event.listen(Engine, 'after_cursor_execute', _depois_da_consulta)
+
+
+def _antes_da_consulta(conexao, cursor, instrucao, parametros, contexto, executemany):
+    conexao.info['inicio_consulta'] = time.perf_counter()
+
+
+def _depois_da_consulta(conexao, cursor, instrucao, parametros, contexto, executemany):
+    inicio = conexao.info.pop('inicio_consulta', None)
+    if inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    for consumidor in _consumidores:
+        consumidor(conexao, instrucao, parametros, executemany, duracao)
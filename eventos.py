@@ -0,0 +1,232 @@
+"""Eventos de saldo em tempo real (Server-Sent Events).
+
+Cada MovimentacaoOrcamentaria gravada vira um evento compacto com a variação
+de saldo disponível que ela provoca em cada unidade. O id do evento é o id da
+movimentação, então o navegador retoma de onde parou ao reconectar
+(cabeçalho ``Last-Event-ID``) e qualquer worker consegue atender o fluxo:
+a fonte da verdade é a própria tabela de movimentações.
+
+Dentro de um mesmo processo, o commit que grava uma movimentação acorda os
+fluxos abertos na hora; entre processos a tabela é consultada a cada
+``SSE_INTERVALO`` segundos.
+
+No SQLite só há um escritor e os ids chegam em ordem. No PostgreSQL e no
+MySQL, transações concorrentes podem confirmar um id menor depois de um
+maior já enviado. Por isso o cursor do fluxo é o último id mais as lacunas
+abaixo dele ainda pendentes (``"120:117,118"``). As lacunas são relidas a
+cada consulta por até ``JANELA_LACUNAS`` segundos. Uma lacuna que não se
+fecha nesse prazo pode ser um rollback ou uma transação lenta; o fluxo
+manda ``sincronizar`` e a página recarrega os saldos.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, MovimentacaoOrcamentaria
+
+
+_novas_movimentacoes = threading.Condition()
+
+# Movimentações que tiram de uma unidade e entregam a outra
+TIPOS_TRANSFERENCIA = ('transferencia_entre_unidades', 'distribuicao',
+                       'nova_distribuicao_crpiv', 'recolhimento')
+# Movimentações que consomem o saldo da unidade de origem
+TIPOS_CONSUMO = ('autorizacao_missao', 'autorizacao_com_transferencia')
+
+# Eventos perdidos acima deste limite viram um único pedido de sincronização
+MAX_EVENTOS_PENDENTES = 200
+
+# Tempo (s) em que um id ausente abaixo do cursor ainda pode ser confirmado
+JANELA_LACUNAS = 30
+
+
+def deltas_movimentacao(mov):
+    """Variação do saldo disponível por unidade: {unidade: valor}.
+
+    Segue as mesmas regras da tela de transferência: subunidades têm
+    distribuído - autorizado; o CRPIV tem orçado + complementado - distribuído
+    (missões pagas pelo CRPIV não alteram esse saldo). Devolve None quando a
+    movimentação não permite calcular a variação e a página deve recarregar
+    os saldos.
+    """
+    valor = float(mov.valor or 0)
+    if not valor or not mov.tipo_orcamento:
+        return None
+
+    deltas = {}
+
+    def somar(unidade, variacao):
+        if unidade and unidade != 'Sistema':
+            deltas[unidade] = round(deltas.get(unidade, 0) + variacao, 2)
+
+    if mov.tipo in TIPOS_TRANSFERENCIA:
+        if mov.unidade_destino == 'CRPIV' and mov.tipo != 'recolhimento':
+            # Distribuição para o próprio CRPIV: vinda do orçamento, aumenta o total
+            # distribuído; vinda de uma subunidade, só troca de distribuição
+            if mov.unidade_origem in (None, 'Sistema', 'CRPIV'):
+                somar('CRPIV', -valor)
+            else:
+                somar(mov.unidade_origem, -valor)
+        else:
+            somar(mov.unidade_origem, -valor)
+            somar(mov.unidade_destino, valor)
+    elif mov.tipo in TIPOS_CONSUMO:
+        if mov.unidade_origem != 'CRPIV':
+            somar(mov.unidade_origem, -valor)
+    elif mov.tipo == 'complementacao_orcamento':
+        somar('CRPIV', valor)
+    else:
+        return None
+
+    return deltas
+
+
+def serializar_evento(mov, cursor):
+    dados = {
+        'id': mov.id,
+        'tipo': mov.tipo,
+        'tipo_orcamento': mov.tipo_orcamento,
+        'valor': float(mov.valor or 0),
+        'deltas': deltas_movimentacao(mov),
+        'data': mov.data_movimentacao.isoformat() if mov.data_movimentacao else None,
+    }
+    return f"id: {cursor}\nevent: saldo\ndata: {json.dumps(dados, separators=(',', ':'))}\n\n"
+
+
+def ultimo_id():
+    return db.session.query(db.func.max(MovimentacaoOrcamentaria.id)).scalar() or 0
+
+
+def formatar_cursor(ultimo, pendentes):
+    if not pendentes:
+        return str(ultimo)
+    return f"{ultimo}:{','.join(str(i) for i in sorted(pendentes))}"
+
+
+def ler_cursor(texto):
+    """(último id, ids pendentes) de um cursor, ou None se for inválido"""
+    try:
+        ultimo, _, pendentes = (texto or '').partition(':')
+        return int(ultimo), {int(i) for i in pendentes.split(',') if i}
+    except ValueError:
+        return None
+
+
+def cursor_atual():
+    """Cursor do estado já confirmado: o último id e as lacunas recentes abaixo dele.
+
+    Uma lacuna conta como pendente só se a movimentação logo acima dela tem
+    menos de ``JANELA_LACUNAS`` segundos; lacunas antigas são rollbacks.
+    """
+    # Uma consulta só: as últimas linhas por id, a mais antiga serve de limite de baixo
+    linhas = (db.session.query(MovimentacaoOrcamentaria.id, MovimentacaoOrcamentaria.data_movimentacao)
+              .order_by(MovimentacaoOrcamentaria.id.desc())
+              .limit(MAX_EVENTOS_PENDENTES + 1)
+              .all())
+    if not linhas:
+        return formatar_cursor(0, ())
+    if len(linhas) <= MAX_EVENTOS_PENDENTES:
+        linhas.append((0, None))
+    limite = datetime.utcnow() - timedelta(seconds=JANELA_LACUNAS)
+    pendentes = set()
+    for (id_, quando), (abaixo, _) in zip(linhas, linhas[1:]):
+        if quando < limite:
+            break
+        pendentes.update(range(abaixo + 1, id_))
+    return formatar_cursor(linhas[0][0], pendentes)
+
+
+def _novas_desde(ultimo, limite):
+    return (MovimentacaoOrcamentaria.query
+            .filter(MovimentacaoOrcamentaria.id > ultimo)
+            .order_by(MovimentacaoOrcamentaria.id)
+            .limit(limite)
+            .all())
+
+
+def _confirmadas(ids):
+    return (MovimentacaoOrcamentaria.query
+            .filter(MovimentacaoOrcamentaria.id.in_(ids))
+            .order_by(MovimentacaoOrcamentaria.id)
+            .all())
+
+
+def fluxo_eventos(cursor=None, intervalo=2.0, heartbeat=15.0, duracao_maxima=55.0, retry_ms=3000):
+    """Gerador do corpo text/event-stream.
+
+    ``cursor`` é o id do último evento recebido pelo cliente (ver
+    ``ler_cursor``); sem ele o fluxo começa a partir de agora. O fluxo se
+    encerra após ``duracao_maxima`` segundos para não prender um worker
+    síncrono: o navegador reconecta sozinho após ``retry_ms`` e continua do
+    ``Last-Event-ID``.
+    """
+    inicio = time.monotonic()
+    ultimo_envio = inicio
+    yield f"retry: {retry_ms}\n\n"
+
+    try:
+        lido = ler_cursor(cursor) if cursor else None
+        if lido is None:
+            lido = ler_cursor(cursor_atual())
+        ultimo, pendentes = lido
+        if ultimo_id() - ultimo > MAX_EVENTOS_PENDENTES:
+            ultimo, pendentes = ler_cursor(cursor_atual())
+            yield f"id: {formatar_cursor(ultimo, pendentes)}\nevent: sincronizar\ndata: {{}}\n\n"
+        # Lacunas recebidas no cursor valem por uma janela inteira a partir de agora
+        expiracao = {id_: inicio + JANELA_LACUNAS for id_ in pendentes}
+        db.session.remove()
+
+        while time.monotonic() - inicio < duracao_maxima:
+            agora = time.monotonic()
+            eventos = []
+            # Ids menores confirmados depois de um maior já enviado
+            for mov in _confirmadas(list(expiracao)) if expiracao else ():
+                del expiracao[mov.id]
+                eventos.append(serializar_evento(mov, formatar_cursor(ultimo, expiracao)))
+            for mov in _novas_desde(ultimo, MAX_EVENTOS_PENDENTES):
+                for id_ in range(ultimo + 1, mov.id):
+                    expiracao[id_] = agora + JANELA_LACUNAS
+                ultimo = mov.id
+                eventos.append(serializar_evento(mov, formatar_cursor(ultimo, expiracao)))
+            expiradas = [id_ for id_, limite in expiracao.items() if limite <= agora]
+            # Não segurar uma conexão do pool enquanto espera
+            db.session.remove()
+
+            if expiradas or len(expiracao) > MAX_EVENTOS_PENDENTES:
+                # Rollback ou transação lenta: só a recarga completa garante o saldo
+                expiracao.clear()
+                eventos.append(f"id: {ultimo}\nevent: sincronizar\ndata: {{}}\n\n")
+
+            if eventos:
+                yield ''.join(eventos)
+                ultimo_envio = time.monotonic()
+            elif time.monotonic() - ultimo_envio >= heartbeat:
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+
+            with _novas_movimentacoes:
+                _novas_movimentacoes.wait(intervalo)
+    finally:
+        db.session.remove()
+
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_movimentacao(session, flush_context):
+    if any(isinstance(obj, MovimentacaoOrcamentaria) for obj in session.new):
+        session.info['movimentacao_nova'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _avisar_fluxos(session):
+    if session.info.pop('movimentacao_nova', False):
+        with _novas_movimentacoes:
+            _novas_movimentacoes.notify_all()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_movimentacao(session):
+    session.info.pop('movimentacao_nova', None)
@@ -0,0 +1,83 @@
+"""Configuração de logs da aplicação.
+
+Cada módulo usa ``logging.getLogger(__name__)`` com formatação preguiçosa
+(``logger.debug('Saldo de %s: %s', unidade, valor)``), então mensagens de
+depuração não custam nada quando o nível está acima de DEBUG.
+
+Toda linha registrada durante uma requisição carrega o id de correlação
+``request_id``: o valor do cabeçalho ``X-Request-ID`` recebido (quando houver)
+ou um id novo, devolvido no mesmo cabeçalho da resposta.
+
+Configuração: ``LOG_LEVEL`` (padrão INFO; DEBUG com ``app.debug``) e
+``LOG_FORMATO`` (``texto`` ou ``json``, uma linha por registro).
+"""
+import contextvars
+import json
+import logging
+import re
+import uuid
+from datetime import datetime, timezone
+
+from flask import request
+
+
+_id_requisicao = contextvars.ContextVar('id_requisicao', default='-')
+_ID_VALIDO = re.compile(r'^[\w.\-]{1,64}$')
+
+FORMATO_TEXTO = '%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s'
+
+
+def id_requisicao():
+    return _id_requisicao.get()
+
+
+class FiltroRequisicao(logging.Filter):
+    """Acrescenta o id de correlação a cada registro"""
+
+    def filter(self, registro):
+        registro.request_id = _id_requisicao.get()
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, registro):
+        dados = {
+            'ts': datetime.fromtimestamp(registro.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': registro.levelname,
+            'logger': registro.name,
+            'request_id': getattr(registro, 'request_id', '-'),
+            'msg': registro.getMessage(),
+        }
+        if registro.exc_info:
+            dados['exc'] = self.formatException(registro.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def init_app(app):
+    nivel = app.config.get('LOG_LEVEL') or ('DEBUG' if app.debug else 'INFO')
+
+    handler = logging.StreamHandler()
+    handler.addFilter(FiltroRequisicao())
+    if app.config.get('LOG_FORMATO') == 'json':
+        handler.setFormatter(FormatadorJSON())
+    else:
+        handler.setFormatter(logging.Formatter(FORMATO_TEXTO))
+
+    raiz = logging.getLogger()
+    # Evita handlers duplicados se a aplicação for configurada mais de uma vez
+    for existente in list(raiz.handlers):
+        if getattr(existente, '_crpiv', False):
+            raiz.removeHandler(existente)
+    handler._crpiv = True
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel.upper())
+
+    @app.before_request
+    def _definir_id_requisicao():
+        recebido = request.headers.get('X-Request-ID', '')
+        _id_requisicao.set(recebido if _ID_VALIDO.match(recebido) else uuid.uuid4().hex[:12])
+
+    @app.after_request
+    def _devolver_id_requisicao(resposta):
+        resposta.headers['X-Request-ID'] = _id_requisicao.get()
+        return resposta
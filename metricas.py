@@ -0,0 +1,181 @@
+"""Métricas por rota: latência, quantidade de consultas SQL e tempo em SQL.
+
+O cronômetro de ``cronometro_sql`` (inscrito só com ``METRICAS_ATIVAS``) soma
+as consultas da requisição atual; ao fim da requisição os valores entram nos
+histogramas da rota (``request.endpoint``). ``exportar`` gera o formato texto
+do Prometheus, servido em ``/metrics``.
+
+O custo por requisição é o de dois ``perf_counter`` por consulta e uma
+atualização de contadores sob lock, então as métricas podem ficar ligadas em
+produção. Os valores são por processo: com vários workers do gunicorn cada
+coleta vê o worker que atendeu a requisição.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from flask import g, request
+
+import cronometro_sql
+
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_medicao = contextvars.ContextVar('medicao_sql', default=None)
+
+
+class MedicaoSQL:
+    """Consultas e tempo em SQL da requisição atual"""
+    __slots__ = ('consultas', 'segundos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+
+def iniciar_medicao():
+    medicao = MedicaoSQL()
+    _medicao.set(medicao)
+    return medicao
+
+
+def medicao_atual():
+    return _medicao.get()
+
+
+def _contar_consulta(conexao, instrucao, parametros, executemany, duracao):
+    medicao = _medicao.get()
+    if medicao is not None:
+        medicao.consultas += 1
+        medicao.segundos += duracao
+
+
+class Histograma:
+    __slots__ = ('buckets', 'contagens', 'soma', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.buckets, valor)
+        if indice < len(self.buckets):
+            self.contagens[indice] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, quantidade in zip(self.buckets, self.contagens):
+            acumulado += quantidade
+            yield f'{nome}_bucket{_rotulos({**rotulos, "le": _numero(limite)})} {acumulado}'
+        yield f'{nome}_bucket{_rotulos({**rotulos, "le": "+Inf"})} {self.total}'
+        yield f'{nome}_sum{_rotulos(rotulos)} {_numero(self.soma)}'
+        yield f'{nome}_count{_rotulos(rotulos)} {self.total}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _rotulos(rotulos):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{chave}="{escapar(valor)}"' for chave, valor in rotulos.items()) + '}'
+
+
+class RegistroMetricas:
+    """Contadores e histogramas por rota (por processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.latencia = {}       # (endpoint, metodo) -> Histograma
+            self.requisicoes = {}    # (endpoint, metodo, status) -> int
+            self.consultas = {}      # endpoint -> Histograma de consultas por requisição
+            self.sql_segundos = {}   # endpoint -> float
+
+    def registrar(self, endpoint, metodo, status, duracao, consultas, sql_segundos):
+        with self._lock:
+            chave = (endpoint, metodo)
+            if chave not in self.latencia:
+                self.latencia[chave] = Histograma(BUCKETS_LATENCIA)
+            self.latencia[chave].observar(duracao)
+
+            chave = (endpoint, metodo, status)
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+
+            if endpoint not in self.consultas:
+                self.consultas[endpoint] = Histograma(BUCKETS_CONSULTAS)
+            self.consultas[endpoint].observar(consultas)
+            self.sql_segundos[endpoint] = self.sql_segundos.get(endpoint, 0.0) + sql_segundos
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        linhas = []
+        with self._lock:
+            linhas += ['# HELP crpiv_requisicao_segundos Latência das requisições por rota',
+                       '# TYPE crpiv_requisicao_segundos histogram']
+            for (endpoint, metodo), histograma in sorted(self.latencia.items()):
+                linhas += histograma.linhas('crpiv_requisicao_segundos', {'endpoint': endpoint, 'metodo': metodo})
+
+            linhas += ['# HELP crpiv_requisicoes_total Requisições atendidas por rota e status',
+                       '# TYPE crpiv_requisicoes_total counter']
+            for (endpoint, metodo, status), total in sorted(self.requisicoes.items()):
+                linhas.append(f'crpiv_requisicoes_total'
+                              f'{_rotulos({"endpoint": endpoint, "metodo": metodo, "status": status})} {total}')
+
+            linhas += ['# HELP crpiv_sql_consultas_por_requisicao Consultas SQL executadas por requisição',
+                       '# TYPE crpiv_sql_consultas_por_requisicao histogram']
+            for endpoint, histograma in sorted(self.consultas.items()):
+                linhas += histograma.linhas('crpiv_sql_consultas_por_requisicao', {'endpoint': endpoint})
+
+            linhas += ['# HELP crpiv_sql_segundos_total Tempo gasto em consultas SQL por rota',
+                       '# TYPE crpiv_sql_segundos_total counter']
+            for endpoint, segundos in sorted(self.sql_segundos.items()):
+                linhas.append(f'crpiv_sql_segundos_total{_rotulos({"endpoint": endpoint})} {_numero(segundos)}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro = RegistroMetricas()
+
+
+def _encerrar(status):
+    inicio = g.pop('_metricas_inicio', None)
+    if inicio is None:
+        return
+    medicao = _medicao.get() or MedicaoSQL()
+    # Rotas inexistentes ficam num único rótulo para não multiplicar as séries
+    endpoint = request.endpoint or 'nao_encontrado'
+    registro.registrar(endpoint, request.method, status, time.perf_counter() - inicio,
+                       medicao.consultas, medicao.segundos)
+    _medicao.set(None)
+
+
+def init_app(app):
+    if not app.config.get('METRICAS_ATIVAS', True):
+        return
+
+    cronometro_sql.inscrever(_contar_consulta)
+
+    @app.before_request
+    def _iniciar_metricas():
+        g._metricas_inicio = time.perf_counter()
+        iniciar_medicao()
+
+    @app.after_request
+    def _registrar_metricas(resposta):
+        _encerrar(str(resposta.status_code))
+        return resposta
+
+    @app.teardown_request
+    def _registrar_falha(erro=None):
+        # after_request não roda quando a view levanta exceção
+        _encerrar('500')
@@ -0,0 +1,130 @@
+"""esquema base
+
+Revision ID: 0c7d4e9a2b58
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c7d4e9a2b58'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def tabelas():
+    """Tabelas como eram antes das migrações (sem os índices das versões seguintes)"""
+    return [
+        ('orcamento', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('bimestre', sa.String(length=20), nullable=False),
+            sa.Column('ano', sa.Integer(), nullable=False),
+            sa.Column('data_inicio', sa.Date(), nullable=False),
+            sa.Column('data_fim', sa.Date(), nullable=False),
+            sa.Column('diarias', sa.Float(), nullable=True),
+            sa.Column('derso', sa.Float(), nullable=True),
+            sa.Column('diarias_pav', sa.Float(), nullable=True),
+            sa.Column('derso_pav', sa.Float(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('data_criacao', sa.DateTime(), nullable=True),
+            sa.Column('data_finalizacao', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('missao', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('fonte_dinheiro', sa.String(length=20), nullable=False),
+            sa.Column('opm_destino', sa.String(length=20), nullable=False),
+            sa.Column('processo_sei', sa.String(length=50), nullable=False),
+            sa.Column('descricao', sa.Text(), nullable=False),
+            sa.Column('periodo', sa.String(length=50), nullable=False),
+            sa.Column('mes', sa.String(length=20), nullable=False),
+            sa.Column('tipo', sa.String(length=20), nullable=False),
+            sa.Column('valor', sa.Float(), nullable=False),
+            sa.Column('numero_autorizacao', sa.String(length=50), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('data_criacao', sa.DateTime(), nullable=True),
+            sa.Column('data_autorizacao', sa.DateTime(), nullable=True),
+            sa.Column('observacoes', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('recolhimento_saldo', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('orcamento_id', sa.Integer(), nullable=False),
+            sa.Column('unidade_origem', sa.String(length=50), nullable=False),
+            sa.Column('unidade_destino', sa.String(length=50), nullable=True),
+            sa.Column('tipo_orcamento', sa.String(length=50), nullable=False),
+            sa.Column('valor_recolhido', sa.Numeric(precision=10, scale=2), nullable=False),
+            sa.Column('motivo', sa.Text(), nullable=True),
+            sa.Column('usuario_responsavel', sa.String(length=100), nullable=True),
+            sa.Column('data_recolhimento', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['orcamento_id'], ['orcamento.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('complementacao_orcamento', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('orcamento_id', sa.Integer(), nullable=False),
+            sa.Column('processo_sei', sa.String(length=50), nullable=False),
+            sa.Column('tipo_orcamento', sa.String(length=20), nullable=False),
+            sa.Column('valor', sa.Float(), nullable=False),
+            sa.Column('descricao', sa.Text(), nullable=True),
+            sa.Column('data_criacao', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['orcamento_id'], ['orcamento.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('distribuicao', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('orcamento_id', sa.Integer(), nullable=False),
+            sa.Column('unidade', sa.String(length=20), nullable=False),
+            sa.Column('tipo_orcamento', sa.String(length=20), nullable=False),
+            sa.Column('valor', sa.Float(), nullable=False),
+            sa.Column('data_distribuicao', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['orcamento_id'], ['orcamento.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('movimentacao_orcamentaria', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('data_movimentacao', sa.DateTime(), nullable=True),
+            sa.Column('tipo', sa.String(length=50), nullable=False),
+            sa.Column('descricao', sa.Text(), nullable=True),
+            sa.Column('unidade_origem', sa.String(length=50), nullable=True),
+            sa.Column('unidade_destino', sa.String(length=50), nullable=True),
+            sa.Column('tipo_orcamento', sa.String(length=50), nullable=True),
+            sa.Column('valor', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('usuario', sa.String(length=100), nullable=True),
+            sa.Column('orcamento_id', sa.Integer(), nullable=True),
+            sa.Column('missao_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['missao_id'], ['missao.id']),
+            sa.ForeignKeyConstraint(['orcamento_id'], ['orcamento.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+        ('resolucao_sem_saldo', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('data_resolucao', sa.DateTime(), nullable=True),
+            sa.Column('missao_id', sa.Integer(), nullable=False),
+            sa.Column('tipo_resolucao', sa.String(length=50), nullable=True),
+            sa.Column('valor_necessario', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('unidade_origem_transferencia', sa.String(length=50), nullable=True),
+            sa.Column('valor_transferido', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('observacoes', sa.Text(), nullable=True),
+            sa.Column('usuario_responsavel', sa.String(length=100), nullable=True),
+            sa.ForeignKeyConstraint(['missao_id'], ['missao.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ]),
+    ]
+
+
+def upgrade():
+    # Bancos criados antes das migrações (ou por db.create_all()) já têm as tabelas
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+    for nome, colunas in tabelas():
+        if nome not in existentes:
+            op.create_table(nome, *colunas)
+
+
+def downgrade():
+    for nome, _ in reversed(tabelas()):
+        op.drop_table(nome)
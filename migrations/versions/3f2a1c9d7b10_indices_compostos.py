@@ -0,0 +1,49 @@
+"""índices compostos para os filtros mais usados
+
+Revision ID: 3f2a1c9d7b10
+Revises: 0c7d4e9a2b58
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a1c9d7b10'
+down_revision = '0c7d4e9a2b58'
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas) — mantidos em sincronia com os __table_args__ de models.py
+INDICES = [
+    ('ix_missao_fonte_tipo_status', 'missao',
+     ['fonte_dinheiro', 'tipo', 'status', 'valor']),
+    ('ix_missao_data_criacao', 'missao',
+     ['data_criacao', 'id']),
+    ('ix_distribuicao_unidade_tipo_orcamento', 'distribuicao',
+     ['unidade', 'tipo_orcamento', 'orcamento_id', 'valor']),
+    ('ix_complementacao_orcamento_tipo', 'complementacao_orcamento',
+     ['orcamento_id', 'tipo_orcamento', 'valor']),
+    ('ix_movimentacao_data_tipo_unidades', 'movimentacao_orcamentaria',
+     ['data_movimentacao', 'tipo', 'unidade_origem', 'unidade_destino']),
+]
+
+
+def indices_existentes(tabela):
+    # IF [NOT] EXISTS em índices não existe no MySQL; consulta o inspetor
+    return {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes(tabela)}
+
+
+def upgrade():
+    # Bancos criados por db.create_all() após esta versão já possuem os índices
+    for nome, tabela, colunas in INDICES:
+        if nome not in indices_existentes(tabela):
+            op.create_index(nome, tabela, colunas, unique=False)
+
+
+def downgrade():
+    for nome, tabela, _ in reversed(INDICES):
+        if nome in indices_existentes(tabela):
+            op.drop_index(nome, table_name=tabela)
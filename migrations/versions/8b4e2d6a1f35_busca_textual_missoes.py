@@ -0,0 +1,88 @@
+"""busca textual de missões
+
+Revision ID: 8b4e2d6a1f35
+Revises: 3f2a1c9d7b10
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2d6a1f35'
+down_revision = '3f2a1c9d7b10'
+branch_labels = None
+depends_on = None
+
+
+# DDL copiado de search.py nesta versão; a migração não importa o código da
+# aplicação para que mudanças futuras em search.py não alterem o que ela faz
+DDL_SQLITE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS missao_fts USING fts5(
+        descricao, observacoes, processo_sei,
+        content='missao', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS missao_fts_ai AFTER INSERT ON missao BEGIN
+        INSERT INTO missao_fts(rowid, descricao, observacoes, processo_sei)
+        VALUES (new.id, new.descricao, new.observacoes, new.processo_sei);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS missao_fts_ad AFTER DELETE ON missao BEGIN
+        INSERT INTO missao_fts(missao_fts, rowid, descricao, observacoes, processo_sei)
+        VALUES ('delete', old.id, old.descricao, old.observacoes, old.processo_sei);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS missao_fts_au AFTER UPDATE OF descricao, observacoes, processo_sei ON missao BEGIN
+        INSERT INTO missao_fts(missao_fts, rowid, descricao, observacoes, processo_sei)
+        VALUES ('delete', old.id, old.descricao, old.observacoes, old.processo_sei);
+        INSERT INTO missao_fts(rowid, descricao, observacoes, processo_sei)
+        VALUES (new.id, new.descricao, new.observacoes, new.processo_sei);
+    END""",
+    # Indexa as missões que já existem
+    "INSERT INTO missao_fts(missao_fts) VALUES ('rebuild')",
+]
+
+DROP_SQLITE = [
+    "DROP TRIGGER IF EXISTS missao_fts_au",
+    "DROP TRIGGER IF EXISTS missao_fts_ad",
+    "DROP TRIGGER IF EXISTS missao_fts_ai",
+    "DROP TABLE IF EXISTS missao_fts",
+]
+
+INDICE_POSTGRESQL = (
+    "CREATE INDEX IF NOT EXISTS ix_missao_busca ON missao USING gin (to_tsvector('portuguese', "
+    "coalesce(descricao, '') || ' ' || coalesce(observacoes, '') || ' ' || coalesce(processo_sei, '')))"
+)
+
+INDICE_MYSQL = "CREATE FULLTEXT INDEX ix_missao_busca ON missao (descricao, observacoes, processo_sei)"
+
+
+def indice_existe():
+    # IF [NOT] EXISTS em índices não existe no MySQL; consulta o inspetor
+    return any(indice['name'] == 'ix_missao_busca'
+               for indice in sa.inspect(op.get_bind()).get_indexes('missao'))
+
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        for comando in DDL_SQLITE:
+            op.execute(comando)
+    elif dialeto == 'postgresql':
+        op.execute(INDICE_POSTGRESQL)
+    elif dialeto in ('mysql', 'mariadb'):
+        # Bancos criados por db.create_all() já nascem com o índice
+        if not indice_existe():
+            op.execute(INDICE_MYSQL)
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        for comando in DROP_SQLITE:
+            op.execute(comando)
+    elif dialeto == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_missao_busca")
+    elif dialeto in ('mysql', 'mariadb'):
+        if indice_existe():
+            op.execute("DROP INDEX ix_missao_busca ON missao")
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from banco import SessaoRoteada
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 
 class Orcamento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -49,6 +51,11 @@ class ComplementacaoOrcamento(db.Model):
     
     orcamento = db.relationship('Orcamento', backref='complementacoes')
 
+    __table_args__ = (
+        # Somas de complementações por orçamento/tipo (valor incluso para cobrir a consulta)
+        db.Index('ix_complementacao_orcamento_tipo', 'orcamento_id', 'tipo_orcamento', 'valor'),
+    )
+
 class Distribuicao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     orcamento_id = db.Column(db.Integer, db.ForeignKey('orcamento.id'), nullable=False)
@@ -57,6 +64,11 @@ class Distribuicao(db.Model):
     valor = db.Column(db.Float, nullable=False)
     data_distribuicao = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Saldos por unidade/tipo (e por orçamento), respondidos só pelo índice
+        db.Index('ix_distribuicao_unidade_tipo_orcamento', 'unidade', 'tipo_orcamento', 'orcamento_id', 'valor'),
+    )
+
 class Missao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     fonte_dinheiro = db.Column(db.String(20), nullable=False)
@@ -73,6 +85,13 @@ class Missao(db.Model):
     data_autorizacao = db.Column(db.DateTime)
     observacoes = db.Column(db.Text)
 
+    __table_args__ = (
+        # Totais autorizados por fonte/tipo/status, respondidos só pelo índice
+        db.Index('ix_missao_fonte_tipo_status', 'fonte_dinheiro', 'tipo', 'status', 'valor'),
+        # Listagem paginada por (data_criacao, id)
+        db.Index('ix_missao_data_criacao', 'data_criacao', 'id'),
+    )
+
 class MovimentacaoOrcamentaria(db.Model):
     """Modelo para registrar todas as movimentações orçamentárias"""
     __tablename__ = 'movimentacao_orcamentaria'
@@ -94,6 +113,12 @@ class MovimentacaoOrcamentaria(db.Model):
     # Relacionamentos
     orcamento = db.relationship('Orcamento', backref='movimentacoes')
     missao = db.relationship('Missao', backref='movimentacoes')
+
+    __table_args__ = (
+        # Relatório de movimentações: período + tipo/unidades, paginado por data
+        db.Index('ix_movimentacao_data_tipo_unidades',
+                 'data_movimentacao', 'tipo', 'unidade_origem', 'unidade_destino'),
+    )
     
     def __repr__(self):
         return f'<MovimentacaoOrcamentaria {self.tipo} - {self.valor}>'
@@ -0,0 +1,131 @@
+"""Paginação por chave (keyset) para listagens ordenadas por data decrescente.
+
+Em vez de OFFSET, cada página é buscada a partir do último (data, id) visto,
+o que mantém o custo constante mesmo com centenas de milhares de linhas.
+Datas nulas ficam depois de todas as outras (como as mais antigas) e vão no
+cursor como texto vazio.
+"""
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+SEPARADOR_CURSOR = '_'
+
+
+class PaginaKeyset:
+    """Uma página de resultados com os cursores de navegação"""
+
+    def __init__(self, itens, por_pagina, proximo=None, anterior=None):
+        self.itens = itens
+        self.por_pagina = por_pagina
+        self.proximo = proximo
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+
+def codificar_cursor(data, id_):
+    return f"{data.isoformat() if data is not None else ''}{SEPARADOR_CURSOR}{id_}"
+
+
+def decodificar_cursor(cursor):
+    """Converte o cursor da URL em (data, id); cursores inválidos são ignorados"""
+    if not cursor:
+        return None
+    try:
+        data, id_ = cursor.rsplit(SEPARADOR_CURSOR, 1)
+        return (datetime.fromisoformat(data) if data else None), int(id_)
+    except ValueError:
+        return None
+
+
+def por_pagina_da_requisicao():
+    """Tamanho de página pedido em ?por_pagina=, limitado pela configuração"""
+    padrao = current_app.config.get('ITENS_POR_PAGINA', 50)
+    maximo = current_app.config.get('MAX_ITENS_POR_PAGINA', 500)
+    try:
+        por_pagina = int(request.args.get('por_pagina', padrao))
+    except ValueError:
+        por_pagina = padrao
+    return max(1, min(por_pagina, maximo))
+
+
+def _ordenar(coluna, descendente, nulos_explicitos):
+    ordem = coluna.desc() if descendente else coluna.asc()
+    if nulos_explicitos:
+        ordem = ordem.nulls_last() if descendente else ordem.nulls_first()
+    return ordem
+
+
+def paginar(query, coluna_data, coluna_id, apos=None, antes=None, por_pagina=50, chave=None):
+    """Busca uma página ordenada por (coluna_data, coluna_id) decrescente.
+
+    ``apos`` avança para registros mais antigos que o cursor e ``antes`` volta
+    para registros mais recentes. ``chave`` extrai (data, id) de cada item
+    quando a query não devolve atributos com os mesmos nomes das colunas.
+    """
+    if chave is None:
+        def chave(item):
+            return getattr(item, coluna_data.key), getattr(item, coluna_id.key)
+
+    cursor_apos = decodificar_cursor(apos)
+    cursor_antes = None if cursor_apos else decodificar_cursor(antes)
+
+    # SQLite e MySQL já ordenam NULL como o menor valor (e usam o índice);
+    # nos demais bancos a posição dos nulos é pedida explicitamente
+    nulos_explicitos = query.session.get_bind().dialect.name not in ('sqlite', 'mysql')
+
+    if cursor_antes:
+        data, id_ = cursor_antes
+        if data is None:
+            query = query.filter(or_(
+                coluna_data.isnot(None),
+                and_(coluna_data.is_(None), coluna_id > id_)
+            ))
+        else:
+            query = query.filter(or_(
+                coluna_data > data,
+                and_(coluna_data == data, coluna_id > id_)
+            ))
+        query = query.order_by(_ordenar(coluna_data, False, nulos_explicitos), coluna_id.asc())
+    else:
+        if cursor_apos:
+            data, id_ = cursor_apos
+            if data is None:
+                query = query.filter(coluna_data.is_(None), coluna_id < id_)
+            else:
+                query = query.filter(or_(
+                    coluna_data < data,
+                    and_(coluna_data == data, coluna_id < id_),
+                    coluna_data.is_(None)
+                ))
+        query = query.order_by(_ordenar(coluna_data, True, nulos_explicitos), coluna_id.desc())
+
+    # Uma linha a mais indica se existe outra página na mesma direção
+    itens = query.limit(por_pagina + 1).all()
+    tem_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+
+    if cursor_antes:
+        itens.reverse()
+
+    if not itens:
+        return PaginaKeyset(itens, por_pagina)
+
+    primeiro = codificar_cursor(*chave(itens[0]))
+    ultimo = codificar_cursor(*chave(itens[-1]))
+
+    if cursor_antes:
+        proximo = ultimo
+        anterior = primeiro if tem_mais else None
+    else:
+        proximo = ultimo if tem_mais else None
+        anterior = primeiro if cursor_apos else None
+
+    return PaginaKeyset(itens, por_pagina, proximo=proximo, anterior=anterior)
@@ -0,0 +1,159 @@
+"""Perfil de execução sob demanda de uma requisição.
+
+Com ``PERFIL_ATIVO`` e ``ADMIN_TOKEN`` configurados, qualquer rota aceita
+``?perfil=<modo>&token=<ADMIN_TOKEN>`` (o token também pode ir no cabeçalho
+``X-Admin-Token``) e devolve, no lugar da resposta normal, o perfil daquela
+requisição:
+
+- ``texto``: relatório do cProfile (funções por tempo acumulado) e o
+  detalhamento das consultas SQL;
+- ``colapsado``: pilhas amostradas no formato "collapsed" (uma pilha por
+  linha + contagem), aceito por flamegraph.pl e speedscope;
+- ``pstats``: arquivo binário do cProfile (snakeviz, gprof2dot).
+
+Sem a configuração nenhum gancho é registrado e as requisições não pagam nada.
+"""
+import contextvars
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, g, request
+
+import cronometro_sql
+
+
+MODOS = ('texto', 'colapsado', 'pstats')
+INTERVALO_AMOSTRAGEM = 0.002
+FUNCOES_NO_RELATORIO = 40
+CONSULTAS_NO_RELATORIO = 25
+
+_coleta_sql = contextvars.ContextVar('coleta_sql_perfil', default=None)
+
+
+class AmostradorPilhas:
+    """Amostra a pilha de uma thread em intervalos fixos (perfil estatístico)"""
+
+    def __init__(self, thread_id, intervalo=INTERVALO_AMOSTRAGEM):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name='perfil-amostrador', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            nomes = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                nomes.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})')
+                quadro = quadro.f_back
+            if nomes:
+                self.pilhas[';'.join(reversed(nomes))] += 1
+
+    def colapsado(self):
+        return ''.join(f'{pilha} {quantidade}\n' for pilha, quantidade in self.pilhas.most_common())
+
+
+def _coletar_consulta(conexao, instrucao, parametros, executemany, duracao):
+    coleta = _coleta_sql.get()
+    if coleta is not None:
+        coleta.append((instrucao, duracao))
+
+
+def _detalhamento_sql(coleta):
+    por_instrucao = {}
+    for instrucao, duracao in coleta:
+        quantidade, total = por_instrucao.get(instrucao, (0, 0.0))
+        por_instrucao[instrucao] = (quantidade + 1, total + duracao)
+    total = sum(duracao for _, duracao in coleta)
+
+    linhas = [f'Consultas SQL: {len(coleta)} ({len(por_instrucao)} distintas), {total * 1000:.1f} ms', '']
+    ordenadas = sorted(por_instrucao.items(), key=lambda item: item[1][1], reverse=True)
+    for instrucao, (quantidade, soma) in ordenadas[:CONSULTAS_NO_RELATORIO]:
+        linhas.append(f'{soma * 1000:9.1f} ms  {quantidade:5d}x  {" ".join(instrucao.split())[:300]}')
+    if len(ordenadas) > CONSULTAS_NO_RELATORIO:
+        linhas.append(f'... mais {len(ordenadas) - CONSULTAS_NO_RELATORIO} instruções distintas')
+    return linhas
+
+
+def _relatorio(estado, duracao, status):
+    saida = io.StringIO()
+    saida.write(f'{request.method} {request.full_path.rstrip("?")} -> {status} em {duracao * 1000:.1f} ms\n\n')
+    saida.write('\n'.join(_detalhamento_sql(estado['sql'])) + '\n\n')
+    estatisticas = pstats.Stats(estado['profiler'], stream=saida)
+    estatisticas.sort_stats('cumulative').print_stats(FUNCOES_NO_RELATORIO)
+    return saida.getvalue()
+
+
+def _token_valido(app):
+    recebido = request.headers.get('X-Admin-Token') or request.args.get('token', '')
+    return hmac.compare_digest(recebido.encode(), app.config['ADMIN_TOKEN'].encode())
+
+
+def init_app(app):
+    if not (app.config.get('PERFIL_ATIVO') and app.config.get('ADMIN_TOKEN')):
+        return
+
+    cronometro_sql.inscrever(_coletar_consulta)
+
+    @app.before_request
+    def _iniciar_perfil():
+        modo = request.args.get('perfil')
+        if modo not in MODOS or not _token_valido(app):
+            return
+        estado = {'modo': modo, 'sql': [], 'inicio': time.perf_counter()}
+        _coleta_sql.set(estado['sql'])
+        if modo == 'colapsado':
+            estado['amostrador'] = AmostradorPilhas(threading.get_ident())
+            estado['amostrador'].iniciar()
+        else:
+            estado['profiler'] = cProfile.Profile()
+            estado['profiler'].enable()
+        g._perfil = estado
+
+    @app.after_request
+    def _entregar_perfil(resposta):
+        estado = g.pop('_perfil', None)
+        if estado is None:
+            return resposta
+        duracao = time.perf_counter() - estado['inicio']
+        _coleta_sql.set(None)
+
+        if estado['modo'] == 'colapsado':
+            estado['amostrador'].parar()
+            return Response(estado['amostrador'].colapsado(), mimetype='text/plain')
+
+        estado['profiler'].disable()
+        if estado['modo'] == 'pstats':
+            estado['profiler'].create_stats()
+            return Response(marshal.dumps(estado['profiler'].stats), mimetype='application/octet-stream',
+                            headers={'Content-Disposition': 'attachment; filename=perfil.prof'})
+        return Response(_relatorio(estado, duracao, resposta.status_code), mimetype='text/plain')
+
+    @app.teardown_request
+    def _descartar_perfil(erro=None):
+        # Só sobra estado aqui se a resposta não passou pelo after_request
+        estado = g.pop('_perfil', None)
+        if estado is None:
+            return
+        _coleta_sql.set(None)
+        if 'amostrador' in estado:
+            estado['amostrador'].parar()
+        else:
+            estado['profiler'].disable()
@@ -0,0 +1,888 @@
+"""Camada de dados dos relatórios.
+
+Cada tipo de relatório possui um construtor de dataset que executa suas
+consultas uma única vez e devolve um dicionário serializável em JSON. O
+dataset fica no cache de relatórios e alimenta renderizadores plugáveis
+(PDF, CSV, XLSX e JSON), de modo que trocar o formato de saída não custa
+nenhuma consulta extra ao banco.
+
+As linhas das tabelas nunca ficam todas em memória: o construtor as entrega
+como um iterável, elas são gravadas uma por linha no arquivo do dataset e os
+renderizadores as leem de lá enquanto escrevem a saída, também em arquivo.
+"""
+import contextlib
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import banco
+
+
+logger = logging.getLogger(__name__)
+
+
+# tipo -> {'funcao': construtor, 'filtros': (nomes dos filtros aceitos)}
+CONSTRUTORES = {}
+
+# formato -> {'funcao': renderizador(dataset, saida), 'mimetype': ..., 'extensao': ...}
+RENDERIZADORES = {}
+
+# tipo -> função que monta o PDF a partir do dataset
+LAYOUTS_PDF = {}
+
+
+class RelatorioIndisponivel(Exception):
+    """Tipo de relatório ou formato de saída não suportado"""
+
+
+def construtor(tipo, filtros=()):
+    """Registra o construtor de dataset de um tipo de relatório"""
+    def decorador(funcao):
+        CONSTRUTORES[tipo] = {'funcao': funcao, 'filtros': tuple(filtros)}
+        return funcao
+    return decorador
+
+
+def renderizador(formato, mimetype, extensao):
+    """Registra um renderizador de saída, que grava o relatório no arquivo binário ``saida``"""
+    def decorador(funcao):
+        RENDERIZADORES[formato] = {'funcao': funcao, 'mimetype': mimetype, 'extensao': extensao}
+        return funcao
+    return decorador
+
+
+def layout_pdf(tipo):
+    """Registra o layout PDF específico de um tipo de relatório"""
+    def decorador(funcao):
+        LAYOUTS_PDF[tipo] = funcao
+        return funcao
+    return decorador
+
+
+def normalizar_filtros(tipo, filtros):
+    """Mantém apenas os filtros aceitos pelo construtor, sempre como string"""
+    if tipo not in CONSTRUTORES:
+        raise RelatorioIndisponivel(f'Tipo de relatório "{tipo}" não reconhecido')
+
+    aceitos = CONSTRUTORES[tipo]['filtros']
+    return {nome: str(filtros.get(nome) or '').strip() for nome in aceitos}
+
+
+# ---------------------------------------------------------------------------
+# Cache de relatórios
+# ---------------------------------------------------------------------------
+
+class ReportCache:
+    """Cache em disco de datasets e relatórios renderizados.
+
+    O diretório é compartilhado entre os workers e com os comandos de linha de
+    comando. Cada entrada fica dentro do diretório da versão atual dos dados;
+    qualquer commit que altere o banco gera uma nova versão e as entradas
+    antigas deixam de ser encontradas.
+    """
+
+    ARQUIVO_VERSAO = 'VERSAO'
+
+    def __init__(self, diretorio=None, ttl=0):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.atraso_replica = 0
+
+    def init_app(self, app):
+        self.diretorio = app.config.get('REPORT_CACHE_DIR') or os.path.join(app.instance_path, 'report_cache')
+        self.ttl = int(app.config.get('REPORT_CACHE_TTL', 0) or 0)
+        if app.config.get('DATABASE_URL_LEITURA'):
+            self.atraso_replica = float(app.config.get('REPLICA_ATRASO_MAX', 0) or 0)
+        os.makedirs(self.diretorio, exist_ok=True)
+        app.extensions['report_cache'] = self
+
+    # -- versão dos dados ---------------------------------------------------
+
+    def versao(self):
+        caminho = os.path.join(self.diretorio, self.ARQUIVO_VERSAO)
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                versao = arquivo.read().strip()
+        except FileNotFoundError:
+            versao = ''
+        return versao or self.invalidar()
+
+    def invalidar(self):
+        """Gera uma nova versão dos dados e descarta as entradas antigas"""
+        nova_versao = uuid.uuid4().hex
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._gravar_atomico(os.path.join(self.diretorio, self.ARQUIVO_VERSAO), nova_versao.encode('utf-8'))
+
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            if nome != nova_versao and os.path.isdir(caminho):
+                shutil.rmtree(caminho, ignore_errors=True)
+
+        return nova_versao
+
+    # -- entradas -----------------------------------------------------------
+
+    def _caminho(self, tipo, formato, filtros):
+        chave = json.dumps([tipo, formato, sorted(filtros.items())], ensure_ascii=False)
+        nome = hashlib.sha1(chave.encode('utf-8')).hexdigest()
+        return os.path.join(self.diretorio, self.versao(), f'{tipo}-{nome}.{formato}')
+
+    def obter(self, tipo, formato, filtros):
+        """Conteúdo da entrada em bytes, ou None (para entradas pequenas)"""
+        arquivo = self.abrir(tipo, formato, filtros)
+        if arquivo is None:
+            return None
+        with arquivo:
+            return arquivo.read()
+
+    def abrir(self, tipo, formato, filtros):
+        """Arquivo da entrada aberto para leitura binária, ou None"""
+        caminho = self._caminho(tipo, formato, filtros)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(caminho) > self.ttl:
+                return None
+            # Continua legível mesmo que uma invalidação remova o diretório da versão
+            return open(caminho, 'rb')
+        except FileNotFoundError:
+            return None
+
+    def _replica_atrasada(self):
+        """A réplica pode ainda não ter recebido a última alteração"""
+        if not self.atraso_replica or not banco.lendo_da_replica():
+            return False
+        try:
+            idade = time.time() - os.path.getmtime(os.path.join(self.diretorio, self.ARQUIVO_VERSAO))
+        except FileNotFoundError:
+            return False
+        return idade < self.atraso_replica
+
+    def guardar(self, tipo, formato, filtros, conteudo):
+        """Grava bytes ou o conteúdo de um arquivo aberto (desde o início) na entrada"""
+        if self._replica_atrasada():
+            return
+        caminho = self._caminho(tipo, formato, filtros)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            if not isinstance(conteudo, bytes):
+                conteudo.seek(0)
+            self._gravar_atomico(caminho, conteudo)
+        except OSError as e:
+            # Outra instância pode ter invalidado a versão no meio da gravação
+            logger.warning('Não foi possível gravar no cache de relatórios: %s', e)
+
+    @staticmethod
+    def _gravar_atomico(caminho, conteudo):
+        """Grava bytes ou o conteúdo de um arquivo aberto e só então publica"""
+        temporario = f'{caminho}.{uuid.uuid4().hex}.tmp'
+        with open(temporario, 'wb') as arquivo:
+            if isinstance(conteudo, bytes):
+                arquivo.write(conteudo)
+            else:
+                shutil.copyfileobj(conteudo, arquivo)
+        os.replace(temporario, caminho)
+
+
+report_cache = ReportCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _marcar_alteracao(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info['relatorios_desatualizados'] = True
+
+
+@event.listens_for(Session, 'after_bulk_delete')
+@event.listens_for(Session, 'after_bulk_update')
+def _marcar_alteracao_em_massa(contexto):
+    contexto.session.info['relatorios_desatualizados'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    if session.info.pop('relatorios_desatualizados', False) and report_cache.diretorio:
+        report_cache.invalidar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marcacao(session):
+    session.info.pop('relatorios_desatualizados', None)
+
+
+# ---------------------------------------------------------------------------
+# Obtenção de datasets e relatórios
+# ---------------------------------------------------------------------------
+
+class LinhasEmArquivo:
+    """Linhas de uma tabela do dataset, lidas do arquivo a cada iteração.
+
+    Todas as tabelas compartilham o mesmo arquivo aberto: itere uma de cada
+    vez, até o fim ou não.
+    """
+
+    def __init__(self, arquivo, inicio, indice):
+        self.arquivo = arquivo
+        self.inicio = inicio
+        self.indice = indice
+
+    def __iter__(self):
+        self.arquivo.seek(self.inicio)
+        for texto in self.arquivo:
+            indice, linha = json.loads(texto)
+            if indice == self.indice:
+                yield linha
+            elif indice > self.indice:
+                break
+
+
+def _gravar_dataset(dataset, saida):
+    """Cabeçalho (o dataset sem as linhas) e depois uma linha JSON por linha de tabela"""
+    tabelas = dataset.get('tabelas', [])
+    cabecalho = dict(dataset, tabelas=[
+        {chave: valor for chave, valor in tabela.items() if chave != 'linhas'}
+        for tabela in tabelas
+    ])
+    saida.write(_serializar_json(cabecalho) + b'\n')
+    for indice, tabela in enumerate(tabelas):
+        for linha in tabela['linhas']:
+            saida.write(_serializar_json([indice, linha]) + b'\n')
+
+
+def _ler_dataset(arquivo):
+    arquivo.seek(0)
+    dataset = json.loads(arquivo.readline())
+    inicio = arquivo.tell()
+    for indice, tabela in enumerate(dataset.get('tabelas', [])):
+        tabela['linhas'] = LinhasEmArquivo(arquivo, inicio, indice)
+    return dataset
+
+
+@contextlib.contextmanager
+def abrir_dataset(tipo, filtros=None):
+    """Dataset do relatório, construído apenas se não estiver em cache.
+
+    As linhas das tabelas são lidas do arquivo do dataset sob demanda, por isso
+    ele só vale dentro do bloco ``with``.
+    """
+    filtros = normalizar_filtros(tipo, filtros or {})
+
+    arquivo = report_cache.abrir(tipo, 'dataset', filtros)
+    if arquivo is None:
+        dataset = CONSTRUTORES[tipo]['funcao'](**filtros)
+        dataset.setdefault('tipo', tipo)
+        dataset.setdefault('filtros', filtros)
+        dataset.setdefault('gerado_em', datetime.now().isoformat(timespec='seconds'))
+
+        arquivo = tempfile.TemporaryFile()
+        try:
+            _gravar_dataset(dataset, arquivo)
+            report_cache.guardar(tipo, 'dataset', filtros, arquivo)
+        except BaseException:
+            arquivo.close()
+            raise
+
+    with arquivo:
+        yield _ler_dataset(arquivo)
+
+
+def abrir_relatorio(tipo, formato, filtros=None):
+    """Devolve (arquivo aberto, mimetype, nome do arquivo) do relatório no formato pedido.
+
+    O arquivo fica posicionado no início e deve ser fechado pelo chamador
+    (``send_file`` o fecha ao fim da resposta).
+    """
+    if formato not in RENDERIZADORES:
+        raise RelatorioIndisponivel(f'Formato "{formato}" não suportado')
+
+    filtros = normalizar_filtros(tipo, filtros or {})
+    info = RENDERIZADORES[formato]
+
+    with abrir_dataset(tipo, filtros) as dataset:
+        nome_arquivo = _nome_arquivo(dataset, info['extensao'])
+        arquivo = report_cache.abrir(tipo, formato, filtros)
+        if arquivo is None:
+            arquivo = tempfile.TemporaryFile()
+            try:
+                info['funcao'](dataset, arquivo)
+                report_cache.guardar(tipo, formato, filtros, arquivo)
+            except BaseException:
+                arquivo.close()
+                raise
+
+    arquivo.seek(0)
+    return arquivo, info['mimetype'], nome_arquivo
+
+
+def renderizar(tipo, formato, filtros=None):
+    """Devolve (conteúdo, mimetype, nome do arquivo); para relatórios pequenos"""
+    arquivo, mimetype, nome_arquivo = abrir_relatorio(tipo, formato, filtros)
+    with arquivo:
+        return arquivo.read(), mimetype, nome_arquivo
+
+
+def _nome_arquivo(dataset, extensao):
+    gerado_em = datetime.fromisoformat(dataset['gerado_em'])
+    return f"{dataset.get('nome_arquivo', dataset['tipo'])}_{gerado_em.strftime('%Y%m%d_%H%M')}.{extensao}"
+
+
+def _serializar_json(dataset):
+    return json.dumps(dataset, ensure_ascii=False, default=str).encode('utf-8')
+
+
+# ---------------------------------------------------------------------------
+# Formatação
+# ---------------------------------------------------------------------------
+
+def formatar_moeda(valor):
+    """Formata valor no padrão brasileiro (1.234,56)"""
+    return f"{float(valor or 0):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def formatar_data(valor, formato='%d/%m/%Y %H:%M'):
+    if not valor:
+        return ''
+    return datetime.fromisoformat(valor).strftime(formato)
+
+
+def formatar_celula(valor, tipo_coluna):
+    if valor is None or valor == '':
+        return ''
+    if tipo_coluna == 'moeda':
+        return formatar_moeda(valor)
+    if tipo_coluna == 'data':
+        return formatar_data(valor)
+    return str(valor)
+
+
+# ---------------------------------------------------------------------------
+# Renderizadores genéricos (usam as tabelas do dataset)
+# ---------------------------------------------------------------------------
+
+def _abrir_json(dicionario, ultima_chave):
+    """JSON de ``dicionario`` com ``ultima_chave`` (uma lista) por último e ainda aberta"""
+    dicionario = dict(dicionario)
+    dicionario.pop(ultima_chave, None)
+    dicionario[ultima_chave] = []
+    return _serializar_json(dicionario)[:-2]
+
+
+@renderizador('json', 'application/json', 'json')
+def renderizar_json(dataset, saida):
+    # Mesmo documento de json.dumps(dataset), escrito linha a linha das tabelas
+    saida.write(_abrir_json(dataset, 'tabelas'))
+    for indice, tabela in enumerate(dataset.get('tabelas', [])):
+        if indice:
+            saida.write(b', ')
+        saida.write(_abrir_json(tabela, 'linhas'))
+        for numero, linha in enumerate(tabela['linhas']):
+            if numero:
+                saida.write(b', ')
+            saida.write(_serializar_json(linha))
+        saida.write(b']}')
+    saida.write(b']}')
+
+
+@renderizador('csv', 'text/csv', 'csv')
+def renderizar_csv(dataset, saida):
+    output = io.TextIOWrapper(saida, encoding='utf-8', newline='')
+    # BOM para o Excel reconhecer o UTF-8
+    output.write('\ufeff')
+    writer = csv.writer(output, delimiter=';')
+    tabelas = dataset.get('tabelas', [])
+
+    for indice, tabela in enumerate(tabelas):
+        # Com mais de uma tabela, cada seção recebe um título
+        if len(tabelas) > 1:
+            if indice:
+                writer.writerow([])
+            writer.writerow([tabela['titulo']])
+
+        writer.writerow([coluna['rotulo'] for coluna in tabela['colunas']])
+        for linha in tabela['linhas']:
+            writer.writerow([formatar_celula(linha.get(coluna['chave']), coluna.get('formato'))
+                             for coluna in tabela['colunas']])
+
+    # Devolve ``saida`` aberta ao chamador
+    output.flush()
+    output.detach()
+
+
+@renderizador('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+def renderizar_xlsx(dataset, saida):
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Font
+    except ImportError as e:
+        raise RelatorioIndisponivel('Exportação XLSX requer o pacote openpyxl') from e
+
+    workbook = Workbook(write_only=True)
+
+    for tabela in dataset.get('tabelas', []):
+        # Nome da aba limitado a 31 caracteres pelo Excel
+        planilha = workbook.create_sheet(tabela['titulo'][:31])
+        planilha.append([coluna['rotulo'] for coluna in tabela['colunas']])
+
+        for linha in tabela['linhas']:
+            valores = []
+            for coluna in tabela['colunas']:
+                valor = linha.get(coluna['chave'])
+                if coluna.get('formato') == 'data' and valor:
+                    valor = datetime.fromisoformat(valor)
+                valores.append(valor)
+            planilha.append(valores)
+
+    workbook.save(saida)
+
+
+class FluxoSobDemanda(list):
+    """Story do ReportLab preenchida sob demanda a partir de um iterável de flowables.
+
+    O ReportLab consome a story pela frente (len, [0], del [0]) e devolve ao
+    início os pedaços de um flowable quebrado; basta manter alguns flowables
+    à frente para montar o PDF sem criar todos de uma vez.
+    """
+
+    ADIANTE = 5
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._pendentes = iter(flowables)
+
+    def __len__(self):
+        while list.__len__(self) < self.ADIANTE:
+            try:
+                self.append(next(self._pendentes))
+            except StopIteration:
+                break
+        return list.__len__(self)
+
+
+@renderizador('pdf', 'application/pdf', 'pdf')
+def renderizar_pdf(dataset, saida):
+    layout = LAYOUTS_PDF.get(dataset['tipo'])
+    if not layout:
+        raise RelatorioIndisponivel(f'Relatório "{dataset["tipo"]}" não possui layout PDF')
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    margem_lateral = 50 if dataset['tipo'] == 'missoes' else 72
+    doc = SimpleDocTemplate(
+        saida,
+        pagesize=A4,
+        rightMargin=margem_lateral,
+        leftMargin=margem_lateral,
+        topMargin=72,
+        bottomMargin=18
+    )
+    doc.build(FluxoSobDemanda(layout(dataset)))
+
+
+# ---------------------------------------------------------------------------
+# Layouts PDF
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def estilos_pdf():
+    """Folha de estilos padrão do ReportLab, montada uma vez por processo (só leitura)"""
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    return getSampleStyleSheet()
+
+
+def precarregar():
+    """Carrega ReportLab, openpyxl e a folha de estilos antes do fork (gunicorn --preload)"""
+    import reportlab.platypus  # noqa: F401
+    estilos_pdf()
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        pass
+
+
+def get_table_style_header():
+    """Estilo padrão para tabelas com cabeçalho"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ])
+
+
+def create_missoes_table_style(header_color, body_color):
+    """Criar estilo específico para tabelas de missões"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black if header_color == '#ffc107' else colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Última coluna à direita
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 1), (-1, -1), body_color),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+
+
+LINHAS_POR_BLOCO = 100
+
+
+def _tabela_em_blocos(cabecalho, linhas, estilo, col_widths, zebra=None):
+    """Tabela longa como uma sequência de Tables de até LINHAS_POR_BLOCO linhas.
+
+    Os blocos ficam colados e só o primeiro tem o cabeçalho; os seguintes
+    recebem o estilo sem os comandos da linha 0. ``zebra`` é a cor das linhas
+    pares do corpo, contadas desde o início da tabela.
+    """
+    from reportlab.platypus import Table, TableStyle
+
+    comandos = estilo.getCommands()
+    continuacao = []
+    for nome, (coluna_ini, linha_ini), (coluna_fim, linha_fim), *resto in comandos:
+        if linha_fim == 0:
+            continue
+        continuacao.append((nome, (coluna_ini, max(linha_ini - 1, 0)),
+                            (coluna_fim, linha_fim - 1 if linha_fim > 0 else linha_fim), *resto))
+
+    linhas = iter(linhas)
+    inicio = 0
+    while True:
+        bloco = list(itertools.islice(linhas, LINHAS_POR_BLOCO))
+        if not bloco and inicio:
+            return
+        primeiro = not inicio
+        dados = [cabecalho] + bloco if primeiro else bloco
+        estilo_bloco = list(comandos if primeiro else continuacao)
+        if zebra is not None:
+            deslocamento = 1 if primeiro else 0
+            estilo_bloco += [('BACKGROUND', (0, i + deslocamento), (-1, i + deslocamento), zebra)
+                             for i in range(len(bloco)) if (inicio + i) % 2]
+        tabela = Table(dados, colWidths=col_widths)
+        tabela.setStyle(TableStyle(estilo_bloco))
+        yield tabela
+        inicio += len(bloco)
+        if len(bloco) < LINHAS_POR_BLOCO:
+            return
+
+
+def _cabecalho_pdf(titulo, linhas, tamanho_titulo=16, tamanho_texto=10):
+    """Título, subtítulo CRPIV e linhas informativas centralizadas"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = estilos_pdf()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=tamanho_titulo,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#1f4e79'),
+        fontName='Helvetica-Bold'
+    )
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=tamanho_texto,
+        spaceAfter=10,
+        alignment=TA_CENTER,
+        textColor=colors.grey
+    )
+
+    elements = [
+        Paragraph(titulo, title_style),
+        Paragraph("CRPIV - Comando Regional de Polícia IV", subtitle_style),
+    ]
+    for linha in linhas:
+        elements.append(Paragraph(linha, subtitle_style))
+    elements.append(Spacer(1, 20))
+    return elements
+
+
+def _rodape_pdf(dataset):
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = estilos_pdf()
+    return [
+        Spacer(1, 30),
+        Paragraph("_" * 80, ParagraphStyle('Line', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER)),
+        Paragraph(
+            f"Relatório gerado automaticamente pelo Sistema CRPIV em {formatar_data(dataset['gerado_em'], '%d/%m/%Y às %H:%M')}",
+            ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
+        ),
+    ]
+
+
+def _tabela_simples(titulo, linhas, cor_cabecalho, cor_corpo):
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, TableStyle
+
+    tabela = Table([[titulo, 'VALOR']] + linhas, colWidths=[3*inch, 2*inch])
+    tabela.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 1), (-1, -1), cor_corpo),
+    ]))
+    return tabela
+
+
+@layout_pdf('orcamento')
+def pdf_orcamento(dataset):
+    """Relatório orçamentário consolidado"""
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Spacer, Table
+
+    resumo = dataset['resumo']
+    unidade_filtro = dataset['filtros'].get('unidade')
+
+    linhas = []
+    if unidade_filtro:
+        linhas.append(f"Filtro aplicado: {unidade_filtro}")
+    linhas.append(f"Gerado em: {formatar_data(dataset['gerado_em'], '%d/%m/%Y às %H:%M')}")
+    elements = _cabecalho_pdf("RELATÓRIO ORÇAMENTÁRIO CONSOLIDADO", linhas)
+
+    resumo_table = Table([
+        ['RESUMO FINANCEIRO', ''],
+        ['Total Orçamento:', f"R$ {formatar_moeda(resumo['total_orcamento'])}"],
+        ['Total Previsões:', f"R$ {formatar_moeda(resumo['total_previsoes'])}"],
+        ['Total Autorizadas:', f"R$ {formatar_moeda(resumo['total_autorizadas'])}"],
+        ['Disponível:', f"R$ {formatar_moeda(resumo['disponivel'])}"],
+    ], colWidths=[3*inch, 2*inch])
+    resumo_table.setStyle(get_table_style_header())
+    elements += [resumo_table, Spacer(1, 30)]
+
+    tipos = [[item['tipo'], f"R$ {formatar_moeda(item['valor'])}"] for item in dataset['por_tipo']]
+    elements += [_tabela_simples('ORÇAMENTO POR TIPO', tipos, '#28a745', colors.lightgreen), Spacer(1, 30)]
+
+    if dataset['por_unidade']:
+        unidades = [[item['unidade'], f"R$ {formatar_moeda(item['autorizado'])}"] for item in dataset['por_unidade']]
+        elements.append(_tabela_simples('GASTOS POR UNIDADE', unidades, '#007bff', colors.lightblue))
+
+    return elements + _rodape_pdf(dataset)
+
+
+@layout_pdf('missoes')
+def pdf_missoes(dataset):
+    """Missões separadas por unidade (fonte do dinheiro) e status.
+
+    As linhas chegam ordenadas por fonte e status (autorizadas antes das
+    previsões), na mesma ordem das seções, e são lidas uma vez só.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+    styles = estilos_pdf()
+    resumo = dataset['resumo']
+    filtros = dataset['filtros']
+
+    linhas = []
+    filtro_info = []
+    if filtros.get('opm_filtro'):
+        filtro_info.append(f"OPM Destino: {filtros['opm_filtro']}")
+    if filtros.get('fonte_filtro'):
+        filtro_info.append(f"Fonte: {filtros['fonte_filtro']}")
+    if filtro_info:
+        linhas.append(f"Filtros aplicados: {' | '.join(filtro_info)}")
+    linhas.append(f"Gerado em: {formatar_data(dataset['gerado_em'], '%d/%m/%Y às %H:%M')}")
+    yield from _cabecalho_pdf("RELATÓRIO DE MISSÕES POR UNIDADE", linhas, tamanho_titulo=18, tamanho_texto=11)
+
+    resumo_table = Table([
+        ['RESUMO EXECUTIVO', ''],
+        ['Total de Missões:', f"{resumo['total_missoes']:,}"],
+        ['Total em Previsão:', f"R$ {formatar_moeda(resumo['total_previsao'])}"],
+        ['Total Autorizada:', f"R$ {formatar_moeda(resumo['total_autorizada'])}"],
+        ['Valor Total Geral:', f"R$ {formatar_moeda(resumo['total_geral'])}"],
+        ['Unidades Envolvidas:', f"{len(dataset['por_unidade'])} unidade(s)"],
+    ], colWidths=[3.5*inch, 2.5*inch])
+    resumo_table.setStyle(get_table_style_header())
+    yield from [resumo_table, Spacer(1, 30)]
+
+    unidade_style = ParagraphStyle(
+        'UnidadeTitle',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=15,
+        spaceBefore=20,
+        textColor=colors.HexColor('#2c5aa0'),
+        fontName='Helvetica-Bold'
+    )
+
+    secoes = {
+        'autorizada': ('Missões Autorizadas', '#28a745', colors.lightgreen, 'qtd_autorizada'),
+        'previsao': ('Missões em Previsão', '#ffc107', colors.lightyellow, 'qtd_previsao'),
+    }
+    grupos = itertools.groupby(dataset['tabelas'][0]['linhas'],
+                               key=lambda missao: (missao['fonte_dinheiro'], missao['status']))
+    chave, missoes = next(grupos, (None, None))
+
+    for totais in dataset['por_unidade']:
+        unidade = totais['unidade']
+        yield Paragraph(unidade, unidade_style)
+
+        unidade_resumo_table = Table([
+            ['Resumo da Unidade', 'Quantidade', 'Valor Total'],
+            ['Missões em Previsão', f"{totais['qtd_previsao']}", f"R$ {formatar_moeda(totais['total_previsao'])}"],
+            ['Missões Autorizadas', f"{totais['qtd_autorizada']}", f"R$ {formatar_moeda(totais['total_autorizada'])}"],
+            ['TOTAL DA UNIDADE', f"{totais['qtd_previsao'] + totais['qtd_autorizada']}", f"R$ {formatar_moeda(totais['total_geral'])}"],
+        ], colWidths=[3*inch, 1.5*inch, 2*inch])
+        unidade_resumo_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5aa0')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ]))
+        yield from [unidade_resumo_table, Spacer(1, 15)]
+
+        exibidas = False
+        while chave is not None and chave[0] == unidade:
+            secao = secoes.get(chave[1])
+            if secao:
+                titulo, cor_cabecalho, cor_corpo, quantidade = secao
+                yield Paragraph(f"{titulo} ({totais[quantidade]})",
+                                ParagraphStyle('SubTitle', parent=styles['Normal'], fontSize=12,
+                                               textColor=colors.HexColor(cor_cabecalho), fontName='Helvetica-Bold'))
+
+                dados = (
+                    [
+                        missao['opm_destino'],
+                        (missao['descricao'] or '')[:35] + ('...' if len(missao['descricao'] or '') > 35 else ''),
+                        missao['tipo'],
+                        missao['periodo'] or '-',
+                        f"R$ {formatar_moeda(missao['valor'])}"
+                    ]
+                    for missao in missoes
+                )
+                yield from _tabela_em_blocos(['OPM Destino', 'Descrição', 'Tipo', 'Período', 'Valor'], dados,
+                                             create_missoes_table_style(cor_cabecalho, cor_corpo),
+                                             [1.2*inch, 2.3*inch, 1*inch, 1*inch, 1*inch])
+                yield Spacer(1, 10)
+                exibidas = True
+            # O próximo grupo só é lido depois que os blocos deste foram montados
+            chave, missoes = next(grupos, (None, None))
+
+        if not exibidas:
+            yield Paragraph("Nenhuma missão encontrada para esta unidade",
+                            ParagraphStyle('Info', parent=styles['Normal'], fontSize=10,
+                                           textColor=colors.grey, alignment=TA_CENTER))
+
+        yield Spacer(1, 20)
+
+    yield from _rodape_pdf(dataset)
+
+
+@layout_pdf('movimentacoes')
+def pdf_movimentacoes(dataset):
+    """Log de movimentações orçamentárias"""
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+    styles = estilos_pdf()
+    resumo = dataset['resumo']
+    movimentacoes = dataset['tabelas'][0]['linhas']
+
+    yield from _cabecalho_pdf("RELATÓRIO DE MOVIMENTAÇÕES ORÇAMENTÁRIAS", [
+        f"Gerado em: {formatar_data(dataset['gerado_em'], '%d/%m/%Y às %H:%M')}"
+    ])
+
+    periodo = 'N/A a N/A'
+    if resumo['data_inicial']:
+        periodo = f"{formatar_data(resumo['data_inicial'], '%d/%m/%Y')} a {formatar_data(resumo['data_final'], '%d/%m/%Y')}"
+
+    resumo_table = Table([
+        ['RESUMO EXECUTIVO', ''],
+        ['Total de Movimentações:', f"{resumo['total_movimentacoes']:,}"],
+        ['Valor Total Movimentado:', f"R$ {formatar_moeda(resumo['valor_total'])}"],
+        ['Período:', periodo],
+    ], colWidths=[3*inch, 2*inch])
+    resumo_table.setStyle(get_table_style_header())
+    yield from [resumo_table, Spacer(1, 30)]
+
+    if not resumo['total_movimentacoes']:
+        yield Paragraph("Nenhuma movimentação encontrada.", styles['Normal'])
+        yield from _rodape_pdf(dataset)
+        return
+
+    def linha_pdf(mov):
+        descricao = mov['descricao'] or ''
+        usuario = mov['usuario'] or ''
+        return [
+            formatar_data(mov['data_movimentacao'], '%d/%m/%Y\n%H:%M'),
+            mov['tipo'].replace('_', ' ').title(),
+            descricao[:30] + ('...' if len(descricao) > 30 else ''),
+            mov['unidade_origem'] or '-',
+            mov['unidade_destino'] or '-',
+            mov['tipo_orcamento'] or '-',
+            f"R$ {formatar_moeda(mov['valor'])}" if mov['valor'] else '-',
+            usuario[:10] + ('...' if len(usuario) > 10 else '')
+        ]
+
+    estilo = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 7),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ])
+
+    yield Paragraph("DETALHAMENTO DAS MOVIMENTAÇÕES", styles['Heading2'])
+    yield Spacer(1, 10)
+    # Linhas zebradas, contadas desde o início da tabela
+    yield from _tabela_em_blocos(['Data', 'Tipo', 'Descrição', 'Origem', 'Destino', 'Tipo Orç.', 'Valor', 'Usuário'],
+                                 map(linha_pdf, movimentacoes), estilo,
+                                 [0.8*inch, 1.2*inch, 1.8*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.9*inch, 0.8*inch],
+                                 zebra=colors.lightgrey)
+    yield from _rodape_pdf(dataset)
@@ -0,0 +1,174 @@
+"""Busca textual de missões (descrição, observações e processo SEI).
+
+Cada banco usa seu índice nativo:
+- SQLite: tabela virtual FTS5 ``missao_fts`` mantida por triggers;
+- PostgreSQL: índice GIN sobre ``to_tsvector`` das três colunas;
+- MySQL: índice FULLTEXT nas três colunas.
+
+Em outros bancos (ou SQLite sem FTS5) a busca cai para LIKE, sem ranking.
+"""
+import logging
+import re
+import weakref
+
+from sqlalchemy import column, desc, event, false, inspect, literal_column, or_, table, text
+
+from models import db, Missao
+
+
+logger = logging.getLogger(__name__)
+
+
+TABELA_FTS = 'missao_fts'
+CONFIG_TSVECTOR = 'portuguese'
+
+DDL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        descricao, observacoes, processo_sei,
+        content='missao', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS missao_fts_ai AFTER INSERT ON missao BEGIN
+        INSERT INTO {TABELA_FTS}(rowid, descricao, observacoes, processo_sei)
+        VALUES (new.id, new.descricao, new.observacoes, new.processo_sei);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS missao_fts_ad AFTER DELETE ON missao BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, descricao, observacoes, processo_sei)
+        VALUES ('delete', old.id, old.descricao, old.observacoes, old.processo_sei);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS missao_fts_au AFTER UPDATE OF descricao, observacoes, processo_sei ON missao BEGIN
+        INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, descricao, observacoes, processo_sei)
+        VALUES ('delete', old.id, old.descricao, old.observacoes, old.processo_sei);
+        INSERT INTO {TABELA_FTS}(rowid, descricao, observacoes, processo_sei)
+        VALUES (new.id, new.descricao, new.observacoes, new.processo_sei);
+    END""",
+    f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')",
+]
+
+DROP_SQLITE = [
+    "DROP TRIGGER IF EXISTS missao_fts_au",
+    "DROP TRIGGER IF EXISTS missao_fts_ad",
+    "DROP TRIGGER IF EXISTS missao_fts_ai",
+    f"DROP TABLE IF EXISTS {TABELA_FTS}",
+]
+
+DOCUMENTO_PG = ("coalesce(descricao, '') || ' ' || coalesce(observacoes, '') || ' ' || "
+                "coalesce(processo_sei, '')")
+
+
+def criar_indice_busca(conexao):
+    """Cria o índice de busca adequado ao banco da conexão"""
+    dialeto = conexao.dialect.name
+    if dialeto == 'sqlite':
+        for comando in DDL_SQLITE:
+            conexao.exec_driver_sql(comando)
+        _fts_sqlite.pop(conexao.engine, None)
+    elif dialeto == 'postgresql':
+        conexao.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_missao_busca ON missao "
+            f"USING gin (to_tsvector('{CONFIG_TSVECTOR}', {DOCUMENTO_PG}))")
+    elif dialeto in ('mysql', 'mariadb'):
+        # Sem IF NOT EXISTS no MySQL; o índice já existe em bancos criados por db.create_all()
+        if any(indice['name'] == 'ix_missao_busca' for indice in inspect(conexao).get_indexes('missao')):
+            return
+        conexao.exec_driver_sql(
+            "CREATE FULLTEXT INDEX ix_missao_busca ON missao (descricao, observacoes, processo_sei)")
+
+
+def remover_indice_busca(conexao):
+    dialeto = conexao.dialect.name
+    if dialeto == 'sqlite':
+        for comando in DROP_SQLITE:
+            conexao.exec_driver_sql(comando)
+        _fts_sqlite.pop(conexao.engine, None)
+    elif dialeto == 'postgresql':
+        conexao.exec_driver_sql("DROP INDEX IF EXISTS ix_missao_busca")
+    elif dialeto in ('mysql', 'mariadb'):
+        conexao.exec_driver_sql("DROP INDEX ix_missao_busca ON missao")
+
+
+@event.listens_for(Missao.__table__, 'after_create')
+def _criar_indice_com_tabela(tabela, conexao, **kwargs):
+    """Bancos novos (db.create_all) já nascem com o índice de busca"""
+    try:
+        criar_indice_busca(conexao)
+    except Exception as e:
+        logger.warning('Índice de busca de missões não criado: %s', e)
+
+
+def ignorar_objetos_busca(objeto, nome, tipo, refletido, comparar_com):
+    """Filtro do Alembic: o índice de busca não é declarado no metadata"""
+    if tipo == 'table' and nome and nome.startswith(TABELA_FTS):
+        return False
+    if tipo == 'index' and nome == 'ix_missao_busca':
+        return False
+    return True
+
+
+def palavras_busca(termo):
+    """Palavras da busca, sem operadores nem pontuação"""
+    return re.findall(r'\w+', termo or '')
+
+
+# Por engine, com os dois resultados: sem isso cada busca num banco sem FTS5
+# repetiria a inspeção antes de cair para LIKE
+_fts_sqlite = weakref.WeakKeyDictionary()
+
+
+def _tem_fts_sqlite():
+    engine = db.engine
+    if engine not in _fts_sqlite:
+        _fts_sqlite[engine] = inspect(engine).has_table(TABELA_FTS)
+    return _fts_sqlite[engine]
+
+
+def aplicar_busca(query, termo):
+    """Filtra ``query`` (sobre Missao) pelas palavras de ``termo`` e ordena por relevância.
+
+    Todas as palavras precisam aparecer; cada uma casa também como prefixo,
+    de modo que "0012" encontra o processo "23086.001234/2025-11".
+    """
+    palavras = palavras_busca(termo)
+    if not palavras:
+        return query.filter(false())
+
+    dialeto = db.engine.dialect.name
+
+    if dialeto == 'sqlite' and _tem_fts_sqlite():
+        fts = table(TABELA_FTS, column('rowid'), column('rank'))
+        expressao = ' '.join(f'"{p}"*' for p in palavras)
+        return (query.join(fts, fts.c.rowid == Missao.id)
+                .filter(literal_column(TABELA_FTS).op('MATCH')(expressao))
+                .order_by(fts.c.rank, Missao.id.desc()))
+
+    if dialeto == 'postgresql':
+        documento = db.func.to_tsvector(CONFIG_TSVECTOR, literal_column(DOCUMENTO_PG))
+        consulta = db.func.to_tsquery(CONFIG_TSVECTOR, ' & '.join(f'{p}:*' for p in palavras))
+        return (query.filter(documento.op('@@')(consulta))
+                .order_by(db.func.ts_rank(documento, consulta).desc(), Missao.id.desc()))
+
+    if dialeto in ('mysql', 'mariadb'):
+        relevancia = text(
+            "MATCH (missao.descricao, missao.observacoes, missao.processo_sei) "
+            "AGAINST (:busca IN BOOLEAN MODE)"
+        ).bindparams(busca=' '.join(f'+{p}*' for p in palavras))
+        return query.filter(relevancia).order_by(desc(relevancia), Missao.id.desc())
+
+    for palavra in palavras:
+        padrao = f'%{palavra}%'
+        query = query.filter(or_(
+            Missao.descricao.ilike(padrao),
+            Missao.observacoes.ilike(padrao),
+            Missao.processo_sei.ilike(padrao)
+        ))
+    return query.order_by(Missao.data_criacao.desc(), Missao.id.desc())
+
+
+def buscar_missoes(query, termo, pagina=1, por_pagina=50):
+    """Uma página de resultados ranqueados; devolve (missoes, tem_mais)"""
+    pagina = max(pagina, 1)
+    resultados = (aplicar_busca(query, termo)
+                  .offset((pagina - 1) * por_pagina)
+                  .limit(por_pagina + 1)
+                  .all())
+    return resultados[:por_pagina], len(resultados) > por_pagina
@@ -0,0 +1,181 @@
+// Gráficos da página de relatórios, alimentados por /dados_graficos.
+// O HTML da página não carrega dados; as séries vêm do endpoint JSON (em cache
+// no servidor) e podem ser atualizadas sem recarregar a página.
+(function () {
+    'use strict';
+
+    const CORES = ['#007bff', '#28a745', '#ffc107', '#dc3545'];
+    const COR_PREVISAO = '#ffc107';
+    const COR_AUTORIZADO = '#28a745';
+
+    const charts = {};
+    let etag = null;
+
+    function formatarMoeda(valor) {
+        return Number(valor || 0).toLocaleString('pt-BR', {
+            minimumFractionDigits: 2,
+            maximumFractionDigits: 2
+        });
+    }
+
+    function eixoMoeda() {
+        return {
+            beginAtZero: true,
+            ticks: {
+                callback: function (value) {
+                    return 'R$ ' + value.toLocaleString('pt-BR');
+                }
+            }
+        };
+    }
+
+    function configuracoes(series) {
+        const config = {
+            tiposChart: {
+                type: 'bar',
+                data: {
+                    labels: series.por_tipo.rotulos,
+                    datasets: [
+                        {label: 'Orçamento (R$)', data: series.por_tipo.orcamento, backgroundColor: CORES},
+                        {label: 'Autorizado (R$)', data: series.por_tipo.autorizado, backgroundColor: COR_AUTORIZADO}
+                    ]
+                },
+                options: {
+                    responsive: true,
+                    plugins: {title: {display: true, text: 'Orçamento Total por Tipo (Todos os Bimestres)'}},
+                    scales: {y: eixoMoeda()}
+                }
+            },
+            unidadesChart: {
+                type: 'doughnut',
+                data: {
+                    labels: series.por_unidade.rotulos,
+                    datasets: [{data: series.por_unidade.autorizado, backgroundColor: CORES}]
+                },
+                options: {
+                    responsive: true,
+                    plugins: {title: {display: true, text: 'Gastos Autorizados por Unidade'}}
+                }
+            },
+            statusMissoesChart: {
+                type: 'pie',
+                data: {
+                    labels: series.por_status.rotulos,
+                    datasets: [{data: series.por_status.valores, backgroundColor: [COR_PREVISAO, COR_AUTORIZADO]}]
+                },
+                options: {
+                    responsive: true,
+                    plugins: {title: {display: true, text: 'Status das Missões'}}
+                }
+            }
+        };
+
+        if (series.por_mes) {
+            config.mesesChart = {
+                type: 'bar',
+                data: {
+                    labels: series.por_mes.rotulos,
+                    datasets: [
+                        {label: 'Previsões (R$)', data: series.por_mes.previsao, backgroundColor: COR_PREVISAO},
+                        {label: 'Autorizadas (R$)', data: series.por_mes.autorizado, backgroundColor: COR_AUTORIZADO}
+                    ]
+                },
+                options: {
+                    responsive: true,
+                    scales: {x: {stacked: true}, y: Object.assign(eixoMoeda(), {stacked: true})}
+                }
+            };
+        }
+        return config;
+    }
+
+    function desenhar(dados) {
+        Object.entries(configuracoes(dados.series)).forEach(function ([id, config]) {
+            const canvas = document.getElementById(id);
+            if (!canvas) {
+                return;
+            }
+            if (charts[id]) {
+                // Atualiza no lugar para não recriar o gráfico a cada atualização
+                charts[id].data = config.data;
+                charts[id].update();
+            } else {
+                charts[id] = new Chart(canvas.getContext('2d'), config);
+            }
+        });
+
+        document.querySelectorAll('[data-resumo]').forEach(function (el) {
+            el.textContent = formatarMoeda(dados.resumo[el.dataset.resumo]);
+        });
+
+        const vazio = document.querySelector('[data-grafico-vazio]');
+        if (vazio) {
+            const semDados = !dados.resumo.total_orcamento &&
+                !dados.resumo.total_previsoes && !dados.resumo.total_autorizadas;
+            vazio.classList.toggle('d-none', !semDados);
+        }
+
+        const atualizado = document.querySelector('[data-grafico-atualizado]');
+        if (atualizado && dados.gerado_em) {
+            atualizado.textContent = 'Dados de ' + new Date(dados.gerado_em).toLocaleString('pt-BR');
+        }
+    }
+
+    function carregar(painel) {
+        const headers = etag ? {'If-None-Match': etag} : {};
+        return fetch(painel.dataset.url, {headers: headers})
+            .then(function (resposta) {
+                if (resposta.status === 304) {
+                    return null;
+                }
+                if (!resposta.ok) {
+                    throw new Error('HTTP ' + resposta.status);
+                }
+                etag = resposta.headers.get('ETag');
+                return resposta.json();
+            })
+            .then(function (dados) {
+                if (dados) {
+                    desenhar(dados);
+                }
+            })
+            .catch(function (erro) {
+                console.error('Erro ao carregar dados dos gráficos:', erro);
+            });
+    }
+
+    function exportarPng(chartId) {
+        const chart = charts[chartId];
+        if (!chart) {
+            return;
+        }
+        const link = document.createElement('a');
+        link.download = chartId + '_' + new Date().toISOString().slice(0, 10) + '.png';
+        link.href = chart.toBase64Image();
+        link.click();
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const painel = document.getElementById('painel-graficos');
+        if (!painel) {
+            return;
+        }
+
+        carregar(painel);
+
+        const botaoAtualizar = painel.querySelector('[data-grafico-atualizar]');
+        if (botaoAtualizar) {
+            botaoAtualizar.addEventListener('click', function () {
+                carregar(painel);
+            });
+        }
+
+        document.querySelectorAll('.export-chart').forEach(function (botao) {
+            botao.addEventListener('click', function () {
+                exportarPng(this.getAttribute('data-chart'));
+            });
+        });
+
+        window.CRPIVGraficos = {charts: charts, atualizar: function () { return carregar(painel); }};
+    });
+})();
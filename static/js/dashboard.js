@@ -0,0 +1,98 @@
+// Dashboard em painéis: a página chega só com a estrutura e cada painel
+// (/painel/<nome>) é buscado em paralelo. Um painel lento ou com erro não
+// atrasa os demais.
+(function () {
+    'use strict';
+
+    const graficos = {};
+    const etags = {};
+
+    function eixoMoeda() {
+        return {
+            beginAtZero: true,
+            ticks: {
+                callback: function (value) {
+                    return 'R$ ' + value.toLocaleString('pt-BR');
+                }
+            }
+        };
+    }
+
+    function iniciarGraficos(container) {
+        container.querySelectorAll('canvas[data-grafico]').forEach(function (canvas) {
+            const config = JSON.parse(canvas.dataset.grafico);
+            if (config.eixoMoeda) {
+                config.options.scales = {y: eixoMoeda()};
+                delete config.eixoMoeda;
+            }
+            if (graficos[canvas.id]) {
+                graficos[canvas.id].destroy();
+            }
+            graficos[canvas.id] = new Chart(canvas.getContext('2d'), config);
+        });
+    }
+
+    function carregarPainel(container) {
+        const url = container.dataset.painel;
+        const headers = etags[url] ? {'If-None-Match': etags[url]} : {};
+
+        return fetch(url, {headers: headers})
+            .then(function (resposta) {
+                if (resposta.status === 304) {
+                    return null;
+                }
+                if (resposta.ok) {
+                    etags[url] = resposta.headers.get('ETag');
+                }
+                return resposta.text();
+            })
+            .then(function (html) {
+                if (html === null) {
+                    return;
+                }
+                container.innerHTML = html;
+                iniciarGraficos(container);
+            })
+            .catch(function (erro) {
+                console.error('Erro ao carregar painel ' + url + ':', erro);
+                container.innerHTML = '<div class="alert alert-danger">Erro ao carregar painel.</div>';
+            });
+    }
+
+    function atualizar() {
+        return Promise.all(
+            Array.from(document.querySelectorAll('[data-painel]')).map(carregarPainel)
+        );
+    }
+
+    document.addEventListener('click', function (evento) {
+        const botao = evento.target.closest('[data-exportar-grafico]');
+        if (!botao) {
+            return;
+        }
+        const grafico = graficos[botao.dataset.exportarGrafico];
+        if (grafico) {
+            const link = document.createElement('a');
+            link.download = botao.dataset.arquivo || botao.dataset.exportarGrafico + '.png';
+            link.href = grafico.toBase64Image();
+            link.click();
+        }
+    });
+
+    document.addEventListener('DOMContentLoaded', atualizar);
+
+    // Movimentações chegam em rajadas (ex.: distribuição + autorização):
+    // agrupa os eventos e recarrega os painéis uma vez só. Painéis que não
+    // mudaram respondem 304.
+    let atualizacaoPendente = null;
+
+    function agendarAtualizacao() {
+        clearTimeout(atualizacaoPendente);
+        atualizacaoPendente = setTimeout(atualizar, 500);
+    }
+
+    document.addEventListener('crpiv:saldo', agendarAtualizacao);
+    document.addEventListener('crpiv:sincronizar', agendarAtualizacao);
+
+    window.CRPIVDashboard = {atualizar: atualizar, graficos: graficos};
+})();
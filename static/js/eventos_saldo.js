@@ -0,0 +1,38 @@
+// Assina /eventos_saldo (Server-Sent Events) e repassa cada variação de saldo
+// como evento DOM:
+//   crpiv:saldo       -> detail = {id, tipo, tipo_orcamento, valor, deltas, data}
+//   crpiv:sincronizar -> a página deve recarregar os saldos por completo
+// O navegador reconecta sozinho e envia o Last-Event-ID, então nenhuma
+// movimentação se perde entre uma conexão e outra.
+(function () {
+    'use strict';
+
+    const script = document.currentScript;
+    if (!window.EventSource || !script) {
+        return;
+    }
+
+    let url = script.dataset.url;
+    if (script.dataset.ultimo) {
+        url += (url.indexOf('?') >= 0 ? '&' : '?') + 'ultimo=' + encodeURIComponent(script.dataset.ultimo);
+    }
+
+    const fonte = new EventSource(url);
+
+    function repassar(nome, dados) {
+        document.dispatchEvent(new CustomEvent(nome, {detail: dados}));
+    }
+
+    fonte.addEventListener('saldo', function (evento) {
+        const dados = JSON.parse(evento.data);
+        repassar(dados.deltas ? 'crpiv:saldo' : 'crpiv:sincronizar', dados);
+    });
+
+    fonte.addEventListener('sincronizar', function () {
+        repassar('crpiv:sincronizar', {});
+    });
+
+    window.addEventListener('beforeunload', function () {
+        fonte.close();
+    });
+})();